@@ -0,0 +1,187 @@
+"""
+batch_inference.py - Batched intent classification with length-sorted dynamic padding
+"""
+
+import itertools
+import torch
+
+from metrics import timed
+
+# ============================================
+# DEFAULTS
+# ============================================
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_MAX_TOKENS = 4096     # padded tokens allowed in one forward pass
+DEFAULT_MAX_LENGTH = 64
+SORT_WINDOW_BATCHES = 16      # texts are length-sorted this many batches at a time
+
+# Long-input mode: overlapping max_length windows instead of truncation
+LONG_INPUT_AGGREGATIONS = ("mean", "max", "confident")
+DEFAULT_WINDOW_OVERLAP = 16   # tokens shared by neighbouring windows
+DEFAULT_MAX_WINDOWS = 16      # longer emails keep this many windows spread over the text
+
+# ============================================
+# HELPERS
+# ============================================
+def logits_of(outputs):
+    """Return the logits tensor from a model output (HF output object or raw tensor)"""
+    return outputs.logits if hasattr(outputs, "logits") else outputs
+
+def tokenize_texts(tokenizer, texts, max_length=DEFAULT_MAX_LENGTH):
+    """Tokenize texts without padding so every row keeps its own length"""
+    with timed("tokenize"):
+        encodings = tokenizer(
+            list(texts),
+            truncation=True,
+            padding=False,
+            max_length=max_length,
+            return_tensors=None
+        )
+    return encodings["input_ids"]
+
+def split_windows(token_ids, content_length, overlap=DEFAULT_WINDOW_OVERLAP, max_windows=DEFAULT_MAX_WINDOWS):
+    """Overlapping slices of at most content_length tokens covering token_ids"""
+    step = max(1, content_length - overlap)
+    starts = [0]
+    while starts[-1] + content_length < len(token_ids):
+        starts.append(starts[-1] + step)
+    if max_windows and len(starts) > max_windows:
+        # Keep the first and last windows and spread the rest evenly in between
+        picks = [round(i * (len(starts) - 1) / (max_windows - 1)) for i in range(max_windows)]
+        starts = [starts[i] for i in sorted(set(picks))]
+    return [token_ids[start:start + content_length] for start in starts]
+
+def tokenize_windows(tokenizer, texts, max_length=DEFAULT_MAX_LENGTH,
+                     overlap=DEFAULT_WINDOW_OVERLAP, max_windows=DEFAULT_MAX_WINDOWS):
+    """(window input_ids, index of the text each window came from)
+
+    A text that fits in max_length gets exactly the ids tokenize_texts() gives it.
+    """
+    # Every window is framed as [CLS] piece [SEP], like a truncated DistilBERT input
+    content_length = max_length - 2
+    with timed("tokenize"):
+        encodings = tokenizer(list(texts), add_special_tokens=False, truncation=False,
+                              padding=False, verbose=False)
+    windows, owners = [], []
+    for owner, token_ids in enumerate(encodings["input_ids"]):
+        for piece in split_windows(token_ids, content_length, overlap, max_windows):
+            windows.append([tokenizer.cls_token_id] + piece + [tokenizer.sep_token_id])
+            owners.append(owner)
+    return windows, owners
+
+def aggregate_windows(probs, method="mean"):
+    """Combine the (windows, labels) probabilities of one text into one row
+
+    mean and max work on log-probabilities (each window's logits minus its
+    own log-sum-exp), so "mean" gives the same answer as averaging logits.
+    """
+    if method not in LONG_INPUT_AGGREGATIONS:
+        raise ValueError(f"Unknown long-input aggregation '{method}', expected one of {LONG_INPUT_AGGREGATIONS}")
+    if len(probs) == 1:
+        return probs[0]
+    log_probs = torch.log(probs.clamp_min(1e-12))
+    if method == "mean":
+        return torch.softmax(log_probs.mean(dim=0), dim=0)
+    if method == "max":
+        return torch.softmax(log_probs.max(dim=0).values, dim=0)
+    # "confident": the single window the model is surest about
+    return probs[probs.max(dim=1).values.argmax()]
+
+def length_sorted_batches(lengths, batch_size=DEFAULT_BATCH_SIZE, max_tokens=DEFAULT_MAX_TOKENS):
+    """Group row indices into batches of similar length
+
+    A batch is closed when it holds batch_size rows or when padding it to
+    its longest row would go over max_tokens.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batch = []
+    for i in order:
+        # Rows arrive shortest first, so the row being added is the longest
+        too_many_tokens = max_tokens and lengths[i] * (len(batch) + 1) > max_tokens
+        if batch and (len(batch) >= batch_size or too_many_tokens):
+            yield batch
+            batch = []
+        batch.append(i)
+    if batch:
+        yield batch
+
+def pad_batch(input_ids, pad_token_id):
+    """Pad a list of token id lists to the longest one in the batch"""
+    longest = max(len(ids) for ids in input_ids)
+    ids = torch.full((len(input_ids), longest), pad_token_id, dtype=torch.long)
+    mask = torch.zeros((len(input_ids), longest), dtype=torch.long)
+    for row, seq in enumerate(input_ids):
+        ids[row, :len(seq)] = torch.tensor(seq, dtype=torch.long)
+        mask[row, :len(seq)] = 1
+    return ids, mask
+
+# ============================================
+# BATCHED CLASSIFICATION
+# ============================================
+def classify_encoded(model, input_ids, pad_token_id,
+                     batch_size=DEFAULT_BATCH_SIZE, max_tokens=DEFAULT_MAX_TOKENS):
+    """Run the model over pre-tokenized rows and return probabilities in input order"""
+    probs = None
+    lengths = [len(ids) for ids in input_ids]
+
+    with torch.inference_mode():
+        for batch in length_sorted_batches(lengths, batch_size, max_tokens):
+            ids, mask = pad_batch([input_ids[i] for i in batch], pad_token_id)
+            with timed("forward"):
+                logits = logits_of(model(input_ids=ids, attention_mask=mask))
+            batch_probs = torch.softmax(logits.float(), dim=1)
+
+            if probs is None:
+                probs = torch.empty((len(input_ids), batch_probs.shape[1]))
+            probs[torch.tensor(batch)] = batch_probs
+
+    return probs if probs is not None else torch.empty((0, 0))
+
+def classify_long(model, tokenizer, texts, batch_size=DEFAULT_BATCH_SIZE, max_tokens=DEFAULT_MAX_TOKENS,
+                  max_length=DEFAULT_MAX_LENGTH, aggregation="mean"):
+    """Probability rows for texts longer than max_length, from overlapping windows
+
+    The windows of every text go through the model together in one set of
+    length-sorted batches; texts that fit in one window come out exactly as
+    in the truncating path.
+    """
+    windows, owners = tokenize_windows(tokenizer, texts, max_length)
+    return classify_windows(model, windows, owners, tokenizer.pad_token_id, batch_size, max_tokens, aggregation)
+
+def classify_windows(model, windows, owners, pad_token_id, batch_size=DEFAULT_BATCH_SIZE,
+                     max_tokens=DEFAULT_MAX_TOKENS, aggregation="mean"):
+    """One probability row per text from the output of tokenize_windows()"""
+    probs = classify_encoded(model, windows, pad_token_id, batch_size, max_tokens)
+    # owners is sorted, so each text's windows are one contiguous run
+    bounds = [0] + [i for i in range(1, len(owners)) if owners[i] != owners[i - 1]] + [len(owners)]
+    return [aggregate_windows(probs[start:end], aggregation) for start, end in zip(bounds, bounds[1:])]
+
+def iter_classify(model, tokenizer, texts, batch_size=DEFAULT_BATCH_SIZE,
+                  max_tokens=DEFAULT_MAX_TOKENS, max_length=DEFAULT_MAX_LENGTH, long_input=None):
+    """Yield one probability row per text, in input order
+
+    texts may be any iterable. It is consumed a window at a time, so memory
+    stays bounded for long iterators while enough rows are sorted together
+    to keep padding low. long_input names an aggregation from
+    LONG_INPUT_AGGREGATIONS to classify long texts by sliding windows instead
+    of truncating them.
+    """
+    texts = iter(texts)
+    window = batch_size * SORT_WINDOW_BATCHES
+
+    while True:
+        chunk = list(itertools.islice(texts, window))
+        if not chunk:
+            return
+        if long_input:
+            yield from classify_long(model, tokenizer, chunk, batch_size, max_tokens, max_length, long_input)
+            continue
+        input_ids = tokenize_texts(tokenizer, chunk, max_length)
+        yield from classify_encoded(model, input_ids, tokenizer.pad_token_id,
+                                    batch_size, max_tokens)
+
+def classify_texts(model, tokenizer, texts, batch_size=DEFAULT_BATCH_SIZE,
+                   max_tokens=DEFAULT_MAX_TOKENS, max_length=DEFAULT_MAX_LENGTH, long_input=None):
+    """Classify a list of texts and return a (num_texts, num_labels) probability tensor"""
+    rows = list(iter_classify(model, tokenizer, texts, batch_size, max_tokens, max_length, long_input))
+    return torch.stack(rows) if rows else torch.empty((0, 0))
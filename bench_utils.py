@@ -0,0 +1,87 @@
+"""
+bench_utils.py - Small helpers shared by the benchmark and comparison scripts
+"""
+
+import resource
+
+import pandas as pd
+
+def percentile(values, q):
+    """Nearest-rank percentile (q in 0-100) of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def current_rss_mb():
+    """Resident set size of this process in MB"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+def rss_breakdown_mb():
+    """(anonymous, file-backed) resident memory in MB; file-backed pages are shareable"""
+    values = {}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(("RssAnon:", "RssFile:")):
+                    key, kb = line.split()[:2]
+                    values[key] = int(kb) / 1024
+    except OSError:
+        pass
+    return values.get("RssAnon:", 0.0), values.get("RssFile:", 0.0)
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (since start or the last reset_peak_rss())"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss survives fork+exec on Linux, so it is only a fallback
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def reset_peak_rss():
+    """Reset the kernel's peak-RSS counter so peak_rss_mb() measures from here (Linux only)"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def process_memory_mb(pid="self"):
+    """RSS, PSS and USS (private pages) of a process in MB, from smaps_rollup
+
+    PSS splits shared pages between the processes sharing them, so summing
+    PSS over a parent and its workers gives their real combined footprint.
+    """
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                values[parts[0][:-1]] = int(parts[1]) / 1024
+    return {
+        "rss": values.get("Rss", 0.0),
+        "pss": values.get("Pss", 0.0),
+        "uss": values.get("Private_Clean", 0.0) + values.get("Private_Dirty", 0.0),
+    }
+
+def load_heldout(path, text_column="email_text", label_column="label", limit=None):
+    """Read a labeled split (.xlsx or .csv) and return (texts, labels)"""
+    if path.endswith(".csv"):
+        df = pd.read_csv(path)
+    else:
+        df = pd.read_excel(path)
+    if limit:
+        df = df.head(limit)
+    return df[text_column].astype(str).tolist(), df[label_column].astype(str).tolist()
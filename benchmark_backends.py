@@ -0,0 +1,53 @@
+"""
+benchmark_backends.py - Compare eager, TorchScript and ONNX Runtime latency
+Run: python benchmark_backends.py --checkpoint ultra_fast_model.pt
+"""
+
+import argparse
+import time
+
+import torch
+
+from bench_utils import percentile
+from model_loader import load_classifier
+
+def time_backend(backend, batch_size, seq_len, vocab_size, iterations):
+    """Median and p99 milliseconds per forward pass at one shape"""
+    input_ids = torch.randint(vocab_size, (batch_size, seq_len))
+    attention_mask = torch.ones((batch_size, seq_len), dtype=torch.long)
+
+    timings = []
+    with torch.inference_mode():
+        backend(input_ids=input_ids, attention_mask=attention_mask)   # warm-up
+        for _ in range(iterations):
+            start = time.perf_counter()
+            backend(input_ids=input_ids, attention_mask=attention_mask)
+            timings.append((time.perf_counter() - start) * 1000)
+    return percentile(timings, 50), percentile(timings, 99)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark inference backends")
+    parser.add_argument("--checkpoint", default="ultra_fast_model.pt")
+    parser.add_argument("--backends", nargs="+", default=["eager", "torchscript", "onnx"])
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--seq-lens", nargs="+", type=int, default=[16, 64, 128])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    print(f"{'backend':12}{'batch':>7}{'seq':>6}{'p50 ms':>10}{'p99 ms':>10}{'samples/s':>12}")
+    for name in args.backends:
+        backend, tokenizer, _ = load_classifier(args.checkpoint, precision="fp32", backend=name,
+                                                early_exit=False)
+        for batch_size in args.batch_sizes:
+            for seq_len in args.seq_lens:
+                p50, p99 = time_backend(backend, batch_size, seq_len,
+                                        tokenizer.vocab_size, args.iterations)
+                print(f"{name:12}{batch_size:>7}{seq_len:>6}{p50:>10.2f}{p99:>10.2f}"
+                      f"{batch_size / (p50 / 1000):>12.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+benchmark_bulk_send.py - Bulk mail-merge throughput and failure handling against local_smtp.py's stand-in
+Compares sending a recipient list one by one through the SmtpPool (a loop over Send Now)
+with the asyncio pipeline at several in-flight limits, on a server that takes --delay-ms per
+message. Then checks, on a server injecting 451s and 550s, that temporary failures are retried,
+permanent ones and invalid addresses are reported without retries, the rate limit holds and
+--resume only resends what was not delivered.
+Run: python benchmark_bulk_send.py --recipients 200 --delay-ms 50
+"""
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+from bulk_send import BulkSender, ReportWriter, finished_addresses, merge, read_recipients
+from local_smtp import LocalSmtpServer, RecordingHandler, client_context
+from smtp_pool import SmtpPool
+
+USER, PASSWORD = "sender@example.com", "app-password"
+MESSAGE = "We help teams like yours ship faster."
+
+def recipients_csv(count, invalid=()):
+    lines = ["email,name,company"]
+    for i in range(count):
+        address = "not-an-address" if i in invalid else f"lead{i}@example.com"
+        lines.append(f"{address},Lead {i},Company {i}")
+    return "\n".join(lines) + "\n"
+
+def jobs(csv_text, skip=()):
+    rows = read_recipients(io.StringIO(csv_text))
+    return merge(rows, "sales", MESSAGE, USER, "Sender", "Example Co", skip=skip)
+
+def run_pipeline(server, csv_text, tls, on_result=None, skip=(), **options):
+    sender = BulkSender(USER, PASSWORD, server.host, server.port, starttls=tls, ssl_context=client_context(),
+                        **options)
+    start = time.perf_counter()
+    counters = sender.send(jobs(csv_text, skip), on_result)
+    return counters, time.perf_counter() - start
+
+def run_sequential(server, csv_text, tls):
+    pool = SmtpPool(starttls=tls, ssl_context=client_context())
+    start = time.perf_counter()
+    for _, _, msg in jobs(csv_text):
+        pool.send_message(msg, USER, PASSWORD, server.host, server.port)
+    elapsed = time.perf_counter() - start
+    pool.close()
+    return elapsed
+
+def throughput(args, tls):
+    csv_text = recipients_csv(args.recipients)
+    with LocalSmtpServer(tls=tls, handler=RecordingHandler(delay_ms=args.delay_ms)) as server:
+        print(f"\n📨 {args.recipients} recipients, server answers DATA after {args.delay_ms} ms "
+              f"(STARTTLS {'on' if tls else 'off'})")
+        print(f"{'mode':>16}{'seconds':>9}{'msgs/s':>9}")
+        elapsed = run_sequential(server, csv_text, tls)
+        print(f"{'sequential pool':>16}{elapsed:>9.2f}{args.recipients / elapsed:>9.1f}")
+        for in_flight in args.in_flight:
+            counters, elapsed = run_pipeline(server, csv_text, tls, max_in_flight=in_flight, rate=0)
+            print(f"{f'async x{in_flight}':>16}{elapsed:>9.2f}{counters['sent'] / elapsed:>9.1f}")
+        delivered = len(server.messages)
+    return delivered == args.recipients * (1 + len(args.in_flight))
+
+def failure_drill(tls, rate):
+    count = 20
+    csv_text = recipients_csv(count, invalid={7})
+    handler = RecordingHandler(temporary_failures={"lead3@example.com": 2, "lead11@example.com": 5},
+                               rejected={"lead5@example.com"})
+    report_path = os.path.join(tempfile.mkdtemp(prefix="bulk_send_"), "report.csv")
+    checks = {}
+
+    with LocalSmtpServer(tls=tls, handler=handler) as server:
+        report = ReportWriter(report_path)
+        results = {}
+
+        def on_result(result):
+            report(result)
+            results[result["email"]] = result
+
+        counters, elapsed = run_pipeline(server, csv_text, tls, on_result, max_in_flight=4, rate=rate,
+                                         max_attempts=3, backoff=0.05)
+        report.close()
+        print(f"\n🧪 Failure drill: {counters} in {elapsed:.2f}s")
+
+        checks["retried 451 until accepted"] = (results["lead3@example.com"]["status"] == "sent"
+                                                and results["lead3@example.com"]["attempts"] == 3)
+        checks["gave up after max attempts"] = (results["lead11@example.com"]["status"] == "failed"
+                                                and results["lead11@example.com"]["attempts"] == 3
+                                                and str(results["lead11@example.com"]["code"]) == "451")
+        checks["550 not retried"] = (results["lead5@example.com"]["status"] == "failed"
+                                     and results["lead5@example.com"]["attempts"] == 1)
+        checks["invalid address reported"] = results["not-an-address"]["status"] == "invalid"
+        checks["one status row per recipient"] = len(results) == count and len(server.messages) == count - 3
+        # Sends (including retries) are spaced 1/rate apart
+        sends = count - 1 + counters["retries"]
+        checks[f"rate limit {rate}/s held"] = elapsed >= (sends - 1) / rate
+
+        # The failed recipient goes through on a resumed run, nobody else is mailed twice
+        handler.temporary_failures.clear()
+        skip = finished_addresses(report_path)
+        report = ReportWriter(report_path, append=True)
+        counters, _ = run_pipeline(server, csv_text, tls, report, skip=skip, rate=0, backoff=0.05)
+        report.close()
+        checks["resume only resends undelivered"] = (counters["sent"] == 1 and len(server.messages) == count - 2
+                                                     and len(finished_addresses(report_path)) == count - 1)
+
+    for name, ok in checks.items():
+        print(f"{'✅' if ok else '❌'} {name}")
+    return all(checks.values())
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark and check the bulk mail-merge pipeline")
+    parser.add_argument("--recipients", type=int, default=200)
+    parser.add_argument("--delay-ms", type=float, default=50, help="Server time per message (remote SMTP latency)")
+    parser.add_argument("--in-flight", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--rate", type=float, default=20, help="Rate limit checked in the failure drill")
+    parser.add_argument("--no-tls", action="store_true", help="Plain SMTP (no openssl needed)")
+    args = parser.parse_args()
+    tls = not args.no_tls
+
+    ok = throughput(args, tls)
+    ok = failure_drill(tls, args.rate) and ok
+    print("✅ bulk send checks passed" if ok else "❌ bulk send checks failed")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+benchmark_bundle.py - Cold-start time and peak memory: legacy checkpoint vs model bundle
+Runs fully offline against a fake hub directory built with random DistilBERT weights.
+The bundle is also laid out as a Hugging Face cache, and resolve_model_bundle() is run against it
+with every name lookup and socket connection refused and counted.
+Run: python benchmark_bundle.py [--check]
+
+--check exits non-zero unless the mmap bundle load has a lower peak RSS
+than the legacy load and keeps the weights in file-backed (shareable) pages,
+and a cached revision resolves without any connection attempt unless a refresh is asked for.
+"""
+
+import argparse
+import hashlib
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bench_utils import current_rss_mb, peak_rss_mb, reset_peak_rss, rss_breakdown_mb
+
+LABELS = ["complaint", "inquiry", "negotiation", "partnership", "sales"]
+FAKE_REPO_ID = "example/email-classifier"
+FAKE_COMMIT = "0123456789abcdef0123456789abcdef01234567"
+
+# ============================================
+# FAKE HUB
+# ============================================
+def fake_hub_paths(hub_dir):
+    return (os.path.join(hub_dir, "distilbert-base-uncased"),
+            os.path.join(hub_dir, "ultra_fast_model.pt"),
+            os.path.join(hub_dir, "bundle"))
+
+def build_fake_hub(hub_dir):
+    """Base model, legacy checkpoint and bundle, all local"""
+    import torch
+    from transformers import DistilBertConfig, DistilBertForSequenceClassification, DistilBertTokenizer
+
+    from model_bundle import encoder_from_labels, write_bundle
+
+    base_dir, checkpoint_path, bundle_dir = fake_hub_paths(hub_dir)
+    os.makedirs(base_dir, exist_ok=True)
+
+    vocab_path = os.path.join(base_dir, "vocab.txt")
+    with open(vocab_path, "w") as f:
+        f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+                          + [f"word{i}" for i in range(1000)]))
+    tokenizer = DistilBertTokenizer(vocab_file=vocab_path)
+    tokenizer.save_pretrained(base_dir)
+
+    # Full-size DistilBERT so the numbers match the real ~256 MB checkpoint
+    model = DistilBertForSequenceClassification(DistilBertConfig(num_labels=len(LABELS)))
+    model.save_pretrained(base_dir)
+
+    torch.save({
+        'model_state_dict': model.state_dict(),
+        'label_encoder': encoder_from_labels(LABELS),
+    }, checkpoint_path)
+
+    write_bundle(model.config, model.state_dict(), tokenizer, LABELS, bundle_dir)
+
+def build_fake_hf_cache(bundle_dir, cache_dir, repo_id=FAKE_REPO_ID, commit=FAKE_COMMIT):
+    """The bundle as huggingface_hub caches a download: sha256-named blobs, a snapshot of symlinks, refs/main"""
+    repo_dir = os.path.join(cache_dir, "models--" + repo_id.replace("/", "--"))
+    blobs_dir = os.path.join(repo_dir, "blobs")
+    snapshot_dir = os.path.join(repo_dir, "snapshots", commit, "bundle")
+    os.makedirs(blobs_dir, exist_ok=True)
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    for name in os.listdir(bundle_dir):
+        digest = hashlib.sha256()
+        with open(os.path.join(bundle_dir, name), "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        blob_path = os.path.join(blobs_dir, digest.hexdigest())
+        if not os.path.exists(blob_path):
+            shutil.copyfile(os.path.join(bundle_dir, name), blob_path)
+        link_path = os.path.join(snapshot_dir, name)
+        if not os.path.lexists(link_path):
+            os.symlink(os.path.relpath(blob_path, snapshot_dir), link_path)
+
+    os.makedirs(os.path.join(repo_dir, "refs"), exist_ok=True)
+    with open(os.path.join(repo_dir, "refs", "main"), "w") as f:
+        f.write(commit)
+    return snapshot_dir
+
+def resolve_cached(cache_dir, revision, offline, refresh):
+    """resolve_model_bundle() in this process with the network refused: (path, network attempts)"""
+    import socket
+
+    if offline:
+        os.environ["HF_HUB_OFFLINE"] = "1"
+    attempts = []
+
+    def refuse(*args, **kwargs):
+        attempts.append(args)
+        raise ConnectionRefusedError("network call during a cached resolve")
+    # Name lookups count too: they come first and fail on their own in a sandbox
+    socket.getaddrinfo = refuse
+    socket.socket.connect = lambda sock, address: refuse(address)
+    socket.socket.connect_ex = lambda sock, address: refuse(address)
+
+    from model_bundle import resolve_model_bundle
+    return resolve_model_bundle(FAKE_REPO_ID, revision, cache_dir, refresh), len(attempts)
+
+def check_hf_cache(bundle_dir, cache_dir):
+    """Resolve the fake cache by sha and by branch, with and without a refresh; returns a list of failures"""
+    from model_bundle import bundle_fingerprint, source_fingerprint
+
+    snapshot_dir = build_fake_hf_cache(bundle_dir, cache_dir)
+    failures = []
+    print(f"\n{'revision':12}{'HF_HUB_OFFLINE':>16}{'refresh':>9}{'network':>10}  resolved")
+    for revision, offline, refresh, expect_network in [
+        (FAKE_COMMIT, False, False, False),   # sha: cache first, never the network
+        (FAKE_COMMIT, False, True, False),    # a sha never moves, so a refresh does not ask either
+        ("main", False, False, False),        # branch: refs/main in the cache
+        ("main", True, True, False),          # refresh, but offline
+        ("main", False, True, True),          # refresh: asks the hub, falls back to the cache
+    ]:
+        try:
+            path, attempts = run_fresh(resolve_cached, cache_dir, revision, offline, refresh)
+        except Exception as e:
+            failures.append(f"{revision} (offline={offline}, refresh={refresh}) did not resolve: {e!r}")
+            continue
+        print(f"{revision[:10]:12}{str(offline):>16}{str(refresh):>9}{attempts:>10}  {path}")
+        if os.path.realpath(path) != os.path.realpath(snapshot_dir):
+            failures.append(f"{revision} resolved to {path} instead of the cached snapshot")
+        if (attempts > 0) != expect_network:
+            failures.append(f"{revision} (offline={offline}, refresh={refresh}) made {attempts} network attempts")
+    if source_fingerprint(snapshot_dir) != bundle_fingerprint(bundle_dir):
+        failures.append("cached bundle fingerprint differs from the bundle")
+    return failures
+
+# ============================================
+# MEASURED LOADS (each in a fresh process)
+# ============================================
+def _measure(load):
+    """Run load() and return its seconds plus peak/final/anonymous/file-backed RSS growth in MB"""
+    reset_peak_rss()
+    rss_start = current_rss_mb()
+    anon_start, file_start = rss_breakdown_mb()
+    start = time.perf_counter()
+    model = load()
+    seconds = time.perf_counter() - start
+
+    # One forward pass so every weight page is actually resident
+    import torch
+    with torch.inference_mode():
+        model(input_ids=torch.ones((1, 8), dtype=torch.long))
+    anon, file_backed = rss_breakdown_mb()
+    result = {
+        "seconds": seconds,
+        "peak": peak_rss_mb() - rss_start,
+        "final": current_rss_mb() - rss_start,
+        "anon": anon - anon_start,
+        "file": file_backed - file_start,
+    }
+    del model
+    return result
+
+def load_legacy(base_dir, checkpoint_path):
+    os.environ["HF_HUB_OFFLINE"] = "1"
+    from model_bundle import BundleConfig, load_legacy_checkpoint
+    from transformers import DistilBertTokenizer
+
+    BundleConfig.BASE_MODEL = base_dir
+
+    def load():
+        DistilBertTokenizer.from_pretrained(base_dir)
+        return load_legacy_checkpoint(checkpoint_path)[0]
+    return _measure(load)
+
+def load_from_pretrained(bundle_dir):
+    os.environ["HF_HUB_OFFLINE"] = "1"
+    from model_bundle import load_tokenizer
+    from transformers import DistilBertForSequenceClassification
+
+    def load():
+        load_tokenizer(bundle_dir)
+        return DistilBertForSequenceClassification.from_pretrained(bundle_dir, local_files_only=True)
+    return _measure(load)
+
+def load_from_bundle(bundle_dir):
+    os.environ["HF_HUB_OFFLINE"] = "1"
+    from model_bundle import load_bundle_model, load_tokenizer
+
+    def load():
+        load_tokenizer(bundle_dir)
+        return load_bundle_model(bundle_dir)[0]
+    return _measure(load)
+
+def run_isolated(fn, *args):
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        # Import torch/transformers first so only the load itself is measured
+        pool.submit(_preimport).result()
+        return pool.submit(fn, *args).result()
+
+def run_fresh(fn, *args):
+    """fn in a new process with nothing imported yet (huggingface_hub reads HF_HUB_OFFLINE at import)"""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(fn, *args).result()
+
+def _preimport():
+    import torch, transformers  # noqa: F401
+
+# ============================================
+# MAIN
+# ============================================
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark legacy checkpoint vs bundle cold start")
+    parser.add_argument("--hub-dir", default=None, help="Reuse a fake hub directory")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--check", action="store_true",
+                        help="Fail unless the mmap load lowers peak RSS and keeps weights file-backed")
+    args = parser.parse_args()
+
+    hub_dir = args.hub_dir or tempfile.mkdtemp(prefix="fake_hub_")
+    base_dir, checkpoint_path, bundle_dir = fake_hub_paths(hub_dir)
+    if not os.path.exists(bundle_dir):
+        print(f"🏗️  Building fake hub in {hub_dir}...")
+        build_fake_hub(hub_dir)
+
+    print(f"\n{'path':16}{'cold start s':>14}{'peak Δ MB':>12}{'final Δ MB':>12}"
+          f"{'anon Δ MB':>12}{'file Δ MB':>12}")
+    results = {}
+    for name, fn, fn_args in [
+        ("legacy", load_legacy, (base_dir, checkpoint_path)),
+        ("from_pretrained", load_from_pretrained, (bundle_dir,)),
+        ("bundle (mmap)", load_from_bundle, (bundle_dir,)),
+    ]:
+        runs = [run_isolated(fn, *fn_args) for _ in range(args.repeats)]
+        best = {key: min(r[key] for r in runs) for key in runs[0]}
+        results[name] = best
+        print(f"{name:16}{best['seconds']:>14.2f}{best['peak']:>12.1f}{best['final']:>12.1f}"
+              f"{best['anon']:>12.1f}{best['file']:>12.1f}")
+
+    failures = check_hf_cache(bundle_dir, os.path.join(hub_dir, "hf_cache"))
+
+    if args.check:
+        weights_mb = os.path.getsize(os.path.join(bundle_dir, "model.safetensors")) / (1024 * 1024)
+        legacy, mmap = results["legacy"], results["bundle (mmap)"]
+        if mmap["peak"] >= legacy["peak"] * 0.75:
+            failures.append(f"peak RSS {mmap['peak']:.0f} MB is not well below legacy {legacy['peak']:.0f} MB")
+        if mmap["anon"] >= weights_mb * 0.5:
+            failures.append(f"{mmap['anon']:.0f} MB of anonymous memory for {weights_mb:.0f} MB of weights")
+        if failures:
+            print("\n❌ " + "\n❌ ".join(failures))
+            sys.exit(1)
+        print("\n✅ mmap load keeps a single, file-backed copy of the weights, cached bundles resolve offline")
+    elif failures:
+        print("\n⚠️ " + "\n⚠️ ".join(failures))
+
+if __name__ == "__main__":
+    main()
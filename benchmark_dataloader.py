@@ -0,0 +1,115 @@
+"""
+benchmark_dataloader.py - Open time, memory and loader throughput: pickled EmailDataset vs token shards
+Builds a synthetic split of MAX_LENGTH-padded rows in both formats and reads each in a fresh process.
+Run: python benchmark_dataloader.py --rows 50000
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from bench_utils import current_rss_mb, peak_rss_mb, reset_peak_rss
+
+VOCAB_SIZE = 50265
+NUM_LABELS = 5
+
+def build_split(out_dir, rows, max_length, seed=42):
+    """Write the same random split as a legacy train_dataset.pt and as token shards"""
+    import torch
+    from prepare_dataloader_final import EmailDataset
+    from token_shards import ShardWriter
+
+    rng = np.random.default_rng(seed)
+    lengths = np.clip(rng.lognormal(4.0, 0.6, rows).astype(int), 8, max_length)
+    input_ids, attention_mask = [], []
+    for length in lengths:
+        ids = rng.integers(5, VOCAB_SIZE, length).tolist()
+        input_ids.append(ids + [1] * (max_length - length))
+        attention_mask.append([1] * length + [0] * (max_length - length))
+    labels = rng.integers(0, NUM_LABELS, rows)
+
+    legacy_path = os.path.join(out_dir, "train_dataset.pt")
+    torch.save(EmailDataset({"input_ids": input_ids, "attention_mask": attention_mask}, labels), legacy_path)
+
+    shard_dir = os.path.join(out_dir, "train_tokens")
+    writer = ShardWriter(shard_dir, max_length, pad_token_id=1)
+    shard_rows = 10000
+    for start in range(0, rows, shard_rows):
+        end = start + shard_rows
+        writer.write(input_ids[start:end], attention_mask[start:end], labels[start:end])
+    writer.close()
+    return legacy_path, shard_dir
+
+def _open_legacy(path):
+    import torch
+    return torch.load(path, weights_only=False)
+
+def _open_shards(path):
+    from token_shards import TokenShardDataset
+    return TokenShardDataset(path)
+
+def measure(fmt, path, batch_size, batches):
+    """Open the dataset, then pull `batches` shuffled batches through a DataLoader"""
+    import torch
+    from torch.utils.data import DataLoader
+
+    torch.manual_seed(0)
+    reset_peak_rss()
+    rss_start = current_rss_mb()
+    start = time.perf_counter()
+    dataset = _open_legacy(path) if fmt == "legacy" else _open_shards(path)
+    open_seconds = time.perf_counter() - start
+    rss_open = current_rss_mb() - rss_start
+
+    loader = DataLoader(dataset, batch_size=batch_size, shuffle=True, num_workers=0)
+    start = time.perf_counter()
+    seen = 0
+    for i, batch in enumerate(loader):
+        seen += len(batch["labels"])
+        if i + 1 == batches:
+            break
+    seconds = time.perf_counter() - start
+    return {
+        "open_seconds": open_seconds,
+        "rss_open": rss_open,
+        "peak": peak_rss_mb() - rss_start,
+        "samples_per_sec": seen / seconds,
+    }
+
+def _preimport():
+    import torch  # noqa: F401
+    import prepare_dataloader_final  # noqa: F401
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pickled vs memory-mapped training data")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--max-length", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--batches", type=int, default=500)
+    parser.add_argument("--data-dir", default=None, help="Reuse a directory built by an earlier run")
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="loader_bench_")
+    legacy_path = os.path.join(data_dir, "train_dataset.pt")
+    shard_dir = os.path.join(data_dir, "train_tokens")
+    if not os.path.exists(legacy_path):
+        os.makedirs(data_dir, exist_ok=True)
+        print(f"🏗️  Writing {args.rows} rows in both formats to {data_dir}...")
+        build_split(data_dir, args.rows, args.max_length)
+
+    print(f"\n{'format':10}{'open s':>10}{'RSS after open MB':>19}{'peak Δ MB':>12}{'samples/s':>12}")
+    context = multiprocessing.get_context("spawn")
+    for fmt, path in [("legacy", legacy_path), ("shards", shard_dir)]:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            executor.submit(_preimport).result()
+            result = executor.submit(measure, fmt, path, args.batch_size, args.batches).result()
+        print(f"{fmt:10}{result['open_seconds']:>10.2f}{result['rss_open']:>19.1f}"
+              f"{result['peak']:>12.1f}{result['samples_per_sec']:>12.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+benchmark_long_inputs.py - Latency vs email length: truncation, sliding windows, or a larger max_length
+"truncate" is today's max_length=64 path, "windows" classifies overlapping
+64-token windows in one batched pass, "raised" truncates at --raised-length.
+Run: python benchmark_long_inputs.py --checkpoint ultra_fast_model.pt --lengths 32 64 128 256 512 1024
+"""
+
+import argparse
+import time
+
+import torch
+
+from batch_inference import classify_texts, split_windows
+from bench_utils import percentile
+from model_loader import load_classifier
+
+SAMPLE_SENTENCES = [
+    "Hi team, I am writing about the order we placed last month.",
+    "The delivery arrived late and two of the items were damaged.",
+    "Could you send us your latest catalog and volume pricing?",
+    "We would also like to discuss a longer term partnership.",
+    "Please let me know when someone from sales is available for a call.",
+]
+
+def make_email(tokenizer, num_tokens):
+    """Text of roughly num_tokens tokens built from email-like sentences"""
+    sentences, length = [], 0
+    while length < num_tokens:
+        sentence = SAMPLE_SENTENCES[len(sentences) % len(SAMPLE_SENTENCES)]
+        sentences.append(sentence)
+        length += len(tokenizer.tokenize(sentence))
+    return " ".join(sentences)
+
+def time_mode(fn, texts, iterations):
+    """Median milliseconds per email of fn(texts)"""
+    fn(texts)   # warm-up
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn(texts)
+        timings.append((time.perf_counter() - start) * 1000 / len(texts))
+    return percentile(timings, 50)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark long-email classification strategies")
+    parser.add_argument("--checkpoint", default="ultra_fast_model.pt", help="Model bundle or legacy checkpoint")
+    parser.add_argument("--lengths", nargs="+", type=int, default=[32, 64, 128, 256, 512, 1024])
+    parser.add_argument("--max-length", type=int, default=64)
+    parser.add_argument("--raised-length", type=int, default=512, help="max_length of the 'raised' mode")
+    parser.add_argument("--aggregation", default="mean")
+    parser.add_argument("--batch-size", type=int, default=8, help="Emails per call for the batched columns")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    model, tokenizer, _ = load_classifier(args.checkpoint, precision="fp32", backend="eager", early_exit=False)
+
+    modes = {
+        "truncate": lambda texts: classify_texts(model, tokenizer, texts, max_length=args.max_length),
+        "windows": lambda texts: classify_texts(model, tokenizer, texts, max_length=args.max_length,
+                                                long_input=args.aggregation),
+        "raised": lambda texts: classify_texts(model, tokenizer, texts, max_length=args.raised_length,
+                                               max_tokens=args.raised_length * args.batch_size),
+    }
+
+    print("ms per email; 'seen' is the share of the email's tokens the model reads")
+    print(f"{'tokens':>7}{'mode':>10}{'seen':>7}{'1 email':>10}{f'{args.batch_size} emails':>11}")
+    for num_tokens in args.lengths:
+        text = make_email(tokenizer, num_tokens)
+        length = len(tokenizer.tokenize(text))
+        windows = split_windows(list(range(length)), args.max_length - 2)
+        content = {"truncate": args.max_length - 2, "raised": args.raised_length - 2,
+                   "windows": len({token for window in windows for token in window})}
+        for name, fn in modes.items():
+            single = time_mode(fn, [text], args.iterations)
+            batched = time_mode(fn, [text] * args.batch_size, args.iterations)
+            seen = min(1.0, content[name] / length)
+            print(f"{length:>7}{name:>10}{seen:>7.0%}{single:>10.2f}{batched:>11.2f}")
+
+if __name__ == "__main__":
+    main()
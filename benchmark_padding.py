@@ -0,0 +1,99 @@
+"""
+benchmark_padding.py - Training and evaluation throughput: split-wide padding vs length-bucketed batches
+"padded" feeds random batches padded to the longest row in the split (the old
+padding=True behaviour); "bucketed" uses LengthBucketBatchSampler + PadCollator.
+Run: python benchmark_padding.py [--split dataset_splits/train_tokens] --batches 20
+(without --split a synthetic split with email-like lengths is written to a temp dir)
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+import torch
+from torch.utils.data import BatchSampler, DataLoader, RandomSampler
+from transformers import DistilBertConfig, DistilBertForSequenceClassification
+
+from token_shards import (LengthBucketBatchSampler, PadCollator, ShardWriter, TokenShardDataset,
+                          padding_waste)
+
+def build_synthetic_split(split_dir, rows, max_length, seed=42):
+    """Unpadded rows with a long-tailed length distribution, like real emails"""
+    rng = np.random.default_rng(seed)
+    lengths = np.clip(rng.lognormal(4.0, 0.6, rows).astype(int), 8, max_length)
+    input_ids = [rng.integers(5, 30000, length).tolist() for length in lengths]
+    attention_mask = [[1] * length for length in lengths]
+    writer = ShardWriter(split_dir, max_length, pad_token_id=0)
+    writer.write(input_ids, attention_mask, rng.integers(0, 5, rows))
+    writer.close()
+
+def make_loader(dataset, mode, batch_size):
+    lengths = dataset.lengths()
+    if mode == "padded":
+        sampler = BatchSampler(RandomSampler(dataset), batch_size, drop_last=False)
+        collate = PadCollator(dataset.pad_token_id, pad_to_multiple_of=int(lengths.max()))
+    else:
+        sampler = LengthBucketBatchSampler(lengths, batch_size)
+        collate = PadCollator(dataset.pad_token_id)
+    return DataLoader(dataset, batch_sampler=sampler, collate_fn=collate), sampler
+
+def run(model, loader, batches, train):
+    """Samples/sec over `batches` batches (one warm-up batch not counted)"""
+    optimizer = torch.optim.AdamW(model.parameters(), lr=1e-5) if train else None
+    model.train(train)
+    samples = 0
+    start = None
+    for i, batch in enumerate(loader):
+        if i == 1:
+            start = time.perf_counter()
+        if train:
+            loss = model(**batch).loss
+            loss.backward()
+            optimizer.step()
+            optimizer.zero_grad()
+        else:
+            with torch.inference_mode():
+                model(input_ids=batch["input_ids"], attention_mask=batch["attention_mask"])
+        if i >= 1:
+            samples += len(batch["labels"])
+        if i == batches:
+            break
+    return samples / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark padded vs length-bucketed batches")
+    parser.add_argument("--split", default=None, help="Token-shard split written by prepare_dataloader_final.py")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--max-length", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--batches", type=int, default=20)
+    args = parser.parse_args()
+
+    split_dir = args.split
+    if split_dir is None:
+        split_dir = tempfile.mkdtemp(prefix="padding_bench_") + "/train_tokens"
+        build_synthetic_split(split_dir, args.rows, args.max_length)
+    dataset = TokenShardDataset(split_dir)
+    lengths = dataset.lengths()
+    print(f"📊 {len(dataset)} rows, mean length {lengths.mean():.1f}, max {lengths.max()}")
+
+    torch.manual_seed(0)
+    model = DistilBertForSequenceClassification(DistilBertConfig(num_labels=5))
+
+    print(f"\n{'mode':10}{'pad waste':>11}{'train samples/s':>17}{'eval samples/s':>16}")
+    results = {}
+    for mode in ("padded", "bucketed"):
+        loader, sampler = make_loader(dataset, mode, args.batch_size)
+        # Padded batches all reach the split's longest row, as if the split were one batch
+        waste = padding_waste(lengths, [np.arange(len(lengths))] if mode == "padded" else sampler.batches())
+        train_rate = run(model, loader, args.batches, train=True)
+        eval_rate = run(model, loader, args.batches, train=False)
+        results[mode] = (train_rate, eval_rate)
+        print(f"{mode:10}{waste:>11.1%}{train_rate:>17.1f}{eval_rate:>16.1f}")
+
+    (padded_train, padded_eval), (bucketed_train, bucketed_eval) = results["padded"], results["bucketed"]
+    print(f"\n✅ Speedup: training {bucketed_train / padded_train:.2f}x, evaluation {bucketed_eval / padded_eval:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+benchmark_sessions.py - Latency under concurrent sessions, with and without the inference executor
+"unbounded" lets every session thread run the shared model with torch's default
+thread count, as Streamlit sessions did; "executor" goes through InferenceExecutor.
+Run: python benchmark_sessions.py --model model_bundle/release --sessions 1 4 16 --max-concurrent 2
+(without --model a fake full-size bundle is built in a temp dir)
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+import torch
+
+from batch_inference import classify_texts
+from bench_utils import percentile
+from inference_executor import InferenceExecutor, default_threads_per_pass
+from model_loader import load_classifier
+
+SAMPLE_TEXTS = [
+    "I want to complain about my order, it arrived broken",
+    "Could you send me your catalog and pricing?",
+    "We see strong potential for a partnership between our companies in the Mumbai region",
+    "Can we negotiate a better price for a bulk order of 500 units?",
+    "Our new product line launches next week, would you like a demo?",
+]
+
+def run_sessions(classify, sessions, requests_per_session):
+    """(latencies in ms, elapsed seconds) with `sessions` threads each classifying one email at a time"""
+    latencies = []
+    lock = threading.Lock()
+
+    def session(index):
+        mine = []
+        for i in range(requests_per_session):
+            start = time.perf_counter()
+            classify(SAMPLE_TEXTS[(index + i) % len(SAMPLE_TEXTS)])
+            mine.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent sessions against the shared model")
+    parser.add_argument("--model", default=None, help="Bundle directory or legacy .pt checkpoint")
+    parser.add_argument("--sessions", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=20, help="Emails classified by each session")
+    parser.add_argument("--max-concurrent", type=int, default=1, help="Executor slots")
+    parser.add_argument("--threads-per-pass", type=int, default=None, help="Default: cores / slots")
+    args = parser.parse_args()
+
+    model_path = args.model
+    if model_path is None:
+        from benchmark_bundle import build_fake_hub, fake_hub_paths
+
+        hub_dir = tempfile.mkdtemp(prefix="fake_hub_")
+        print(f"🏗️  Building fake bundle in {hub_dir}...")
+        build_fake_hub(hub_dir)
+        model_path = fake_hub_paths(hub_dir)[2]
+
+    model, tokenizer, _ = load_classifier(model_path, early_exit=False)
+
+    def classify(text):
+        return classify_texts(model, tokenizer, [text])
+
+    cores = os.cpu_count() or 1
+    threads_per_pass = args.threads_per_pass or default_threads_per_pass(args.max_concurrent)
+    print(f"{cores} cores; executor: {args.max_concurrent} slot(s) x {threads_per_pass} thread(s)")
+    print(f"{'sessions':>9}{'mode':>11}{'emails/s':>10}{'p50 ms':>9}{'p99 ms':>9}"
+          f"{'wait p50':>10}{'compute p50':>13}")
+
+    for sessions in args.sessions:
+        torch.set_num_threads(cores)
+        classify(SAMPLE_TEXTS[0])   # warm-up
+        latencies, elapsed = run_sessions(classify, sessions, args.requests)
+        print(f"{sessions:>9}{'unbounded':>11}{len(latencies) / elapsed:>10.1f}"
+              f"{percentile(latencies, 50):>9.1f}{percentile(latencies, 99):>9.1f}{'-':>10}{'-':>13}")
+
+        executor = InferenceExecutor(args.max_concurrent, threads_per_pass, queue_timeout=600)
+        executor.run(classify, SAMPLE_TEXTS[0])   # warm-up
+        latencies, elapsed = run_sessions(lambda text: executor.run(classify, text), sessions, args.requests)
+        stats = executor.stats()
+        print(f"{sessions:>9}{'executor':>11}{len(latencies) / elapsed:>10.1f}"
+              f"{percentile(latencies, 50):>9.1f}{percentile(latencies, 99):>9.1f}"
+              f"{stats['wait_ms_p50']:>10.1f}{stats['compute_ms_p50']:>13.1f}")
+
+if __name__ == "__main__":
+    main()
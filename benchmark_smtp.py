@@ -0,0 +1,93 @@
+"""
+benchmark_smtp.py - Per-send latency of a fresh SMTP connection per email vs the SmtpPool
+Runs against local_smtp.py's stand-in (STARTTLS + AUTH on 127.0.0.1), then checks that
+the pool reconnects after a server-side drop and evicts idle connections.
+Run: python benchmark_smtp.py --sends 50
+"""
+
+import argparse
+import smtplib
+import sys
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from bench_utils import percentile
+from local_smtp import LocalSmtpServer, client_context
+from smtp_pool import SmtpPool
+
+USER, PASSWORD = "sender@example.com", "app-password"
+
+def make_message(i):
+    msg = MIMEMultipart()
+    msg['From'] = USER
+    msg['To'] = f"recipient{i}@example.com"
+    msg['Subject'] = f"Benchmark {i}"
+    msg.attach(MIMEText("Dear recipient,\n\nThis is a benchmark email.\n\nBest regards", 'plain'))
+    return msg
+
+def send_fresh(server, msg, tls):
+    """What step_review() did before the pool: connect, STARTTLS, login, send, quit"""
+    connection = smtplib.SMTP(server.host, server.port)
+    if tls:
+        connection.starttls(context=client_context())
+    connection.login(USER, PASSWORD)
+    connection.send_message(msg)
+    connection.quit()
+
+def time_sends(send, sends):
+    latencies = []
+    for i in range(sends):
+        start = time.perf_counter()
+        send(make_message(i))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pooled vs per-email SMTP connections")
+    parser.add_argument("--sends", type=int, default=50)
+    parser.add_argument("--no-tls", action="store_true", help="Plain SMTP (no openssl needed)")
+    args = parser.parse_args()
+    tls = not args.no_tls
+
+    with LocalSmtpServer(tls=tls) as server:
+        pool = SmtpPool(starttls=tls, ssl_context=client_context())
+        pooled = lambda msg: pool.send_message(msg, USER, PASSWORD, server.host, server.port)
+
+        results = {
+            "fresh": time_sends(lambda msg: send_fresh(server, msg, tls), args.sends),
+            "pooled": time_sends(pooled, args.sends),
+        }
+        print(f"\n📨 {args.sends} sends each to {server.host}:{server.port} "
+              f"(STARTTLS {'on' if tls else 'off'}, AUTH on)")
+        print(f"{'mode':>8}{'p50 ms':>9}{'p95 ms':>9}{'mean ms':>9}")
+        for mode, latencies in results.items():
+            print(f"{mode:>8}{percentile(latencies, 50):>9.2f}{percentile(latencies, 95):>9.2f}"
+                  f"{sum(latencies) / len(latencies):>9.2f}")
+        print(f"pool: {pool.stats()}")
+
+        # Server-side drop: the idle pooled connection is dead, the next send must still go through
+        server.restart()
+        pool.check_after = 3600   # skip the NOOP so the send itself hits the dead connection
+        pooled(make_message(-1))
+        server.restart()
+        pool.check_after = 0      # NOOP catches it before the send
+        pooled(make_message(-2))
+        stats = pool.stats()
+        print(f"after two server drops: {stats}")
+
+        evicted = pool.evict_idle(max_idle=0)
+        print(f"idle eviction closed {evicted} connection(s)")
+        pool.close()
+
+        delivered = len(server.messages)
+        expected = 2 * args.sends + 2
+        print(f"delivered {delivered}/{expected}")
+
+    ok = (delivered == expected and stats["reconnects"] == 1 and stats["health_checks"] >= 1 and evicted == 1
+          and percentile(results["pooled"], 50) < percentile(results["fresh"], 50))
+    print("✅ pool checks passed" if ok else "❌ pool checks failed")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+benchmark_workers.py - Memory and throughput of the forked worker pool as workers grow
+Run: python benchmark_workers.py --model model_bundle/release --workers 1 2 4 8
+(without --model a fake full-size bundle is built in a temp dir)
+"""
+
+import argparse
+import multiprocessing
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from bench_utils import process_memory_mb
+
+SAMPLE_TEXTS = [
+    "I want to complain about my order, it arrived broken",
+    "Could you send me your catalog and pricing?",
+    "We see strong potential for a partnership between our companies in the Mumbai region",
+    "Can we negotiate a better price for a bulk order of 500 units?",
+    "Our new product line launches next week, would you like a demo?",
+]
+
+def run_pool(model_path, num_workers, threads_per_worker, requests, batch_size, clients):
+    """Start a pool, push `requests` batches through it and measure memory and rate"""
+    from model_loader import load_classifier
+    from worker_pool import InferencePool
+
+    pool = InferencePool(lambda: load_classifier(model_path),
+                         num_workers=num_workers, threads_per_worker=threads_per_worker)
+    batch = (SAMPLE_TEXTS * (batch_size // len(SAMPLE_TEXTS) + 1))[:batch_size]
+    try:
+        # Warm every worker once
+        for future in [pool.submit(batch) for _ in range(num_workers * 2)]:
+            future.result()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            list(executor.map(lambda _: pool.submit(batch).result(), range(requests)))
+        elapsed = time.perf_counter() - start
+
+        parent = process_memory_mb()
+        workers = [process_memory_mb(p.pid) for p in pool.workers]
+        return {
+            "requests_per_sec": requests / elapsed,
+            "emails_per_sec": requests * batch_size / elapsed,
+            "parent_rss": parent["rss"],
+            "worker_uss": sum(w["uss"] for w in workers) / len(workers),
+            "total_pss": parent["pss"] + sum(w["pss"] for w in workers),
+        }
+    finally:
+        pool.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the forked inference worker pool")
+    parser.add_argument("--model", default=None, help="Bundle directory or legacy .pt checkpoint")
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4])
+    parser.add_argument("--threads-per-worker", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args()
+
+    model_path = args.model
+    if model_path is None:
+        from benchmark_bundle import build_fake_hub, fake_hub_paths
+
+        hub_dir = tempfile.mkdtemp(prefix="fake_hub_")
+        print(f"🏗️  Building fake bundle in {hub_dir}...")
+        build_fake_hub(hub_dir)
+        model_path = fake_hub_paths(hub_dir)[2]
+
+    print(f"\n{'workers':>8}{'req/s':>10}{'emails/s':>11}{'parent RSS':>12}"
+          f"{'USS/worker':>12}{'total PSS':>11}   (MB)")
+    for num_workers in args.workers:
+        # Each pool runs in a fresh child so earlier runs do not pollute memory numbers
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = executor.submit(run_pool, model_path, num_workers, args.threads_per_worker,
+                                     args.requests, args.batch_size, num_workers * 2).result()
+        print(f"{num_workers:>8}{result['requests_per_sec']:>10.1f}{result['emails_per_sec']:>11.1f}"
+              f"{result['parent_rss']:>12.1f}{result['worker_uss']:>12.1f}{result['total_pss']:>11.1f}")
+
+if __name__ == "__main__":
+    main()
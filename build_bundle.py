@@ -0,0 +1,42 @@
+"""
+build_bundle.py - Turn ultra_fast_model.pt into a self-contained model bundle
+(weights are rewritten from the pickle into a memory-mappable model.safetensors)
+Run: python build_bundle.py --checkpoint ultra_fast_model.pt --out model_bundle/release
+"""
+
+import argparse
+import os
+
+from model_bundle import BundleConfig, convert_checkpoint, read_manifest
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a versioned model bundle")
+    parser.add_argument("--checkpoint", default="ultra_fast_model.pt")
+    parser.add_argument("--out", default=os.path.join(BundleConfig.LOCAL_BUNDLE_DIR, "release"))
+    parser.add_argument("--push", metavar="REPO_ID", default=None,
+                        help=f"Upload to <REPO_ID>/{BundleConfig.SUBFOLDER} (token from HF_TOKEN)")
+    args = parser.parse_args()
+
+    print(f"📁 Converting {args.checkpoint}...")
+    convert_checkpoint(args.checkpoint, args.out)
+    manifest = read_manifest(args.out)
+
+    print(f"✅ Bundle v{manifest['version']} written to {args.out}")
+    print(f"  labels : {', '.join(manifest['labels'])}")
+    print(f"  weights: sha256 {manifest['weights_sha256'][:16]}...")
+
+    if args.push:
+        from huggingface_hub import HfApi
+
+        api = HfApi(token=os.environ.get("HF_TOKEN"))
+        commit = api.upload_folder(
+            folder_path=args.out,
+            path_in_repo=BundleConfig.SUBFOLDER,
+            repo_id=args.push,
+            repo_type="model",
+            commit_message=f"Add model bundle v{manifest['version']}",
+        )
+        print(f"🌐 Uploaded. Pin it with EMAIL_AI_MODEL_REVISION={commit.oid}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+bulk_io.py - Streaming record readers and a resumable progress file for bulk classification
+"""
+
+import csv
+import json
+import os
+import sys
+
+INPUT_FORMATS = ("csv", "jsonl")
+
+# Archived emails can hold fields far beyond csv's 128 KB default
+csv.field_size_limit(2 ** 31 - 1)
+
+# ============================================
+# INPUT
+# ============================================
+def detect_format(path):
+    """csv or jsonl from the file extension (stdin is read as JSONL)"""
+    if path == "-":
+        return "jsonl"
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".ndjson", ".json"):
+        return "jsonl"
+    raise ValueError(f"Cannot tell the format of {path}; pass --format {'|'.join(INPUT_FORMATS)}")
+
+def input_size(path):
+    """Size in bytes for an ETA, or None for stdin and pipes"""
+    if path == "-" or not os.path.isfile(path):
+        return None
+    return os.path.getsize(path)
+
+class ByteCounter:
+    """Decoded lines of a binary stream, counting the bytes read so far"""
+
+    def __init__(self, binary_file, bytes_read=0):
+        self.binary_file = binary_file
+        self.bytes_read = bytes_read
+
+    def __iter__(self):
+        for raw in self.binary_file:
+            line = raw.decode("utf-8")
+            if self.bytes_read == 0:
+                line = line.lstrip("\ufeff")
+            self.bytes_read += len(raw)
+            yield line
+
+def open_input(path, offset=0):
+    """ByteCounter over the file at path from byte offset, or over stdin for '-'"""
+    if path == "-":
+        return ByteCounter(sys.stdin.buffer)
+    binary_file = open(path, "rb")
+    binary_file.seek(offset)
+    return ByteCounter(binary_file, offset)
+
+def csv_header(path):
+    """Column names from the first row of a CSV file (for reading it from a later offset)"""
+    with open(path, "rb") as f:
+        return next(csv.reader(ByteCounter(f)), None)
+
+def iter_records(lines, fmt, text_column, id_column=None, fieldnames=None):
+    """Yield (record id, text) one record at a time
+
+    fieldnames is the CSV header when lines start past it.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(lines, fieldnames=fieldnames)
+        if text_column not in (reader.fieldnames or []):
+            raise ValueError(f"Input has no '{text_column}' column (columns: {reader.fieldnames})")
+        rows = reader
+    else:
+        rows = (json.loads(line) for line in lines if line.strip())
+    for row in rows:
+        text = row.get(text_column)
+        yield (row.get(id_column) if id_column else None), "" if text is None else str(text)
+
+# ============================================
+# PROGRESS
+# ============================================
+def progress_path(output_path):
+    return output_path + ".progress"
+
+def read_progress(output_path):
+    """{'rows', 'output_bytes', 'input', 'input_bytes'} of the last completed chunk, or None"""
+    path = progress_path(output_path)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def write_progress(output_path, rows, output_bytes, input_path, input_bytes):
+    """Record that the first `rows` records, up to input byte `input_bytes`, fill `output_bytes` of output"""
+    path = progress_path(output_path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"rows": rows, "output_bytes": output_bytes, "input": input_path, "input_bytes": input_bytes}, f)
+    os.replace(tmp_path, path)
@@ -0,0 +1,369 @@
+"""
+bulk_send.py - Mail-merge an intent template to a CSV of recipients over concurrent SMTP connections
+Every row gets its own body (its name and company in the email_templates.py template).
+Sends run on an asyncio pipeline:
+- a bounded number of logged-in connections, so only that many sends are in flight
+- a rate limit shared by every bulk run in the process that sends through the same server
+- retries with exponential backoff for temporary failures (4xx replies, dropped connections, timeouts)
+- one status row per recipient in the report CSV
+--resume skips the recipients an earlier report already marks as sent (or invalid).
+Run: python bulk_send.py --recipients leads.csv --intent sales --message "..." --user me@gmail.com
+"""
+
+import argparse
+import asyncio
+import csv
+import getpass
+import logging
+import os
+import random
+import ssl
+import threading
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import parseaddr
+
+import aiosmtplib
+
+from email_templates import TEMPLATES, default_subject, render_email
+from metrics import ERRORS, REQUESTS, timed
+from smtp_pool import SmtpConfig
+
+logger = logging.getLogger(__name__)
+
+# ============================================
+# CONFIGURATION
+# ============================================
+class BulkConfig:
+    # Logged-in connections (and so sends in flight) per bulk run
+    MAX_IN_FLIGHT = int(os.environ.get("EMAIL_AI_BULK_MAX_IN_FLIGHT", "4"))
+    # Messages per second per SMTP server, across all bulk runs in the process (0: no limit)
+    RATE = float(os.environ.get("EMAIL_AI_BULK_RATE", "5"))
+    MAX_ATTEMPTS = int(os.environ.get("EMAIL_AI_BULK_MAX_ATTEMPTS", "4"))
+    # First retry waits about this long, every further retry twice as long (capped at MAX_BACKOFF_SECONDS)
+    BACKOFF_SECONDS = float(os.environ.get("EMAIL_AI_BULK_BACKOFF_SECONDS", "2"))
+    MAX_BACKOFF_SECONDS = float(os.environ.get("EMAIL_AI_BULK_MAX_BACKOFF_SECONDS", "60"))
+
+REPORT_FIELDS = ["row", "email", "status", "attempts", "code", "error", "seconds"]
+FINISHED_STATUSES = ("sent", "invalid")   # not sent again by --resume
+
+# Recipients whose rows are read ahead of the sends, beyond the ones in flight
+QUEUED_PER_CONNECTION = 4
+
+# ============================================
+# RATE LIMITS
+# ============================================
+class RateLimiter:
+    """Spaces sends 1/rate seconds apart; thread-safe, so runs on different event loops can share it"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Seconds the caller must wait before its send"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+            return slot - now
+
+    async def wait(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def server_limiter(host, port, rate):
+    """The process-wide RateLimiter of host:port, now spacing sends for rate"""
+    with _limiters_lock:
+        limiter = _limiters.setdefault((host, port), RateLimiter(rate))
+        limiter.interval = 1.0 / rate if rate > 0 else 0.0
+        return limiter
+
+# ============================================
+# MAIL MERGE
+# ============================================
+def read_recipients(lines, email_column="email"):
+    """csv.DictReader over lines, checking that the email column is there"""
+    reader = csv.DictReader(lines)
+    if email_column not in (reader.fieldnames or []):
+        raise ValueError(f"Recipients have no '{email_column}' column (columns: {reader.fieldnames})")
+    return reader
+
+def valid_address(address):
+    _, parsed = parseaddr(address)
+    local, _, domain = parsed.partition("@")
+    return bool(local) and "." in domain and parsed == address
+
+def build_message(row, intent, message, user_email, user_name="", company="", subject=None, email_column="email"):
+    """(address, MIME message) for one recipient row
+
+    The row's own 'intent', 'message' and 'subject' columns win over the
+    campaign-wide values; 'name' and 'company' fill the template.
+    """
+    intent = (row.get("intent") or intent or "").strip().lower()
+    body = render_email(
+        intent,
+        rec_name=(row.get("name") or "").strip(),
+        rec_company=(row.get("company") or "").strip(),
+        message=row.get("message") or message,
+        user_name=user_name,
+        company=company,
+        user_email=user_email
+    )
+    address = (row.get(email_column) or "").strip()
+    msg = MIMEMultipart()
+    msg['From'] = user_email
+    msg['To'] = address
+    msg['Subject'] = row.get("subject") or subject or default_subject(intent)
+    msg.attach(MIMEText(body, 'plain'))
+    return address, msg
+
+def merge(rows, intent, message, user_email, user_name="", company="", subject=None,
+          email_column="email", skip=()):
+    """Yield (row number, address, message) per recipient row; message is None for an invalid address
+
+    Rows whose address is in skip (finished by an earlier run) are left out.
+    """
+    for number, row in enumerate(rows, start=1):
+        address, msg = build_message(row, intent, message, user_email, user_name, company, subject, email_column)
+        if address in skip:
+            continue
+        yield number, address, msg if valid_address(address) else None
+
+# ============================================
+# SENDING
+# ============================================
+def is_temporary(error):
+    """Whether a failed send is worth retrying: 4xx replies, dropped connections and timeouts"""
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        return all(400 <= refused.code < 500 for refused in error.recipients)
+    if isinstance(error, aiosmtplib.SMTPResponseException):
+        return 400 <= error.code < 500
+    return isinstance(error, (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPTimeoutError,
+                              aiosmtplib.SMTPConnectError, asyncio.TimeoutError, OSError))
+
+# The server answered with an error but the connection is still in a known state
+REPLY_ERRORS = (aiosmtplib.SMTPResponseException, aiosmtplib.SMTPRecipientsRefused)
+
+def describe_error(error):
+    """(SMTP reply code or "", message) for the report"""
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused) and error.recipients:
+        error = error.recipients[0]
+    if isinstance(error, aiosmtplib.SMTPResponseException):
+        return str(error.code), error.message
+    return "", str(error) or repr(error)
+
+class BulkSender:
+    """Sends (row, address, message) jobs from one account over up to max_in_flight connections
+
+    ssl_context is used for STARTTLS (default: certificate-verifying context).
+    """
+
+    def __init__(self, user, password, host=SmtpConfig.HOST, port=SmtpConfig.PORT,
+                 starttls=SmtpConfig.STARTTLS, timeout=SmtpConfig.TIMEOUT, ssl_context=None,
+                 max_in_flight=BulkConfig.MAX_IN_FLIGHT, rate=BulkConfig.RATE,
+                 max_attempts=BulkConfig.MAX_ATTEMPTS, backoff=BulkConfig.BACKOFF_SECONDS,
+                 max_backoff=BulkConfig.MAX_BACKOFF_SECONDS):
+        self.user = user
+        self.password = password
+        self.host = host
+        self.port = port
+        self.starttls = starttls
+        self.timeout = timeout
+        self.ssl_context = ssl_context or ssl.create_default_context()
+        self.max_in_flight = max(1, max_in_flight)
+        self.limiter = server_limiter(host, port, rate)
+        self.max_attempts = max(1, max_attempts)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.counters = {"sent": 0, "failed": 0, "invalid": 0, "retries": 0, "connects": 0}
+
+    async def _connect(self):
+        connection = aiosmtplib.SMTP(hostname=self.host, port=self.port, timeout=self.timeout,
+                                     start_tls=self.starttls, tls_context=self.ssl_context)
+        with timed("smtp_connect"):
+            await connection.connect()
+            try:
+                await connection.login(self.user, self.password)
+            except Exception:
+                connection.close()
+                raise
+        self.counters["connects"] += 1
+        return connection
+
+    def _retry_delay(self, attempt):
+        return min(self.max_backoff, self.backoff * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+    async def _send_one(self, number, address, msg, slots, idle):
+        """Status row for one recipient, after up to max_attempts tries"""
+        started = time.perf_counter()
+        result = {"row": number, "email": address, "attempts": 0, "code": "", "error": ""}
+        REQUESTS.labels(kind="bulk_send").inc()
+        if msg is None:
+            result.update(status="invalid", error="Invalid email address")
+        while msg is not None:
+            result["attempts"] += 1
+            async with slots:
+                connection = idle.pop() if idle else None
+                try:
+                    if connection is None:
+                        connection = await self._connect()
+                    await self.limiter.wait()
+                    with timed("smtp_send"):
+                        await connection.send_message(msg)
+                except Exception as e:
+                    # aiosmtplib resets the envelope after an error reply, so the connection stays usable
+                    if connection is not None and connection.is_connected and isinstance(e, REPLY_ERRORS):
+                        idle.append(connection)
+                    elif connection is not None:
+                        connection.close()
+                    error = e
+                else:
+                    idle.append(connection)
+                    result.update(status="sent", code="", error="")
+                    break
+            result["code"], result["error"] = describe_error(error)
+            if not is_temporary(error) or result["attempts"] >= self.max_attempts:
+                result["status"] = "failed"
+                break
+            self.counters["retries"] += 1
+            await asyncio.sleep(self._retry_delay(result["attempts"]))
+
+        self.counters[result["status"]] += 1
+        if result["status"] != "sent":
+            ERRORS.labels(kind="bulk_send").inc()
+        result["seconds"] = round(time.perf_counter() - started, 3)
+        return result
+
+    async def run(self, jobs, on_result=None):
+        """Send every job, calling on_result(status row) as each recipient finishes; returns the counters
+
+        Logs in once before the first send, so wrong credentials fail the run
+        instead of every recipient. on_result runs in this coroutine, so an
+        exception it raises (e.g. a stopped Streamlit page) stops the run.
+        """
+        slots = asyncio.Semaphore(self.max_in_flight)
+        # Jobs are read from the iterable only as fast as they are sent
+        max_queued = self.max_in_flight * QUEUED_PER_CONNECTION
+        idle = [await self._connect()]
+        tasks = set()
+
+        async def collect():
+            nonlocal tasks
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = task.result()
+                if on_result is not None:
+                    on_result(result)
+
+        try:
+            for number, address, msg in jobs:
+                if len(tasks) >= max_queued:
+                    await collect()
+                tasks.add(asyncio.ensure_future(self._send_one(number, address, msg, slots, idle)))
+            while tasks:
+                await collect()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for connection in idle:
+                try:
+                    await connection.quit()
+                except Exception:
+                    connection.close()
+        return dict(self.counters)
+
+    def send(self, jobs, on_result=None):
+        """run() on a fresh event loop (for callers that are not async themselves)"""
+        return asyncio.run(self.run(jobs, on_result))
+
+# ============================================
+# REPORT
+# ============================================
+def finished_addresses(report_path):
+    """Addresses an earlier report marks as sent or invalid; --resume retries only the failed ones"""
+    if not os.path.exists(report_path):
+        return set()
+    with open(report_path, newline="", encoding="utf-8") as f:
+        return {row["email"] for row in csv.DictReader(f) if row.get("status") in FINISHED_STATUSES}
+
+class ReportWriter:
+    """Appends one CSV row per finished recipient and flushes it, so an interrupted run keeps its report"""
+
+    def __init__(self, path, append=False):
+        new_file = not (append and os.path.exists(path) and os.path.getsize(path))
+        self.file = open(path, "a" if append else "w", newline="", encoding="utf-8")
+        self.writer = csv.DictWriter(self.file, fieldnames=REPORT_FIELDS)
+        if new_file:
+            self.writer.writeheader()
+
+    def __call__(self, result):
+        self.writer.writerow(result)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+# ============================================
+# MAIN
+# ============================================
+def main():
+    parser = argparse.ArgumentParser(description="Send a personalized intent template to every row of a CSV")
+    parser.add_argument("--recipients", required=True, help="CSV with an email column, optionally name, company, "
+                                                            "subject, intent and message")
+    parser.add_argument("--intent", choices=sorted(TEMPLATES), required=True)
+    parser.add_argument("--message", required=True, help="Your message, placed in every template")
+    parser.add_argument("--user", required=True, help="Sender address (SMTP login)")
+    parser.add_argument("--name", default="", help="Your name for the signature")
+    parser.add_argument("--company", default="", help="Your company for the signature")
+    parser.add_argument("--subject", default=None, help="Default: 'Regarding: <Intent>'")
+    parser.add_argument("--email-column", default="email")
+    parser.add_argument("--report", default="bulk_report.csv")
+    parser.add_argument("--resume", action="store_true", help="Only retry recipients --report marks as failed")
+    parser.add_argument("--max-in-flight", type=int, default=BulkConfig.MAX_IN_FLIGHT)
+    parser.add_argument("--rate", type=float, default=BulkConfig.RATE, help="Messages per second (0: no limit)")
+    parser.add_argument("--max-attempts", type=int, default=BulkConfig.MAX_ATTEMPTS)
+    args = parser.parse_args()
+
+    password = os.environ.get("EMAIL_AI_SMTP_PASSWORD") or getpass.getpass(f"🔑 App password for {args.user}: ")
+    skip = finished_addresses(args.report) if args.resume else set()
+    if skip:
+        print(f"⏩ Skipping {len(skip)} recipients already sent (or invalid) according to {args.report}")
+
+    sender = BulkSender(args.user, password, max_in_flight=args.max_in_flight, rate=args.rate,
+                        max_attempts=args.max_attempts)
+    report = ReportWriter(args.report, append=args.resume)
+    done = 0
+    started = time.perf_counter()
+
+    def on_result(result):
+        nonlocal done
+        report(result)
+        done += 1
+        if result["status"] != "sent":
+            print(f"❌ row {result['row']} {result['email']}: {result['status']} {result['error']}")
+        elif done % 100 == 0:
+            print(f"📨 {done} done, {done / (time.perf_counter() - started):.1f}/s")
+
+    with open(args.recipients, newline="", encoding="utf-8-sig") as f:
+        rows = read_recipients(f, args.email_column)
+        jobs = merge(rows, args.intent, args.message, args.user, args.name, args.company, args.subject,
+                     args.email_column, skip)
+        try:
+            counters = sender.send(jobs, on_result)
+        finally:
+            report.close()
+
+    print(f"✅ {counters['sent']} sent, {counters['failed']} failed, {counters['invalid']} invalid "
+          f"({counters['retries']} retries) in {time.perf_counter() - started:.1f}s; report: {args.report}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
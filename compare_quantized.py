@@ -0,0 +1,97 @@
+"""
+compare_quantized.py - Compare the fp32 and INT8 classifiers on a held-out split
+Run: python compare_quantized.py --checkpoint ultra_fast_model.pt --data dataset_splits/validation.xlsx
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+from bench_utils import percentile, current_rss_mb, load_heldout
+
+# ============================================
+# PER-PRECISION RUN (in its own process)
+# ============================================
+def build_int8_artifact(checkpoint_path):
+    """Make sure the cached INT8 model exists so its build is not measured"""
+    from model_loader import load_int8_model
+    load_int8_model(checkpoint_path)
+
+def run_precision(precision, checkpoint_path, texts, threads):
+    """Load one precision in a fresh process and time single-email predictions"""
+    import torch
+    from batch_inference import classify_texts
+    from model_loader import load_classifier
+
+    if threads:
+        torch.set_num_threads(threads)
+
+    rss_before = current_rss_mb()
+    model, tokenizer, encoder = load_classifier(checkpoint_path, precision=precision, backend="eager",
+                                                early_exit=False)
+    rss_loaded = current_rss_mb()
+
+    # Warm-up pass so lazy initialisation is not timed
+    classify_texts(model, tokenizer, texts[:1])
+
+    latencies, predictions = [], []
+    for text in texts:
+        start = time.perf_counter()
+        probs = classify_texts(model, tokenizer, [text])[0]
+        latencies.append((time.perf_counter() - start) * 1000)
+        predictions.append(encoder.classes_[torch.argmax(probs).item()])
+
+    return {
+        "predictions": predictions,
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+        "model_rss_mb": rss_loaded - rss_before,
+        "total_rss_mb": current_rss_mb(),
+    }
+
+# ============================================
+# MAIN
+# ============================================
+def main():
+    parser = argparse.ArgumentParser(description="Compare fp32 and INT8 intent classifiers")
+    parser.add_argument("--checkpoint", default="ultra_fast_model.pt")
+    parser.add_argument("--data", default="dataset_splits/validation.xlsx")
+    parser.add_argument("--limit", type=int, default=None, help="Only use the first N rows")
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    args = parser.parse_args()
+
+    texts, labels = load_heldout(args.data, limit=args.limit)
+    print(f"📁 {len(texts)} held-out emails from {args.data}")
+    if not texts:
+        print(f"❌ No held-out emails to compare in {args.data}")
+        sys.exit(1)
+
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        pool.submit(build_int8_artifact, args.checkpoint).result()
+
+    for precision in ("fp32", "int8"):
+        print(f"⏳ Running {precision}...")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            results[precision] = pool.submit(
+                run_precision, precision, args.checkpoint, texts, args.threads
+            ).result()
+
+    fp32, int8 = results["fp32"]["predictions"], results["int8"]["predictions"]
+    agreement = sum(a == b for a, b in zip(fp32, int8)) / len(texts)
+
+    print("\n" + "=" * 60)
+    print("FP32 vs INT8")
+    print("=" * 60)
+    print(f"Agreement with fp32: {agreement:.2%}")
+    print(f"\n{'':14}{'accuracy':>10}{'p50 ms':>10}{'p99 ms':>10}{'model MB':>10}{'RSS MB':>10}")
+    for precision, result in results.items():
+        accuracy = sum(p == y for p, y in zip(result["predictions"], labels)) / len(labels)
+        print(f"{precision:14}{accuracy:>10.2%}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+              f"{result['model_rss_mb']:>10.1f}{result['total_rss_mb']:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+distill_student.py - Distill the DistilBERT classifier into a hashed n-gram student
+Trains on the teacher's temperature-softened probabilities, calibrates the
+cascade threshold on half of the validation split and reports escalation
+rate, agreement with the teacher and latency saved on the other half.
+Run: python distill_student.py --train dataset_splits/train.xlsx --val dataset_splits/validation.xlsx
+"""
+
+import argparse
+import logging
+import math
+import statistics
+import time
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from batch_inference import classify_texts
+from bench_utils import load_heldout
+from model_bundle import ensure_local_bundle, is_bundle, resolve_model_bundle, source_fingerprint
+from model_loader import InferenceConfig, load_classifier
+from student_model import CascadeClassifier, HashedNgramStudent, encode_bags, featurize, save_student
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# ============================================
+# CONFIGURATION
+# ============================================
+class DistillConfig:
+    TRAIN_FILE = "dataset_splits/train.xlsx"
+    VAL_FILE = "dataset_splits/validation.xlsx"
+    TEACHER_CHECKPOINT = "ultra_fast_model.pt"
+    MAX_LENGTH = 64            # what simple.py / predict_new_email.py classify with
+    TEMPERATURE = 2.0
+    ALPHA = 0.9                # weight of the soft-label loss; the rest is CE on the true labels
+    EPOCHS = 20
+    BATCH_SIZE = 64
+    LEARNING_RATE = 0.05
+    TARGET_AGREEMENT = 0.99    # required agreement with the teacher on rows the student answers
+    LATENCY_SAMPLES = 200
+    SEED = 42
+
+# ============================================
+# TRAINING
+# ============================================
+def distill(features, teacher_probs, hard_labels, num_labels, args):
+    """Fit the student to softmax(log p_teacher / T) (KL * T^2) plus CE on known true labels"""
+    torch.manual_seed(args.seed)
+    student = HashedNgramStudent(num_labels)
+    optimizer = torch.optim.Adam(student.parameters(), lr=args.lr)
+    soft_targets = torch.softmax(torch.log(teacher_probs.clamp_min(1e-8)) / args.temperature, dim=-1)
+    T = args.temperature
+
+    for epoch in range(args.epochs):
+        order = torch.randperm(len(features)).tolist()
+        total_loss = 0.0
+        for start in range(0, len(order), args.batch_size):
+            rows = order[start:start + args.batch_size]
+            ids, offsets = encode_bags([features[i] for i in rows])
+            logits = student(ids, offsets)
+
+            loss = args.alpha * T * T * F.kl_div(F.log_softmax(logits / T, dim=-1), soft_targets[rows],
+                                                  reduction="batchmean")
+            targets = hard_labels[rows]
+            known = targets >= 0
+            if args.alpha < 1 and known.any():
+                loss = loss + (1 - args.alpha) * F.cross_entropy(logits[known], targets[known])
+
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total_loss += loss.item() * len(rows)
+        if (epoch + 1) % 5 == 0 or epoch + 1 == args.epochs:
+            logger.info(f"epoch {epoch + 1}/{args.epochs} | loss {total_loss / len(order):.4f}")
+
+    student.eval()
+    return student
+
+def calibrate_threshold(confidence, agrees, target):
+    """Lowest confidence threshold at which the rows it lets through agree with the teacher >= target
+
+    Returns math.inf (always escalate) when not even the most confident rows reach the target.
+    """
+    order = np.argsort(-confidence, kind="stable")
+    confidence, agrees = confidence[order], agrees[order]
+    agreement = np.cumsum(agrees) / np.arange(1, len(agrees) + 1)
+    # A threshold can only sit where the confidence drops, or ties would be split
+    cut_points = np.append(confidence[1:] < confidence[:-1], True)
+    passing = np.flatnonzero((agreement >= target) & cut_points)
+    return float(confidence[passing[-1]]) if len(passing) else math.inf
+
+# ============================================
+# REPORT
+# ============================================
+def mean_latency_ms(fn, texts):
+    """Mean milliseconds of fn([text]) per text (one warm-up call not counted)"""
+    fn(texts[:1])
+    latencies = []
+    for text in texts:
+        start = time.perf_counter()
+        fn([text])
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.mean(latencies)
+
+def build_report(student, threshold, teacher_fn, texts, teacher_probs, true_labels, latency_samples):
+    cascade = CascadeClassifier(student, threshold, teacher_fn)
+    cascade_pred = torch.tensor(cascade.classify_texts(texts)).argmax(-1)
+    student_probs = student.predict_proba(texts)
+    student_pred = student_probs.argmax(-1)
+    teacher_pred = teacher_probs.argmax(-1)
+    known = true_labels >= 0
+
+    sample = texts[:latency_samples]
+    teacher_ms = mean_latency_ms(teacher_fn, sample)
+    cascade_ms = mean_latency_ms(cascade.classify_texts, sample)
+    student_ms = mean_latency_ms(student.predict_proba, sample)
+
+    def accuracy(pred):
+        return (pred[known] == true_labels[known]).float().mean().item() if known.any() else float("nan")
+
+    return {
+        "rows": len(texts),
+        "threshold": threshold,
+        "escalation_rate": (student_probs.max(-1).values < threshold).float().mean().item(),
+        "student_agreement": (student_pred == teacher_pred).float().mean().item(),
+        "cascade_agreement": (cascade_pred == teacher_pred).float().mean().item(),
+        "teacher_accuracy": accuracy(teacher_pred),
+        "cascade_accuracy": accuracy(cascade_pred),
+        "teacher_ms": teacher_ms,
+        "student_ms": student_ms,
+        "cascade_ms": cascade_ms,
+        "latency_saved_ms": teacher_ms - cascade_ms,
+    }
+
+# ============================================
+# MAIN
+# ============================================
+def resolve_teacher(args):
+    if args.from_hub:
+        return resolve_model_bundle(cache_dir="./hf_cache")
+    return args.teacher if is_bundle(args.teacher) else ensure_local_bundle(args.teacher)
+
+def encode_labels(labels, classes):
+    index = {label: i for i, label in enumerate(classes)}
+    return torch.tensor([index.get(label, -1) for label in labels])
+
+def main():
+    parser = argparse.ArgumentParser(description="Distill a fast student and calibrate the cascade")
+    parser.add_argument("--train", default=DistillConfig.TRAIN_FILE)
+    parser.add_argument("--val", default=DistillConfig.VAL_FILE)
+    parser.add_argument("--teacher", default=DistillConfig.TEACHER_CHECKPOINT,
+                        help="Model bundle or legacy checkpoint to distill")
+    parser.add_argument("--from-hub", action="store_true",
+                        help="Distill the bundle simple.py serves (Hugging Face cache) instead of --teacher")
+    parser.add_argument("--out", default=InferenceConfig.STUDENT_PATH)
+    parser.add_argument("--limit", type=int, default=None, help="Only use the first N training rows")
+    parser.add_argument("--temperature", type=float, default=DistillConfig.TEMPERATURE)
+    parser.add_argument("--alpha", type=float, default=DistillConfig.ALPHA)
+    parser.add_argument("--epochs", type=int, default=DistillConfig.EPOCHS)
+    parser.add_argument("--batch-size", type=int, default=DistillConfig.BATCH_SIZE)
+    parser.add_argument("--lr", type=float, default=DistillConfig.LEARNING_RATE)
+    parser.add_argument("--target-agreement", type=float, default=DistillConfig.TARGET_AGREEMENT)
+    parser.add_argument("--latency-samples", type=int, default=DistillConfig.LATENCY_SAMPLES)
+    parser.add_argument("--seed", type=int, default=DistillConfig.SEED)
+    args = parser.parse_args()
+
+    teacher_source = resolve_teacher(args)
+    model, tokenizer, encoder = load_classifier(teacher_source, early_exit=False)
+    classes = list(encoder.classes_)
+
+    def teacher_fn(texts):
+        return classify_texts(model, tokenizer, texts, max_length=DistillConfig.MAX_LENGTH).tolist()
+
+    train_texts, train_labels = load_heldout(args.train, limit=args.limit)
+    val_texts, val_labels = load_heldout(args.val)
+
+    logger.info(f"Scoring {len(train_texts)} training and {len(val_texts)} validation emails with the teacher...")
+    train_probs = classify_texts(model, tokenizer, train_texts, max_length=DistillConfig.MAX_LENGTH)
+    val_probs = classify_texts(model, tokenizer, val_texts, max_length=DistillConfig.MAX_LENGTH)
+
+    features = [featurize(text) for text in train_texts]
+    student = distill(features, train_probs, encode_labels(train_labels, classes), len(classes), args)
+
+    # Calibrate on one half of validation, report on the other
+    order = np.random.default_rng(args.seed).permutation(len(val_texts))
+    calib, held = order[:len(order) // 2], order[len(order) // 2:]
+    calib_probs = student.predict_proba([val_texts[i] for i in calib])
+    threshold = calibrate_threshold(
+        calib_probs.max(-1).values.numpy(),
+        (calib_probs.argmax(-1) == val_probs[calib].argmax(-1)).numpy(),
+        args.target_agreement
+    )
+    if math.isinf(threshold):
+        logger.warning(f"Student never reaches {args.target_agreement:.1%} agreement; cascade will always escalate")
+
+    report = build_report(
+        student, threshold, teacher_fn,
+        [val_texts[i] for i in held], val_probs[held],
+        encode_labels([val_labels[i] for i in held], classes), args.latency_samples
+    )
+    save_student(args.out, student, classes, threshold, source_fingerprint(teacher_source), report)
+
+    print(f"\n📊 Cascade on {report['rows']} held-out validation emails (threshold {threshold:.3f})")
+    print(f"  Escalated to DistilBERT : {report['escalation_rate']:.1%}")
+    print(f"  Agreement with teacher  : student alone {report['student_agreement']:.1%}, "
+          f"cascade {report['cascade_agreement']:.1%}")
+    print(f"  Accuracy                : teacher {report['teacher_accuracy']:.1%}, "
+          f"cascade {report['cascade_accuracy']:.1%}")
+    print(f"  Mean latency per email  : teacher {report['teacher_ms']:.2f} ms, "
+          f"student {report['student_ms']:.3f} ms, cascade {report['cascade_ms']:.2f} ms")
+    print(f"  Mean latency saved      : {report['latency_saved_ms']:.2f} ms "
+          f"({report['latency_saved_ms'] / report['teacher_ms']:.0%})")
+    print(f"\n✅ Student saved to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+early_exit.py - Early-exit classification heads on DistilBERT's intermediate layers
+
+A small head reads the [CLS] vector after each transformer layer but the
+last. At inference a row stops as soon as a head is confident enough, and
+the rest of the batch carries on through the remaining layers without it.
+"""
+
+import logging
+import os
+
+import torch
+from torch import nn
+
+from prediction_cache import model_fingerprint
+
+logger = logging.getLogger(__name__)
+
+HEAD_DIM = 128
+
+# ============================================
+# HEADS
+# ============================================
+class ExitHeads(nn.Module):
+    """One Linear-ReLU-Linear head per intermediate layer (layers 1 .. n-1)"""
+
+    def __init__(self, dim, num_labels, num_layers, head_dim=HEAD_DIM):
+        super().__init__()
+        self.dim = dim
+        self.head_dim = head_dim
+        self.heads = nn.ModuleList(
+            nn.Sequential(nn.Linear(dim, head_dim), nn.ReLU(), nn.Linear(head_dim, num_labels))
+            for _ in range(num_layers - 1)
+        )
+
+    def forward(self, layer, cls_hidden):
+        """Logits of the head after transformer layer `layer` (0-based)"""
+        return self.heads[layer](cls_hidden)
+
+def cls_states(model, input_ids, attention_mask):
+    """([CLS] vector after every layer, final logits) from one full forward pass"""
+    outputs = model(input_ids=input_ids, attention_mask=attention_mask, output_hidden_states=True)
+    # hidden_states[0] is the embedding output
+    return [hidden[:, 0] for hidden in outputs.hidden_states[1:]], outputs.logits
+
+def save_heads(path, heads, labels, teacher_fingerprint, report=None):
+    """Write the heads next to the fingerprint of the model they were trained on"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    torch.save({
+        'state_dict': heads.state_dict(),
+        'dim': heads.dim,
+        'head_dim': heads.head_dim,
+        'num_layers': len(heads.heads) + 1,
+        'labels': list(labels),
+        'teacher_fingerprint': teacher_fingerprint,
+        'report': report or {},
+    }, tmp_path)
+    os.replace(tmp_path, path)
+
+def load_heads(path):
+    """(heads, artifact dict) from a file written by save_heads()"""
+    artifact = torch.load(path, weights_only=False, map_location="cpu")
+    heads = ExitHeads(artifact['dim'], len(artifact['labels']), artifact['num_layers'], artifact['head_dim'])
+    heads.load_state_dict(artifact['state_dict'])
+    heads.eval()
+    return heads, artifact
+
+# ============================================
+# BACKEND
+# ============================================
+class EarlyExitBackend:
+    """Eager DistilBERT that returns a row's logits from the first head whose confidence >= threshold"""
+    name = "early-exit"
+
+    def __init__(self, model, heads, threshold, tag=""):
+        self.model = model
+        self.heads = heads
+        self.threshold = threshold
+        self.tag = tag
+        self.num_layers = len(model.distilbert.transformer.layer)
+        self.counters = {"rows": 0, "layers": 0}
+
+    def __call__(self, input_ids, attention_mask):
+        logits, layers = self.forward_with_exits(input_ids, attention_mask)
+        self.counters["rows"] += len(layers)
+        self.counters["layers"] += int(layers.sum())
+        return logits
+
+    def forward_with_exits(self, input_ids, attention_mask):
+        """(logits, layers executed per row)"""
+        # Not at module level: model_loader imports this module even with early exit switched off
+        from transformers.masking_utils import create_bidirectional_mask
+
+        distilbert = self.model.distilbert
+        hidden = distilbert.embeddings(input_ids)
+        logits = None
+        layers = torch.full((len(input_ids),), self.num_layers, dtype=torch.long)
+        active = torch.arange(len(input_ids))
+
+        for i, layer in enumerate(distilbert.transformer.layer):
+            mask = create_bidirectional_mask(config=distilbert.config, inputs_embeds=hidden,
+                                             attention_mask=attention_mask)
+            hidden = layer(hidden, mask)
+            if i == self.num_layers - 1:
+                break
+
+            head_logits = self.heads(i, hidden[:, 0])
+            if logits is None:
+                logits = head_logits.new_empty((len(input_ids), head_logits.shape[1]))
+            done = torch.softmax(head_logits.float(), dim=-1).max(dim=-1).values >= self.threshold
+            if done.any():
+                logits[active[done]] = head_logits[done]
+                layers[active[done]] = i + 1
+                keep = ~done
+                if not keep.any():
+                    return logits, layers
+                active, hidden, attention_mask = active[keep], hidden[keep], attention_mask[keep]
+
+        pooled = torch.relu(self.model.pre_classifier(hidden[:, 0]))
+        final_logits = self.model.classifier(pooled)
+        if logits is None:
+            return final_logits, layers
+        logits[active] = final_logits.to(logits.dtype)
+        return logits, layers
+
+    def stats(self):
+        rows = self.counters["rows"]
+        return {**self.counters, "mean_layers": self.counters["layers"] / rows if rows else 0.0}
+
+def load_early_exit(path, model, labels, teacher_fingerprint, threshold):
+    """EarlyExitBackend over model, or None when the heads are missing or were trained on another model"""
+    if not path or not os.path.exists(path):
+        return None
+    heads, artifact = load_heads(path)
+    if list(artifact['labels']) != list(labels):
+        logger.warning(f"Early-exit heads {path} have labels {artifact['labels']}; early exit off")
+        return None
+    if artifact['teacher_fingerprint'] != teacher_fingerprint:
+        logger.warning(f"Early-exit heads {path} were trained on another checkpoint; early exit off "
+                       f"(re-run train_early_exit.py)")
+        return None
+    tag = f"exit-{model_fingerprint(path)[:12]}-{threshold:.3f}"
+    logger.info(f"Early exit on: heads after layers 1-{len(heads.heads)}, threshold {threshold:.3f}")
+    return EarlyExitBackend(model, heads, threshold, tag)
@@ -0,0 +1,92 @@
+"""
+email_templates.py - Intent-specific email bodies shared by the Review step and bulk sending
+Placeholders: {rec_name}, {rec_company}, {message}, {user_name}, {company}, {user_email}
+"""
+
+DEFAULT_INTENT = "inquiry"
+
+TEMPLATES = {
+    "inquiry": """Dear {rec_name},
+
+I hope this email finds you well.
+
+{message}
+
+Could you please share your catalog and pricing information at your earliest convenience?
+
+Thank you for your time and consideration.
+
+Best regards,
+{user_name}
+{company}
+{user_email}""",
+
+    "complaint": """Dear {rec_name},
+
+I am writing to bring an important matter to your attention.
+
+{message}
+
+Please look into this matter urgently and let me know how you plan to resolve this issue.
+
+I look forward to your prompt response.
+
+Regards,
+{user_name}
+{company}
+{user_email}""",
+
+    "sales": """Dear {rec_name},
+
+I hope you're doing well.
+
+{message}
+
+Would you be available for a quick 15-minute call next week to discuss how we might work together? Please let me know what time works best for you.
+
+Looking forward to connecting!
+
+Best regards,
+{user_name}
+{company}
+{user_email}""",
+
+    "negotiation": """Dear {rec_name},
+
+Thank you for your proposal.
+
+{message}
+
+We're very interested in moving forward, but would appreciate if you could reconsider the pricing. Could we schedule a brief call to discuss this further?
+
+Thank you for your understanding.
+
+Regards,
+{user_name}
+{company}
+{user_email}""",
+
+    "partnership": """Dear {rec_name},
+
+I've been following {rec_company}'s impressive work in the industry.
+
+{message}
+
+I see great potential for collaboration between our companies. Would you be open to an exploratory conversation to discuss possible synergies?
+
+I look forward to hearing from you.
+
+Best regards,
+{user_name}
+{company}
+{user_email}""",
+}
+
+def render_email(intent, rec_name="", rec_company="", message="", user_name="", company="", user_email=""):
+    """Body for intent (unknown intents get the inquiry template)"""
+    template = TEMPLATES.get(intent, TEMPLATES[DEFAULT_INTENT])
+    return template.format(rec_name=rec_name, rec_company=rec_company, message=message,
+                           user_name=user_name, company=company, user_email=user_email)
+
+def default_subject(intent):
+    return f"Regarding: {intent.title() if intent else 'Inquiry'}"
@@ -0,0 +1,221 @@
+"""
+evaluate_model.py - Offline accuracy and speed report for a local model bundle
+Writes the confusion matrix (test_confusion_matrix.png), per-class precision/recall
+and a JSON report with latency percentiles and throughput per batch size and thread count.
+Run: python evaluate_model.py --model model_bundle/release --data dataset_splits/validation.xlsx
+     python evaluate_model.py --compare reports/fp32.json reports/int8.json
+"""
+
+import os
+
+# Nothing in an evaluation run may reach the network
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+import argparse
+import json
+import logging
+import time
+from datetime import datetime
+
+import torch
+from sklearn.metrics import confusion_matrix, precision_recall_fscore_support
+
+from batch_inference import classify_texts
+from bench_utils import load_heldout, percentile
+from inference_backends import OnnxBackend, artifact_paths
+from model_bundle import is_bundle, source_fingerprint
+from model_loader import InferenceConfig, load_classifier
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# ============================================
+# CONFIGURATION
+# ============================================
+class EvalConfig:
+    DATA_FILE = "dataset_splits/validation.xlsx"
+    MATRIX_PNG = "test_confusion_matrix.png"
+    REPORT_JSON = "evaluation_report.json"
+    MAX_LENGTH = 64
+    BATCH_SIZES = [1, 8, 32]
+    THREADS = sorted({1, os.cpu_count() or 1})
+    ITERATIONS = 30
+
+# ============================================
+# ACCURACY
+# ============================================
+def accuracy_report(labels, predictions, classes):
+    """Accuracy, macro F1, per-class precision/recall/F1 and the confusion matrix"""
+    precision, recall, f1, support = precision_recall_fscore_support(
+        labels, predictions, labels=classes, zero_division=0
+    )
+    matrix = confusion_matrix(labels, predictions, labels=classes)
+    return {
+        "accuracy": sum(a == b for a, b in zip(labels, predictions)) / max(len(labels), 1),
+        "macro_f1": float(f1.mean()),
+        "per_class": {
+            label: {"precision": float(p), "recall": float(r), "f1": float(f), "support": int(s)}
+            for label, p, r, f, s in zip(classes, precision, recall, f1, support)
+        },
+        "confusion_matrix": {"labels": list(classes), "matrix": matrix.tolist()},
+    }
+
+def plot_confusion_matrix(matrix, classes, path, title):
+    """Annotated heatmap in the style of the original test_confusion_matrix.png"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(10, 8))
+    image = ax.imshow(matrix, cmap="Blues", aspect="auto")
+    fig.colorbar(image, ax=ax)
+    threshold = max(max(row) for row in matrix) / 2 if len(matrix) else 0
+    for i, row in enumerate(matrix):
+        for j, count in enumerate(row):
+            ax.text(j, i, str(count), ha="center", va="center",
+                    color="white" if count > threshold else "black")
+    ax.set_xticks(range(len(classes)), classes)
+    ax.set_yticks(range(len(classes)), classes, rotation=90, va="center")
+    ax.set_xlabel("Predicted Label", fontsize=12)
+    ax.set_ylabel("True Label", fontsize=12)
+    ax.set_title(title, fontsize=14, fontweight="bold")
+    fig.tight_layout()
+    fig.savefig(path, dpi=100)
+    plt.close(fig)
+
+# ============================================
+# SPEED
+# ============================================
+def runner_with_threads(runner, threads, source):
+    """Set the intra-op thread budget; ONNX Runtime fixes it per session, so rebuild that one"""
+    torch.set_num_threads(threads)
+    if getattr(runner, "name", "") == "onnx":
+        return OnnxBackend(artifact_paths(InferenceConfig.ARTIFACT_DIR, source_fingerprint(source))["onnx"],
+                           threads=threads)
+    return runner
+
+def speed_report(runner, tokenizer, texts, batch_sizes, thread_counts, iterations, max_length, long_input, source):
+    """Latency percentiles (tokenization included) and throughput for every (threads, batch size)"""
+    rows = []
+    for threads in thread_counts:
+        timed_runner = runner_with_threads(runner, threads, source)
+        for batch_size in batch_sizes:
+            batches = [[texts[(i * batch_size + j) % len(texts)] for j in range(batch_size)]
+                       for i in range(iterations + 2)]
+            latencies = []
+            for i, batch in enumerate(batches):
+                start = time.perf_counter()
+                classify_texts(timed_runner, tokenizer, batch, batch_size=batch_size,
+                               max_length=max_length, long_input=long_input)
+                if i >= 2:   # first two calls are warm-up
+                    latencies.append((time.perf_counter() - start) * 1000)
+            row = {
+                "threads": threads,
+                "batch_size": batch_size,
+                "p50_ms": percentile(latencies, 50),
+                "p95_ms": percentile(latencies, 95),
+                "p99_ms": percentile(latencies, 99),
+                "emails_per_s": batch_size * len(latencies) / (sum(latencies) / 1000),
+            }
+            rows.append(row)
+            logger.info(f"threads {threads:>2} batch {batch_size:>3}: p50 {row['p50_ms']:.2f} ms, "
+                        f"p99 {row['p99_ms']:.2f} ms, {row['emails_per_s']:.1f} emails/s")
+    return rows
+
+# ============================================
+# COMPARE
+# ============================================
+def compare_reports(paths):
+    """Print accuracy and speed of several saved reports side by side"""
+    reports = [json.load(open(path)) for path in paths]
+    names = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    width = max(16, *(len(name) + 2 for name in names))
+
+    print(f"{'':24}" + "".join(f"{name:>{width}}" for name in names))
+    for label, key in [("precision/backend", None), ("accuracy", "accuracy"), ("macro F1", "macro_f1")]:
+        if key is None:
+            values = [f"{r['precision']}/{r['runtime']}" for r in reports]
+        else:
+            values = [f"{r[key]:.2%}" for r in reports]
+        print(f"{label:24}" + "".join(f"{value:>{width}}" for value in values))
+
+    keys = sorted({(row["threads"], row["batch_size"]) for r in reports for row in r["speed"]})
+    for threads, batch_size in keys:
+        cells = []
+        for r in reports:
+            row = next((row for row in r["speed"] if (row["threads"], row["batch_size"]) == (threads, batch_size)),
+                       None)
+            cells.append(f"{row['p50_ms']:.1f}ms {row['emails_per_s']:.0f}/s" if row else "-")
+        print(f"{f'threads {threads} batch {batch_size}':24}" + "".join(f"{cell:>{width}}" for cell in cells))
+
+# ============================================
+# MAIN
+# ============================================
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate a model bundle offline: accuracy and speed")
+    parser.add_argument("--model", help="Local model bundle directory")
+    parser.add_argument("--data", default=EvalConfig.DATA_FILE, help="Held-out split (.xlsx or .csv)")
+    parser.add_argument("--limit", type=int, default=None, help="Only use the first N rows")
+    parser.add_argument("--precision", default=None, help="fp32|int8 (default: EMAIL_AI_PRECISION)")
+    parser.add_argument("--backend", default=None, help="eager|torchscript|onnx (default: EMAIL_AI_BACKEND)")
+    parser.add_argument("--max-length", type=int, default=EvalConfig.MAX_LENGTH)
+    parser.add_argument("--long-input", default=InferenceConfig.LONG_INPUT, help="Window aggregation, '' truncates")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=EvalConfig.BATCH_SIZES)
+    parser.add_argument("--threads", nargs="+", type=int, default=EvalConfig.THREADS)
+    parser.add_argument("--iterations", type=int, default=EvalConfig.ITERATIONS, help="Timed calls per setting")
+    parser.add_argument("--matrix", default=EvalConfig.MATRIX_PNG)
+    parser.add_argument("--title", default="Confusion Matrix - Test Set")
+    parser.add_argument("--report", default=EvalConfig.REPORT_JSON)
+    parser.add_argument("--compare", nargs="+", default=None, help="Print saved reports side by side and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_reports(args.compare)
+        return
+    if not args.model or not is_bundle(args.model):
+        parser.error("--model must be a local model bundle (build one with build_bundle.py)")
+
+    runner, tokenizer, encoder = load_classifier(args.model, args.precision, args.backend)
+    classes = list(encoder.classes_)
+    texts, labels = load_heldout(args.data, limit=args.limit)
+    known = [i for i, label in enumerate(labels) if label in classes]
+    if len(known) < len(labels):
+        logger.warning(f"Skipping {len(labels) - len(known)} rows whose label the model does not know")
+    texts, labels = [texts[i] for i in known], [labels[i] for i in known]
+
+    logger.info(f"Classifying {len(texts)} rows from {args.data}...")
+    probs = classify_texts(runner, tokenizer, texts, max_length=args.max_length, long_input=args.long_input)
+    predictions = [classes[i] for i in probs.argmax(dim=1).tolist()]
+    accuracy = accuracy_report(labels, predictions, classes)
+    plot_confusion_matrix(accuracy["confusion_matrix"]["matrix"], classes, args.matrix, args.title)
+
+    speed = speed_report(runner, tokenizer, texts, args.batch_sizes, args.threads, args.iterations,
+                         args.max_length, args.long_input, args.model)
+
+    report = {
+        "model": args.model,
+        "fingerprint": source_fingerprint(args.model),
+        "precision": args.precision or InferenceConfig.PRECISION,
+        "runtime": getattr(runner, "name", type(runner).__name__),
+        "data": args.data,
+        "rows": len(texts),
+        "max_length": args.max_length,
+        "long_input": args.long_input,
+        **accuracy,
+        "speed": speed,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "torch": torch.__version__,
+        "cpu_count": os.cpu_count(),
+    }
+    os.makedirs(os.path.dirname(args.report) or ".", exist_ok=True)
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n📊 Accuracy {accuracy['accuracy']:.2%}, macro F1 {accuracy['macro_f1']:.2%} on {len(texts)} rows")
+    print(f"{'class':14}{'precision':>11}{'recall':>9}{'support':>9}")
+    for label, row in accuracy["per_class"].items():
+        print(f"{label:14}{row['precision']:>11.2%}{row['recall']:>9.2%}{row['support']:>9}")
+    print(f"\n✅ Confusion matrix -> {args.matrix}, report -> {args.report}")
+
+if __name__ == "__main__":
+    main()
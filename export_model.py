@@ -0,0 +1,34 @@
+"""
+export_model.py - Export ultra_fast_model.pt to TorchScript and ONNX
+Run: python export_model.py --checkpoint ultra_fast_model.pt
+"""
+
+import argparse
+
+from inference_backends import EXPORT_FORMATS, EXPORT_TOLERANCE, artifact_paths, export_all
+from model_loader import InferenceConfig, load_fp32_model
+from model_bundle import source_fingerprint
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the intent classifier to TorchScript/ONNX")
+    parser.add_argument("--checkpoint", default="ultra_fast_model.pt",
+                        help="Legacy .pt checkpoint or model bundle directory")
+    parser.add_argument("--formats", nargs="+", choices=EXPORT_FORMATS, default=list(EXPORT_FORMATS))
+    parser.add_argument("--artifact-dir", default=InferenceConfig.ARTIFACT_DIR)
+    args = parser.parse_args()
+
+    print(f"📁 Loading {args.checkpoint}...")
+    model, encoder = load_fp32_model(args.checkpoint)
+    fingerprint = source_fingerprint(args.checkpoint)
+
+    diffs = export_all(model, encoder, args.artifact_dir, fingerprint, formats=args.formats)
+
+    paths = artifact_paths(args.artifact_dir, fingerprint)
+    print("\n✅ Export complete")
+    for fmt, diff in diffs.items():
+        print(f"  {fmt:12}: {paths[fmt]}  (max |Δlogit| {diff:.2e} <= {EXPORT_TOLERANCE[fmt]:.0e})")
+    print(f"  {'labels':12}: {paths['labels']}")
+    print("\nSelect a runtime with EMAIL_AI_BACKEND=torchscript or EMAIL_AI_BACKEND=onnx")
+
+if __name__ == "__main__":
+    main()
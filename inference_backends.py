@@ -0,0 +1,176 @@
+"""
+inference_backends.py - Eager PyTorch, TorchScript and ONNX Runtime backends
+Every backend is called as backend(input_ids=..., attention_mask=...) and returns logits
+"""
+
+import logging
+import os
+import pickle
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("eager", "torchscript", "onnx")
+EXPORT_FORMATS = ("torchscript", "onnx")
+EXPORT_TOLERANCE = {"torchscript": 1e-4, "onnx": 1e-3}
+VERIFY_SHAPES = [(1, 8), (4, 64), (16, 32)]   # (batch, sequence) pairs checked after export
+
+# ============================================
+# BACKENDS
+# ============================================
+class EagerBackend:
+    """Plain PyTorch module (fp32 or dynamic INT8)"""
+    name = "eager"
+
+    def __init__(self, model):
+        self.model = model
+
+    def __call__(self, input_ids, attention_mask):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+
+class TorchScriptBackend:
+    """Frozen TorchScript module traced from the eager model"""
+    name = "torchscript"
+
+    def __init__(self, path):
+        self.module = torch.jit.load(path, map_location='cpu')
+        self.module.eval()
+
+    def __call__(self, input_ids, attention_mask):
+        return self.module(input_ids, attention_mask)
+
+class OnnxBackend:
+    """ONNX Runtime session on the CPU execution provider"""
+    name = "onnx"
+
+    def __init__(self, path, threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    def __call__(self, input_ids, attention_mask):
+        logits = self.session.run(["logits"], {
+            "input_ids": input_ids.numpy(),
+            "attention_mask": attention_mask.numpy(),
+        })[0]
+        return torch.from_numpy(logits)
+
+# ============================================
+# EXPORT
+# ============================================
+class _LogitsOnly(torch.nn.Module):
+    """Wrap the HF model so tracing sees plain tensors in and out"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask, return_dict=False)[0]
+
+def _example_inputs(batch_size, seq_len, vocab_size):
+    input_ids = torch.randint(vocab_size, (batch_size, seq_len))
+    attention_mask = torch.ones((batch_size, seq_len), dtype=torch.long)
+    attention_mask[0, seq_len // 2:] = 0   # one padded row so masking is exercised
+    return input_ids, attention_mask
+
+def export_torchscript(model, path):
+    """Trace and freeze the model into a TorchScript file"""
+    inputs = _example_inputs(2, 16, model.config.vocab_size)
+    with torch.inference_mode():
+        traced = torch.jit.trace(_LogitsOnly(model).eval(), inputs)
+    traced = torch.jit.freeze(traced)
+    torch.jit.save(traced, path)
+
+def export_onnx(model, path, opset_version=17):
+    """Export the model to ONNX at opset_version with dynamic batch and sequence axes
+
+    Uses the TorchScript-based exporter (dynamo=False): it writes the
+    requested opset as is and needs no onnxscript, which newer torch's
+    default dynamo exporter requires.
+    """
+    inputs = _example_inputs(2, 16, model.config.vocab_size)
+    dynamic_axes = {
+        "input_ids": {0: "batch", 1: "sequence"},
+        "attention_mask": {0: "batch", 1: "sequence"},
+        "logits": {0: "batch"},
+    }
+    with torch.no_grad():
+        torch.onnx.export(
+            _LogitsOnly(model).eval(), inputs, path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset_version,
+            dynamo=False
+        )
+
+def verify_export(model, backend, atol):
+    """Check the exported backend against eager logits at several shapes
+
+    Returns the largest absolute difference seen, raises ValueError above atol.
+    """
+    worst = 0.0
+    for batch_size, seq_len in VERIFY_SHAPES:
+        input_ids, attention_mask = _example_inputs(batch_size, seq_len, model.config.vocab_size)
+        with torch.inference_mode():
+            expected = model(input_ids=input_ids, attention_mask=attention_mask).logits
+            actual = backend(input_ids=input_ids, attention_mask=attention_mask)
+        diff = (expected - actual).abs().max().item()
+        worst = max(worst, diff)
+        if diff > atol:
+            raise ValueError(
+                f"{backend.name} logits differ from eager by {diff:.2e} "
+                f"at batch={batch_size}, seq={seq_len} (tolerance {atol:.0e})"
+            )
+    return worst
+
+# ============================================
+# ARTIFACTS
+# ============================================
+def artifact_paths(artifact_dir, fingerprint):
+    """Exported files for one checkpoint"""
+    prefix = os.path.join(artifact_dir, fingerprint[:16])
+    return {
+        "torchscript": f"{prefix}.torchscript.pt",
+        "onnx": f"{prefix}.onnx",
+        "labels": f"{prefix}.labels.pkl",
+    }
+
+def export_all(model, encoder, artifact_dir, fingerprint, formats=EXPORT_FORMATS):
+    """Export and verify the requested formats, returning {format: max_abs_diff}"""
+    os.makedirs(artifact_dir, exist_ok=True)
+    paths = artifact_paths(artifact_dir, fingerprint)
+    with open(paths["labels"], "wb") as f:
+        pickle.dump(encoder, f)
+
+    exporters = {"torchscript": export_torchscript, "onnx": export_onnx}
+    loaders = {"torchscript": TorchScriptBackend, "onnx": OnnxBackend}
+    diffs = {}
+    for fmt in formats:
+        path = paths[fmt]
+        tmp_path = path + ".tmp"
+        exporters[fmt](model, tmp_path)
+        try:
+            diffs[fmt] = verify_export(model, loaders[fmt](tmp_path), EXPORT_TOLERANCE[fmt])
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        os.replace(tmp_path, path)
+        logger.info(f"✓ {fmt} export verified (max |Δlogit| = {diffs[fmt]:.2e}) -> {path}")
+    return diffs
+
+def load_exported(backend, artifact_dir, fingerprint):
+    """Load an exported backend and its label encoder, or None if not exported yet"""
+    paths = artifact_paths(artifact_dir, fingerprint)
+    if not (os.path.exists(paths[backend]) and os.path.exists(paths["labels"])):
+        return None
+    with open(paths["labels"], "rb") as f:
+        encoder = pickle.load(f)
+    loader = TorchScriptBackend if backend == "torchscript" else OnnxBackend
+    return loader(paths[backend]), encoder
@@ -0,0 +1,164 @@
+"""
+inference_client.py - Thin keep-alive client for inference_service.py
+EMAIL_AI_SERVICE_URL is http://127.0.0.1:8765 or unix:///path/to/inference.sock;
+unset (or a service that does not answer) means the caller runs the model in-process.
+"""
+
+import http.client
+import itertools
+import json
+import logging
+import os
+import queue
+import socket
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# ============================================
+# CONFIGURATION
+# ============================================
+class ServiceConfig:
+    URL = os.environ.get("EMAIL_AI_SERVICE_URL", "")
+    TIMEOUT = float(os.environ.get("EMAIL_AI_SERVICE_TIMEOUT", "60"))
+    MAX_IDLE = int(os.environ.get("EMAIL_AI_SERVICE_MAX_IDLE", "8"))   # kept-alive connections
+
+DEFAULT_CHUNK_SIZE = 512   # texts per /classify_batch call in iter_classify()
+
+class ServiceUnavailable(ConnectionError):
+    """The service could not be reached or failed the request"""
+
+class ServiceBusy(TimeoutError):
+    """The service is up but its model stayed busy past the queue timeout"""
+
+# ============================================
+# CONNECTIONS
+# ============================================
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP/1.1 over a Unix domain socket"""
+
+    def __init__(self, socket_path, timeout):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+def connection_factory(url, timeout):
+    """Callable opening a new connection to url (http:// or unix://)"""
+    parts = urlsplit(url)
+    if parts.scheme == "unix":
+        return lambda: UnixHTTPConnection(parts.path, timeout)
+    if parts.scheme == "http":
+        return lambda: http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=timeout)
+    raise ValueError(f"Unsupported service URL '{url}', expected http://host:port or unix:///path")
+
+# ============================================
+# CLIENT
+# ============================================
+class ServiceClient:
+    """Classify through the inference service over a small pool of kept-alive connections
+
+    A request checks out the most recently returned idle connection (or
+    opens one) and checks it back in afterwards, so Streamlit reruns on new
+    threads reuse connections instead of opening one each.
+
+    The service's /health answer is fetched once and kept in info: labels,
+    fingerprint of the checkpoint, model_hash (for prediction caches),
+    tokenizer name, lowercase and max_length.
+    """
+
+    def __init__(self, url, timeout=ServiceConfig.TIMEOUT, max_idle=ServiceConfig.MAX_IDLE):
+        self.url = url
+        self._connect = connection_factory(url, timeout)
+        self._idle = queue.LifoQueue(maxsize=max_idle)
+        self.info = self.health()
+        self.labels = list(self.info["labels"])
+        self.fingerprint = self.info["fingerprint"]
+        self.model_hash = self.info["model_hash"]
+
+    def _checkout(self):
+        """Most recently returned idle connection, or a new one"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def _checkin(self, connection):
+        try:
+            self._idle.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def _request(self, method, path, payload=None):
+        body = None if payload is None else json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+
+        for attempt in range(2):
+            # The retry opens a fresh connection: after a service restart every idle one is stale
+            connection = self._connect() if attempt else self._checkout()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+            except (OSError, http.client.HTTPException) as e:
+                connection.close()
+                # A kept-alive connection the server has since closed fails on first use: retry once
+                if attempt or isinstance(e, TimeoutError):
+                    raise ServiceUnavailable(f"{self.url}{path}: {e!r}") from e
+                continue
+            self._checkin(connection)
+            break
+
+        if response.status == 503:
+            raise ServiceBusy(f"{self.url} is busy: {data[:200].decode('utf-8', 'replace')}")
+        if response.status != 200:
+            raise ServiceUnavailable(f"{self.url}{path} answered {response.status}: "
+                                     f"{data[:200].decode('utf-8', 'replace')}")
+        return json.loads(data)
+
+    def health(self):
+        return self._request("GET", "/health")
+
+    def classify(self, text):
+        """Probability row for one text (micro-batched with other clients' requests)"""
+        return self._request("POST", "/classify", {"text": text})["probs"]
+
+    def classify_batch(self, texts):
+        """Probability rows for a list of texts, in order"""
+        texts = list(texts)
+        if not texts:
+            return []
+        return self._request("POST", "/classify_batch", {"texts": texts})["probs"]
+
+    def iter_classify(self, texts, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Yield one probability row per text of any iterable, chunk_size texts per call"""
+        texts = iter(texts)
+        while True:
+            chunk = list(itertools.islice(texts, chunk_size))
+            if not chunk:
+                return
+            yield from self.classify_batch(chunk)
+
+    def close(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+def connect_service(url=None, timeout=None):
+    """ServiceClient when a service URL is configured and answers, else None (run in-process)"""
+    url = ServiceConfig.URL if url is None else url
+    if not url:
+        return None
+    try:
+        client = ServiceClient(url, timeout or ServiceConfig.TIMEOUT)
+    except (ServiceUnavailable, ServiceBusy) as e:
+        logger.warning(f"Inference service not available ({e}); running the model in-process")
+        return None
+    logger.info(f"Classifying through the inference service at {url}")
+    return client
@@ -0,0 +1,136 @@
+"""
+inference_executor.py - Cap concurrent forward passes and give each one a fixed intra-op thread budget
+
+Every caller that can run the shared model from several threads at once
+(Streamlit sessions, service handlers) goes through one executor. At most
+max_concurrent passes run together, each with threads_per_pass torch
+threads, so the model never asks for more threads than the host has cores.
+Callers beyond that wait in line for up to queue_timeout seconds. Time spent
+waiting and time spent computing are recorded separately.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# ============================================
+# DEFAULTS
+# ============================================
+DEFAULT_MAX_CONCURRENT = 1
+DEFAULT_QUEUE_TIMEOUT = 30.0   # seconds a pass may wait for a free slot
+TIMING_SAMPLES = 2048          # recent waits / compute times kept for percentiles
+
+def _percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def default_threads_per_pass(max_concurrent):
+    """Split the cores evenly between the concurrent passes"""
+    return max(1, (os.cpu_count() or 1) // max(1, max_concurrent))
+
+class ExecutorBusy(TimeoutError):
+    """No slot freed up within the queue timeout, or the wait queue is full"""
+
+# ============================================
+# EXECUTOR
+# ============================================
+class InferenceExecutor:
+    """Run fn(*args) with at most max_concurrent calls in flight
+
+    torch's intra-op thread count is process-wide, so the budget is applied
+    once here: max_concurrent passes x threads_per_pass threads in total.
+    max_queue bounds how many callers may wait at once (None: unbounded).
+    """
+
+    def __init__(self, max_concurrent=DEFAULT_MAX_CONCURRENT, threads_per_pass=None,
+                 queue_timeout=DEFAULT_QUEUE_TIMEOUT, max_queue=None):
+        import torch
+
+        self.max_concurrent = max(1, max_concurrent)
+        self.threads_per_pass = threads_per_pass or default_threads_per_pass(self.max_concurrent)
+        self.queue_timeout = queue_timeout
+        self.max_queue = max_queue
+        torch.set_num_threads(self.threads_per_pass)
+
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._errors = 0
+        self._wait_times = deque(maxlen=TIMING_SAMPLES)
+        self._compute_times = deque(maxlen=TIMING_SAMPLES)
+        self._wait_histogram = STAGE_SECONDS.labels(stage="executor_wait")
+        self._compute_histogram = STAGE_SECONDS.labels(stage="executor_compute")
+
+        logger.info(f"Inference executor: {self.max_concurrent} concurrent pass(es) x "
+                    f"{self.threads_per_pass} thread(s), queue timeout {queue_timeout}s")
+
+    def run(self, fn, *args, timeout=None, **kwargs):
+        """fn(*args, **kwargs) once a slot is free; ExecutorBusy if none frees up within timeout"""
+        timeout = self.queue_timeout if timeout is None else timeout
+        with self._lock:
+            if self.max_queue is not None and self._waiting >= self.max_queue:
+                self._rejected += 1
+                raise ExecutorBusy(f"{self._waiting} passes already waiting for the model")
+            self._waiting += 1
+
+        queued = time.perf_counter()
+        acquired = self._slots.acquire(timeout=timeout)
+        started = time.perf_counter()
+        with self._lock:
+            self._waiting -= 1
+            self._wait_times.append((started - queued) * 1000)
+            if not acquired:
+                self._timeouts += 1
+            else:
+                self._running += 1
+        self._wait_histogram.observe(started - queued)
+        if not acquired:
+            raise ExecutorBusy(f"No free inference slot after {timeout:.1f}s")
+
+        failed = True
+        try:
+            result = fn(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            finished = time.perf_counter()
+            self._slots.release()
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+                self._errors += int(failed)
+                self._compute_times.append((finished - started) * 1000)
+            self._compute_histogram.observe(finished - started)
+
+    def stats(self):
+        """Slots in use, queue length and wait vs compute percentiles in ms"""
+        with self._lock:
+            waits = sorted(self._wait_times)
+            computes = sorted(self._compute_times)
+            return {
+                "max_concurrent": self.max_concurrent,
+                "threads_per_pass": self.threads_per_pass,
+                "running": self._running,
+                "waiting": self._waiting,
+                "completed": self._completed,
+                "errors": self._errors,
+                "timeouts": self._timeouts,
+                "rejected": self._rejected,
+                "wait_ms_p50": _percentile(waits, 50),
+                "wait_ms_p99": _percentile(waits, 99),
+                "compute_ms_p50": _percentile(computes, 50),
+                "compute_ms_p99": _percentile(computes, 99),
+            }
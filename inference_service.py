@@ -0,0 +1,220 @@
+"""
+inference_service.py - Local classification service shared by every app replica on the host
+Loads the model once, with the same EMAIL_AI_* configuration as the app, and serves it
+over loopback TCP or a Unix socket with HTTP/1.1 keep-alive:
+  GET  /health          labels, checkpoint fingerprint, model_hash, tokenizer settings
+  POST /classify        {"text": "..."}        -> {"probs": [...]}
+  POST /classify_batch  {"texts": ["...", ...]} -> {"probs": [[...], ...]}
+  GET  /metrics         Prometheus text
+Single requests from every client share micro-batches, and every forward pass goes
+through the InferenceExecutor (EMAIL_AI_MAX_CONCURRENT_PASSES / EMAIL_AI_THREADS_PER_PASS).
+Clients point EMAIL_AI_SERVICE_URL at it (see inference_client.py).
+Run: python inference_service.py --port 8765
+     python inference_service.py --socket /run/email-ai/inference.sock
+"""
+
+import argparse
+import json
+import logging
+import os
+import socketserver
+import stat
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from batch_inference import classify_texts
+from inference_executor import InferenceExecutor
+from metrics import CONTENT_TYPE, render, tracked
+from micro_batcher import MicroBatcher
+from model_bundle import resolve_model_bundle, source_fingerprint
+from model_loader import InferenceConfig, load_classifier, serving_hash
+from model_warmup import warm_up
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# ============================================
+# CONFIGURATION
+# ============================================
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+HF_CACHE_DIR = "./hf_cache"        # same cache as simple.py, so both resolve the same bundle
+MAX_LENGTH = 64
+MICRO_BATCH_MAX_SIZE = 16
+MICRO_BATCH_WAIT_MS = 5
+MAX_BATCH_TEXTS = 1024             # texts allowed in one /classify_batch call
+MAX_BODY_BYTES = 32 * 1024 * 1024
+
+class BadRequest(ValueError):
+    """Malformed request body; answered with 400 (or 413 when too large)"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+# ============================================
+# MODEL
+# ============================================
+class InferenceService:
+    """The loaded classifier behind the HTTP handlers"""
+
+    def __init__(self, source, max_length=MAX_LENGTH):
+        self.max_length = max_length
+        self.model, self.tokenizer, encoder = load_classifier(source)
+        warm_up(self.model, self.tokenizer, max_length=max_length)
+        self.executor = InferenceExecutor(
+            max_concurrent=InferenceConfig.MAX_CONCURRENT_PASSES,
+            threads_per_pass=InferenceConfig.THREADS_PER_PASS,
+            queue_timeout=InferenceConfig.QUEUE_TIMEOUT
+        )
+        self.batcher = MicroBatcher(
+            self.classify_batch,
+            max_batch_size=MICRO_BATCH_MAX_SIZE,
+            max_wait_ms=MICRO_BATCH_WAIT_MS,
+            num_threads=self.executor.max_concurrent
+        )
+        self.info = {
+            "labels": list(encoder.classes_),
+            "fingerprint": source_fingerprint(source),
+            "model_hash": serving_hash(source, self.model),
+            "tokenizer": self.tokenizer.name_or_path,
+            "lowercase": getattr(self.tokenizer, "do_lower_case", False),
+            "max_length": max_length,
+        }
+
+    def classify(self, text):
+        """One probability row, batched with concurrent single requests"""
+        return self.batcher.classify(text, timeout=InferenceConfig.QUEUE_TIMEOUT)
+
+    def classify_batch(self, texts):
+        """Probability rows for texts in one executor slot"""
+        return self.executor.run(classify_texts, self.model, self.tokenizer, texts, max_length=self.max_length,
+                                 long_input=InferenceConfig.LONG_INPUT).tolist()
+
+# ============================================
+# HTTP
+# ============================================
+def _text_field(payload, key):
+    value = payload.get(key) if isinstance(payload, dict) else None
+    if not isinstance(value, str):
+        raise BadRequest(f"'{key}' must be a string")
+    return value
+
+def _texts_field(payload, key):
+    values = payload.get(key) if isinstance(payload, dict) else None
+    if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+        raise BadRequest(f"'{key}' must be a list of strings")
+    if len(values) > MAX_BATCH_TEXTS:
+        raise BadRequest(f"At most {MAX_BATCH_TEXTS} texts per call", status=413)
+    return values
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """JSON endpoints over the InferenceService bound to the server"""
+    protocol_version = "HTTP/1.1"   # keep-alive
+    # Headers and body leave in one write, so Nagle and delayed ACKs never stall a kept-alive connection
+    wbufsize = 64 * 1024
+    service = None
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, self.service.info)
+        elif self.path == "/metrics":
+            self._send(200, render().encode("utf-8"), CONTENT_TYPE)
+        else:
+            self._send_json(404, {"error": f"No route {self.path}"})
+
+    def do_POST(self):
+        if self.path == "/classify":
+            kind, handle = "service_classify", lambda payload: self.service.classify(_text_field(payload, "text"))
+        elif self.path == "/classify_batch":
+            kind, handle = "service_batch", lambda payload: self.service.classify_batch(_texts_field(payload, "texts"))
+        else:
+            self._read_body()
+            self._send_json(404, {"error": f"No route {self.path}"})
+            return
+
+        try:
+            payload = self._read_body()
+            with tracked(kind):
+                probs = handle(payload)
+        except BadRequest as e:
+            self._send_json(e.status, {"error": str(e)})
+        except TimeoutError as e:
+            self._send_json(503, {"error": str(e) or "Model busy"})
+        except Exception as e:
+            logger.exception(f"{self.path} failed")
+            self._send_json(500, {"error": repr(e)})
+        else:
+            self._send_json(200, {"probs": probs})
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            # The body stays unread, so this connection cannot carry another request
+            self.close_connection = True
+            raise BadRequest(f"Body larger than {MAX_BODY_BYTES} bytes", status=413)
+        try:
+            return json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            raise BadRequest(f"Invalid JSON: {e}")
+
+    def _send_json(self, status, payload):
+        self._send(status, json.dumps(payload).encode("utf-8"), "application/json")
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # client_address is empty on Unix sockets, so the default formatter cannot be used
+        logger.debug(format % args)
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None):
+    """Threaded HTTP server for service on host:port, or on a Unix socket when socket_path is set"""
+    handler = type("BoundServiceHandler", (ServiceHandler,), {"service": service})
+    if socket_path:
+        # A socket left behind by a previous run would make bind() fail
+        if os.path.exists(socket_path) and stat.S_ISSOCK(os.stat(socket_path).st_mode):
+            os.unlink(socket_path)
+        os.makedirs(os.path.dirname(socket_path) or ".", exist_ok=True)
+        return UnixHTTPServer(socket_path, handler)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+# ============================================
+# MAIN
+# ============================================
+def main():
+    parser = argparse.ArgumentParser(description="Serve the intent classifier to local app replicas")
+    parser.add_argument("--model", default=None,
+                        help="Bundle directory or legacy checkpoint (default: the Hugging Face bundle simple.py uses)")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Keep this a loopback address")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--socket", default=None, help="Listen on this Unix socket instead of TCP")
+    parser.add_argument("--max-length", type=int, default=MAX_LENGTH)
+    args = parser.parse_args()
+
+    source = args.model or resolve_model_bundle(cache_dir=HF_CACHE_DIR)
+    logger.info(f"Loading {source}...")
+    service = InferenceService(source, args.max_length)
+    server = make_server(service, args.host, args.port, args.socket)
+
+    url = f"unix://{os.path.abspath(args.socket)}" if args.socket else f"http://{args.host}:{server.server_address[1]}"
+    print(f"✅ Serving {len(service.info['labels'])} intents at {url} (set EMAIL_AI_SERVICE_URL={url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+if __name__ == "__main__":
+    main()
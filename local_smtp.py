@@ -0,0 +1,148 @@
+"""
+local_smtp.py - Local SMTP stand-in (aiosmtpd) with STARTTLS and AUTH, for benchmarks and dry runs
+Accepts any login and keeps every message it receives in memory.
+Run: python local_smtp.py --port 8025
+     (then EMAIL_AI_SMTP_HOST=127.0.0.1 EMAIL_AI_SMTP_PORT=8025 EMAIL_AI_SMTP_STARTTLS=0 streamlit run simple.py)
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+
+# ============================================
+# TLS
+# ============================================
+def self_signed_context(directory=None):
+    """Server SSLContext with a throwaway self-signed certificate made by the openssl CLI"""
+    directory = directory or tempfile.mkdtemp(prefix="local_smtp_")
+    cert_path, key_path = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                    "-subj", "/CN=localhost", "-keyout", key_path, "-out", cert_path],
+                   check=True, capture_output=True)
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert_path, key_path)
+    return context
+
+def client_context():
+    """Client SSLContext that accepts the stand-in's self-signed certificate (never use it for real servers)"""
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+# ============================================
+# SERVER
+# ============================================
+class RecordingHandler:
+    """aiosmtpd handler keeping (mail_from, rcpt_tos, content) of every message
+
+    For failure drills: temporary_failures maps an address to how many times
+    RCPT TO is answered 451 before it is accepted, rejected addresses always
+    get 550, and delay_ms holds every DATA reply back like a distant server.
+    """
+
+    def __init__(self, temporary_failures=None, rejected=(), delay_ms=0):
+        self.messages = []
+        self.temporary_failures = dict(temporary_failures or {})
+        self.rejected = set(rejected)
+        self.delay_ms = delay_ms
+        self._lock = threading.Lock()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address in self.rejected:
+            return "550 5.1.1 Mailbox does not exist"
+        with self._lock:
+            remaining = self.temporary_failures.get(address, 0)
+            if remaining:
+                self.temporary_failures[address] = remaining - 1
+                return "451 4.7.1 Try again later"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.delay_ms:
+            await asyncio.sleep(self.delay_ms / 1000)
+        with self._lock:
+            self.messages.append((envelope.mail_from, list(envelope.rcpt_tos), envelope.content))
+        return "250 Message accepted for delivery"
+
+def _accept_any_login(server, session, envelope, mechanism, auth_data):
+    from aiosmtpd.smtp import AuthResult
+    return AuthResult(success=True)
+
+class LocalSmtpServer:
+    """aiosmtpd on 127.0.0.1 with AUTH (any credentials) and, when tls is set, required STARTTLS"""
+
+    def __init__(self, port=None, tls=True, handler=None):
+        self.host = "127.0.0.1"
+        self.port = port or free_port()
+        self.tls = tls
+        self.handler = handler or RecordingHandler()
+        self._tls_context = self_signed_context() if tls else None
+        self._controller = None
+
+    @property
+    def messages(self):
+        return self.handler.messages
+
+    def start(self):
+        from aiosmtpd.controller import Controller
+
+        self._controller = Controller(
+            self.handler, hostname=self.host, port=self.port,
+            tls_context=self._tls_context, require_starttls=self.tls,
+            authenticator=_accept_any_login, auth_require_tls=self.tls
+        )
+        self._controller.start()
+        return self
+
+    def stop(self):
+        """Stop listening and drop every open connection"""
+        if self._controller is not None:
+            self._controller.stop()
+            self._controller = None
+
+    def restart(self):
+        """Simulate a server-side drop: every client connection is cut, new ones are accepted"""
+        self.stop()
+        return self.start()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local SMTP stand-in that accepts any login")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--tls", action="store_true", help="Require STARTTLS (self-signed certificate)")
+    args = parser.parse_args()
+
+    server = LocalSmtpServer(args.port, tls=args.tls).start()
+    print(f"📭 SMTP stand-in on {server.host}:{server.port} (STARTTLS {'on' if args.tls else 'off'}), Ctrl+C to stop")
+    seen = 0
+    try:
+        while True:
+            time.sleep(1)
+            for mail_from, rcpt_tos, content in server.messages[seen:]:
+                print(f"📨 {mail_from} -> {', '.join(rcpt_tos)} ({len(content)} bytes)")
+            seen = len(server.messages)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
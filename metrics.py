@@ -0,0 +1,332 @@
+"""
+metrics.py - Low-overhead latency histograms, counters and gauges in the Prometheus text format
+Everything is kept in this process. render() gives the text format, served at
+http://EMAIL_AI_METRICS_HOST:EMAIL_AI_METRICS_PORT/metrics and/or rewritten to
+EMAIL_AI_METRICS_FILE (for node_exporter's textfile collector).
+An observation is a perf_counter() pair, a bisect and a locked increment (a few µs).
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# ============================================
+# CONFIGURATION
+# ============================================
+class MetricsConfig:
+    PORT = int(os.environ.get("EMAIL_AI_METRICS_PORT", "0"))    # 0: no HTTP endpoint
+    HOST = os.environ.get("EMAIL_AI_METRICS_HOST", "127.0.0.1")
+    FILE = os.environ.get("EMAIL_AI_METRICS_FILE", "")          # "": no metrics file
+    FILE_INTERVAL_SECONDS = float(os.environ.get("EMAIL_AI_METRICS_FILE_INTERVAL", "15"))
+
+# Seconds; from sub-millisecond tokenization up to a cold model download
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# ============================================
+# METRIC TYPES
+# ============================================
+class Counter:
+    """Monotonic count"""
+    kind = "counter"
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name, labels):
+        yield name, labels, self.value
+
+class Gauge:
+    """Value set by the caller, or read from fn() whenever it is rendered"""
+    kind = "gauge"
+
+    def __init__(self):
+        self.value = 0.0
+        self.fn = None
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, fn):
+        self.fn = fn
+
+    def get(self):
+        if self.fn is None:
+            return self.value
+        try:
+            return float(self.fn())
+        except Exception:
+            logger.debug("Gauge callback failed", exc_info=True)
+            return math.nan
+
+    def samples(self, name, labels):
+        yield name, labels, self.get()
+
+class Histogram:
+    """Fixed-bucket histogram; observe() never allocates"""
+    kind = "histogram"
+
+    def __init__(self, buckets=STAGE_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # last slot is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)   # bucket bounds are inclusive (le)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def snapshot(self):
+        """(per-bucket counts, sum) read under the lock"""
+        with self._lock:
+            return list(self.counts), self.sum
+
+    def quantile(self, q):
+        """Estimate of the q-quantile (0-1), interpolated inside its bucket like PromQL's histogram_quantile"""
+        counts, _ = self.snapshot()
+        total = sum(counts)
+        if not total:
+            return 0.0
+        rank = q * total
+        cumulative = 0
+        for i, count in enumerate(counts):
+            if count and cumulative + count >= rank:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def samples(self, name, labels):
+        counts, total = self.snapshot()
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            yield f"{name}_bucket", labels + (("le", bound),), cumulative
+        yield f"{name}_sum", labels, total
+        yield f"{name}_count", labels, cumulative
+
+class Family:
+    """One metric name with a child metric per combination of label values"""
+
+    def __init__(self, name, help_text, label_names, factory):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.kind = factory().kind
+        self._factory = factory
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **values):
+        """Child metric for these label values, created on first use"""
+        key = tuple(str(values[name]) for name in self.label_names)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._factory())
+        return child
+
+    def children(self):
+        """[(label values, child)] in creation order"""
+        with self._lock:
+            return list(self._children.items())
+
+    def samples(self):
+        for key, child in self.children():
+            yield from child.samples(self.name, tuple(zip(self.label_names, key)))
+
+# ============================================
+# REGISTRY
+# ============================================
+class Registry:
+    """Named metric families; registering a name again returns the existing family"""
+
+    def __init__(self):
+        self._families = {}
+        self._lock = threading.Lock()
+
+    def _register(self, name, help_text, label_names, factory):
+        with self._lock:
+            if name not in self._families:
+                self._families[name] = Family(name, help_text, label_names, factory)
+            return self._families[name]
+
+    def counter(self, name, help_text, label_names=()):
+        return self._register(name, help_text, label_names, Counter)
+
+    def gauge(self, name, help_text, label_names=()):
+        return self._register(name, help_text, label_names, Gauge)
+
+    def histogram(self, name, help_text, label_names=(), buckets=STAGE_BUCKETS):
+        return self._register(name, help_text, label_names, lambda: Histogram(buckets))
+
+    def families(self):
+        with self._lock:
+            return list(self._families.values())
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram("email_ai_stage_seconds", "Wall time of each hot-path stage", ("stage",))
+LOAD_SECONDS = REGISTRY.histogram("email_ai_load_phase_seconds", "Wall time of each model loading phase",
+                                  ("phase",))
+REQUESTS = REGISTRY.counter("email_ai_requests_total", "Requests handled, by kind", ("kind",))
+ERRORS = REGISTRY.counter("email_ai_errors_total", "Requests that raised, by kind", ("kind",))
+PREDICTION_CACHE = REGISTRY.counter("email_ai_prediction_cache_total", "Prediction cache lookups", ("result",))
+MEMORY_MB = REGISTRY.gauge("email_ai_memory_mb", "Resident memory of this process in MB", ("kind",))
+MODEL_MEMORY_MB = REGISTRY.gauge("email_ai_model_memory_mb",
+                                 "Resident memory added by loading and warming the model, in MB")
+
+# ============================================
+# TIMERS
+# ============================================
+@contextmanager
+def timed(stage, family=STAGE_SECONDS):
+    """Observe the wall time of the with-block, whether or not it raises"""
+    histogram = family.labels(**{family.label_names[0]: stage})
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start)
+
+@contextmanager
+def tracked(kind):
+    """Count one request of this kind, time it as a stage and count an error if it raises"""
+    REQUESTS.labels(kind=kind).inc()
+    try:
+        with timed(kind):
+            yield
+    except Exception:
+        ERRORS.labels(kind=kind).inc()
+        raise
+
+def track_process_memory():
+    """Report RSS (total, anonymous, file-backed) of this process every time metrics are rendered"""
+    from bench_utils import current_rss_mb, rss_breakdown_mb
+    MEMORY_MB.labels(kind="rss").set_function(current_rss_mb)
+    MEMORY_MB.labels(kind="anon").set_function(lambda: rss_breakdown_mb()[0])
+    MEMORY_MB.labels(kind="file").set_function(lambda: rss_breakdown_mb()[1])
+
+def stage_summary(family=STAGE_SECONDS):
+    """One row per stage: count, mean and estimated p50/p95/p99 in milliseconds"""
+    rows = []
+    for (stage,), histogram in family.children():
+        counts, total = histogram.snapshot()
+        count = sum(counts)
+        rows.append({
+            family.label_names[0]: stage,
+            "count": count,
+            "mean_ms": total / count * 1000 if count else 0.0,
+            "p50_ms": histogram.quantile(0.50) * 1000,
+            "p95_ms": histogram.quantile(0.95) * 1000,
+            "p99_ms": histogram.quantile(0.99) * 1000,
+        })
+    return rows
+
+# ============================================
+# EXPOSITION
+# ============================================
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and math.isnan(value):
+        return "NaN"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (name, value if isinstance(value, str) else _format_value(value))
+        for name, value in labels
+    )
+    return "{" + ",".join(
+        f'{name}="' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for name, value in escaped
+    ) + "}"
+
+def render(registry=REGISTRY):
+    """Every metric in the Prometheus text exposition format"""
+    lines = []
+    for family in registry.families():
+        lines.append(f"# HELP {family.name} {family.help_text}")
+        lines.append(f"# TYPE {family.name} {family.kind}")
+        for name, labels, value in family.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+def write_metrics_file(path, registry=REGISTRY):
+    """Atomically replace path with the current metrics"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(render(registry))
+    os.replace(tmp_path, path)
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """GET /metrics for a Prometheus scraper"""
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+def _write_periodically(path, interval):
+    while True:
+        try:
+            write_metrics_file(path)
+        except OSError:
+            logger.exception(f"Could not write metrics to {path}")
+        time.sleep(interval)
+
+def start_exporter(port=None, path=None, host=None, interval=None):
+    """Serve /metrics on port and/or rewrite path every interval seconds, on daemon threads
+
+    Arguments default to MetricsConfig; returns (http server or None, file writer thread or None).
+    """
+    port = MetricsConfig.PORT if port is None else port
+    path = MetricsConfig.FILE if path is None else path
+    host = host or MetricsConfig.HOST
+    interval = interval or MetricsConfig.FILE_INTERVAL_SECONDS
+
+    server = writer = None
+    if port:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        logger.info(f"Metrics at http://{host}:{server.server_address[1]}/metrics")
+    if path:
+        writer = threading.Thread(target=_write_periodically, args=(path, interval),
+                                  name="metrics-file", daemon=True)
+        writer.start()
+        logger.info(f"Metrics written to {path} every {interval:g}s")
+    return server, writer
@@ -0,0 +1,152 @@
+"""
+micro_batcher.py - Collect concurrent classification requests into shared forward passes
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+
+from metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# ============================================
+# DEFAULTS
+# ============================================
+DEFAULT_MAX_BATCH_SIZE = 16
+DEFAULT_MAX_WAIT_MS = 5.0
+WAIT_SAMPLES = 2048          # recent queue waits kept for percentiles
+LOG_EVERY_BATCHES = 500
+
+def _percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+# ============================================
+# MICRO-BATCHER
+# ============================================
+class MicroBatcher:
+    """Run concurrent requests through predict_fn in small batches
+
+    predict_fn takes a list of texts and returns one result per text, in
+    order (for example a probability tensor). A background thread waits up
+    to max_wait_ms after the first request for more to arrive, or until
+    max_batch_size requests are queued, then runs one batched call and
+    hands each caller its own row. With num_threads > 1 that many batches
+    can be collected and run at once (bound them with an InferenceExecutor).
+    """
+
+    def __init__(self, predict_fn, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms=DEFAULT_MAX_WAIT_MS, name="micro-batcher", num_threads=1):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._wait_times = deque(maxlen=WAIT_SAMPLES)
+        self._requests = 0
+        self._batches = 0
+        self._errors = 0
+
+        self._threads = [
+            threading.Thread(target=self._run, name=f"{name}-{i}" if num_threads > 1 else name, daemon=True)
+            for i in range(num_threads)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, text):
+        """Queue one text and return a Future for its result"""
+        future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def classify(self, text, timeout=None):
+        """Classify one text, blocking until its batch has run
+
+        On timeout a request that is still queued is dropped, so it never
+        takes a place in a batch.
+        """
+        future = self.submit(text)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def _collect(self):
+        """Block for the first request, then gather more until the window closes"""
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    # Window closed, but take anything already waiting
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Requests whose caller timed out were cancelled while queued
+            batch = [item for item in self._collect() if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            started = time.perf_counter()
+            texts = [text for text, _, _ in batch]
+
+            try:
+                results = self.predict_fn(texts)
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+                failed = False
+            except Exception as e:
+                logger.exception("Batched prediction failed")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                failed = True
+
+            queue_wait = STAGE_SECONDS.labels(stage="micro_batch_wait")
+            for _, _, queued in batch:
+                queue_wait.observe(started - queued)
+
+            with self._lock:
+                self._requests += len(batch)
+                self._batches += 1
+                self._errors += int(failed)
+                self._batch_sizes[len(batch)] += 1
+                self._wait_times.extend((started - queued) * 1000 for _, _, queued in batch)
+                batches = self._batches
+
+            if batches % LOG_EVERY_BATCHES == 0:
+                logger.info(f"Micro-batcher stats: {self.stats()}")
+
+    def stats(self):
+        """Queue depth, batch-size histogram and queue-wait metrics for tuning the window"""
+        with self._lock:
+            waits = sorted(self._wait_times)
+            return {
+                "queue_depth": self._queue.qsize(),
+                "requests": self._requests,
+                "batches": self._batches,
+                "errors": self._errors,
+                "mean_batch_size": self._requests / self._batches if self._batches else 0.0,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "wait_ms_p50": _percentile(waits, 50),
+                "wait_ms_p95": _percentile(waits, 95),
+                "wait_ms_p99": _percentile(waits, 99),
+                "wait_ms_max": waits[-1] if waits else 0.0,
+            }
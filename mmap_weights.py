@@ -0,0 +1,86 @@
+"""
+mmap_weights.py - Memory-mapped safetensors weights assigned into a meta-device model
+
+The weights file is mapped copy-on-write, so its pages come straight from
+the page cache and are shared by every process on the host that maps the
+same file. The model skeleton is built on the meta device (no storage at
+all) and the mapped tensors are assigned into it, so the load never holds
+a second copy of the weights.
+"""
+
+import json
+import struct
+
+import numpy as np
+import torch
+from transformers import DistilBertConfig, DistilBertForSequenceClassification
+
+# safetensors dtype -> (numpy view dtype, torch dtype)
+_DTYPES = {
+    "F64": (np.float64, torch.float64),
+    "F32": (np.float32, torch.float32),
+    "F16": (np.float16, torch.float16),
+    "BF16": (np.int16, torch.bfloat16),   # numpy has no bfloat16, reinterpret the bits
+    "I64": (np.int64, torch.int64),
+    "I32": (np.int32, torch.int32),
+    "I16": (np.int16, torch.int16),
+    "I8": (np.int8, torch.int8),
+    "U8": (np.uint8, torch.uint8),
+    "BOOL": (np.bool_, torch.bool),
+}
+
+def read_safetensors_header(path):
+    """Return (header dict, byte offset where tensor data starts)"""
+    with open(path, "rb") as f:
+        header_size = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(header_size))
+    return header, 8 + header_size
+
+def load_safetensors_mmap(path):
+    """Map a .safetensors file and return {name: tensor} views into the mapping (zero-copy)"""
+    header, data_start = read_safetensors_header(path)
+    # mode 'c' = private copy-on-write mapping: shared page cache, tensors stay writable
+    buffer = np.memmap(path, dtype=np.uint8, mode="c")
+
+    tensors = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        start, end = info["data_offsets"]
+        np_dtype, torch_dtype = _DTYPES[info["dtype"]]
+        array = buffer[data_start + start:data_start + end].view(np_dtype).reshape(info["shape"])
+        tensor = torch.from_numpy(array)
+        if tensor.dtype != torch_dtype:
+            tensor = tensor.view(torch_dtype)
+        tensors[name] = tensor
+    return tensors
+
+def _materialize_buffers(model):
+    """Recreate non-persistent buffers, which are not in the weights file and stay on meta"""
+    for name, buffer in list(model.named_buffers()):
+        if not buffer.is_meta:
+            continue
+        module_name, _, buffer_name = name.rpartition(".")
+        if buffer_name != "position_ids":
+            raise ValueError(f"Don't know how to rebuild buffer '{name}' after meta-device load")
+        value = torch.arange(buffer.shape[-1]).expand(buffer.shape)
+        model.get_submodule(module_name).register_buffer(buffer_name, value, persistent=False)
+
+def load_model_mmap(config_dir, weights_path):
+    """Build the classifier on the meta device and assign mmap-backed weights into it"""
+    config = DistilBertConfig.from_pretrained(config_dir, local_files_only=True)
+    state = load_safetensors_mmap(weights_path)
+
+    with torch.device("meta"):
+        model = DistilBertForSequenceClassification(config)
+
+    expected = model.state_dict().keys()
+    missing = [key for key in expected if key not in state]
+    if missing:
+        raise ValueError(f"{weights_path} is missing {len(missing)} tensors, e.g. {missing[:3]}")
+
+    # Keys the model does not expect (e.g. an old persisted position_ids) are ignored
+    model.load_state_dict({key: state[key] for key in expected}, assign=True)
+    _materialize_buffers(model)
+    model.eval()
+    return model
@@ -0,0 +1,260 @@
+"""
+model_bundle.py - Versioned, self-contained model bundle (config, weights, tokenizer, labels)
+
+A bundle is one directory:
+    bundle.json          format name/version, label list, max_length, weights hash
+    config.json          DistilBERT config (num_labels, id2label)
+    model.safetensors    fine-tuned weights (memory-mapped at load, see mmap_weights.py)
+    tokenizer files      vocab.txt, tokenizer_config.json, ...
+"""
+
+import contextlib
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+
+import numpy as np
+import torch
+from safetensors.torch import save_file
+from sklearn.preprocessing import LabelEncoder
+from transformers import DistilBertConfig, DistilBertForSequenceClassification, DistilBertTokenizer
+
+from mmap_weights import load_model_mmap
+from prediction_cache import model_fingerprint
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT = "email-intent-bundle"
+BUNDLE_VERSION = 2          # v2: weights always stored as a single model.safetensors
+MANIFEST_FILE = "bundle.json"
+WEIGHTS_FILE = "model.safetensors"
+
+_COMMIT_SHA_RE = re.compile(r"^[0-9a-f]{40}$")
+
+# ============================================
+# CONFIGURATION
+# ============================================
+class BundleConfig:
+    BASE_MODEL = "distilbert-base-uncased"
+    REPO_ID = os.environ.get("EMAIL_AI_MODEL_REPO", "vatsal124/email-classifier")
+    # Any revision is resolved from the cache with no network call once it is there;
+    # EMAIL_AI_MODEL_REFRESH=1 asks the hub where a branch or tag such as "main" points now
+    REVISION = os.environ.get("EMAIL_AI_MODEL_REVISION", "main")
+    REFRESH = os.environ.get("EMAIL_AI_MODEL_REFRESH", "0") == "1"
+    SUBFOLDER = "bundle"
+    LEGACY_FILENAME = "ultra_fast_model.pt"
+    CACHE_DIR = os.environ.get("EMAIL_AI_HF_CACHE", "./hf_cache")
+    LOCAL_BUNDLE_DIR = os.environ.get("EMAIL_AI_BUNDLE_DIR", "./model_bundle")
+    MAX_LENGTH = 64
+
+def no_phase(name):
+    """Default phase timer: loaders call phase(name) around each slow step"""
+    return contextlib.nullcontext()
+
+# ============================================
+# LABELS
+# ============================================
+def encoder_from_labels(labels):
+    """Rebuild a fitted LabelEncoder from the bundle's label list"""
+    encoder = LabelEncoder()
+    encoder.classes_ = np.array(labels, dtype=object)
+    return encoder
+
+# ============================================
+# LEGACY CHECKPOINT (ultra_fast_model.pt)
+# ============================================
+def load_legacy_checkpoint(checkpoint_path, phase=no_phase):
+    """Build the classifier from a pickled training checkpoint plus the base weights"""
+    with phase("torch.load"):
+        checkpoint = torch.load(checkpoint_path, weights_only=False, map_location='cpu')
+    encoder = checkpoint['label_encoder']
+
+    with phase("from_pretrained"):
+        model = DistilBertForSequenceClassification.from_pretrained(
+            BundleConfig.BASE_MODEL,
+            num_labels=len(encoder.classes_)
+        )
+    with phase("load_state_dict"):
+        model.load_state_dict(checkpoint['model_state_dict'])
+    model.eval()
+    return model, encoder
+
+# ============================================
+# WRITE / READ
+# ============================================
+def _weights_files(bundle_dir):
+    return sorted(glob.glob(os.path.join(bundle_dir, "*.safetensors"))
+                  + glob.glob(os.path.join(bundle_dir, "*.bin")))
+
+def _hash_files(paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(model_fingerprint(path).encode())
+    return digest.hexdigest()
+
+def write_bundle(config, state_dict, tokenizer, labels, out_dir,
+                 max_length=BundleConfig.MAX_LENGTH, source=None):
+    """Write a bundle atomically (built in a temp dir, then renamed into place)"""
+    tmp_dir = out_dir.rstrip("/") + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    config.num_labels = len(labels)
+    config.id2label = dict(enumerate(labels))
+    config.label2id = {label: i for i, label in enumerate(labels)}
+    config.save_pretrained(tmp_dir)
+    save_file({key: tensor.contiguous() for key, tensor in state_dict.items()},
+              os.path.join(tmp_dir, WEIGHTS_FILE), metadata={"format": "pt"})
+    tokenizer.save_pretrained(tmp_dir)
+
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "version": BUNDLE_VERSION,
+        "labels": list(labels),
+        "max_length": max_length,
+        "weights_sha256": _hash_files(_weights_files(tmp_dir)),
+        "source": source,
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return out_dir
+
+def is_bundle(path):
+    return os.path.isfile(os.path.join(path, MANIFEST_FILE))
+
+def read_manifest(bundle_dir):
+    """Read and validate bundle.json"""
+    with open(os.path.join(bundle_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != BUNDLE_FORMAT:
+        raise ValueError(f"{bundle_dir} is not an {BUNDLE_FORMAT} (format={manifest.get('format')})")
+    if manifest.get("version", 0) > BUNDLE_VERSION:
+        raise ValueError(f"Bundle version {manifest['version']} is newer than supported ({BUNDLE_VERSION})")
+    return manifest
+
+def bundle_fingerprint(bundle_dir):
+    """Weights hash recorded when the bundle was written"""
+    return read_manifest(bundle_dir)["weights_sha256"]
+
+def load_bundle_model(bundle_dir, phase=no_phase):
+    """Build (model, label_encoder) straight from a bundle, offline, in one weight load"""
+    manifest = read_manifest(bundle_dir)
+    weights_path = os.path.join(bundle_dir, WEIGHTS_FILE)
+    if os.path.exists(weights_path):
+        with phase("mmap weights"):
+            model = load_model_mmap(bundle_dir, weights_path)
+    else:
+        # v1 bundles written by save_pretrained() may hold a .bin file
+        with phase("from_pretrained"):
+            model = DistilBertForSequenceClassification.from_pretrained(bundle_dir, local_files_only=True)
+        model.eval()
+    return model, encoder_from_labels(manifest["labels"])
+
+def load_tokenizer(source, phase=no_phase):
+    """Tokenizer stored in a bundle, or the base model's for a legacy checkpoint"""
+    with phase("tokenizer"):
+        if is_bundle(source):
+            return DistilBertTokenizer.from_pretrained(source, local_files_only=True)
+        return DistilBertTokenizer.from_pretrained(BundleConfig.BASE_MODEL)
+
+def source_fingerprint(source):
+    """Content hash of a bundle directory or a legacy checkpoint file"""
+    return bundle_fingerprint(source) if is_bundle(source) else model_fingerprint(source)
+
+def load_model_source(source, phase=no_phase):
+    """(model, label_encoder) from either a bundle directory or a legacy checkpoint"""
+    if is_bundle(source):
+        return load_bundle_model(source, phase)
+    return load_legacy_checkpoint(source, phase)
+
+# ============================================
+# CONVERSION
+# ============================================
+def convert_checkpoint(checkpoint_path, out_dir):
+    """Turn a legacy ultra_fast_model.pt into a bundle
+
+    The state dict is copied straight from the (memory-mapped) pickle into
+    safetensors, so no model is built and the base weights are not downloaded.
+    """
+    checkpoint = torch.load(checkpoint_path, weights_only=False, map_location='cpu', mmap=True)
+    labels = list(checkpoint['label_encoder'].classes_)
+    config = DistilBertConfig.from_pretrained(BundleConfig.BASE_MODEL)
+    tokenizer = DistilBertTokenizer.from_pretrained(BundleConfig.BASE_MODEL)
+    return write_bundle(config, checkpoint['model_state_dict'], tokenizer, labels, out_dir,
+                        source=os.path.basename(checkpoint_path))
+
+def ensure_local_bundle(checkpoint_path, bundle_root=None):
+    """Convert a legacy checkpoint into a bundle under bundle_root once, keyed by its hash"""
+    bundle_root = bundle_root or BundleConfig.LOCAL_BUNDLE_DIR
+    bundle_dir = os.path.join(bundle_root, model_fingerprint(checkpoint_path)[:16])
+    if not is_bundle(bundle_dir):
+        logger.info(f"Converting {checkpoint_path} into a model bundle at {bundle_dir}...")
+        os.makedirs(bundle_root, exist_ok=True)
+        convert_checkpoint(checkpoint_path, bundle_dir)
+    return bundle_dir
+
+# ============================================
+# RESOLVE FROM THE HUB
+# ============================================
+def is_commit_sha(revision):
+    return bool(_COMMIT_SHA_RE.match(revision or ""))
+
+def resolve_model_bundle(repo_id=None, revision=None, cache_dir=None, refresh=None):
+    """Local path of the model bundle
+
+    For each lookup mode the bundle is tried first, then the legacy
+    checkpoint (converted locally once). The HF cache is looked up first,
+    and the hub is only asked when nothing is cached, so a cached bundle
+    starts with no network call. With refresh a branch or tag such as
+    "main" is asked of the hub first, to pick up new pushes (a commit sha
+    never moves, so it stays cache-first); huggingface_hub still answers
+    from the cached snapshot when the hub is unreachable or HF_HUB_OFFLINE=1.
+    """
+    from huggingface_hub import hf_hub_download, snapshot_download
+    from huggingface_hub.utils import LocalEntryNotFoundError, EntryNotFoundError
+
+    repo_id = repo_id or BundleConfig.REPO_ID
+    revision = revision or BundleConfig.REVISION
+    cache_dir = cache_dir or BundleConfig.CACHE_DIR
+    refresh = BundleConfig.REFRESH if refresh is None else refresh
+
+    def find_bundle(local_files_only):
+        snapshot = snapshot_download(
+            repo_id, revision=revision, cache_dir=cache_dir,
+            allow_patterns=[f"{BundleConfig.SUBFOLDER}/*"],
+            local_files_only=local_files_only
+        )
+        bundle_dir = os.path.join(snapshot, BundleConfig.SUBFOLDER)
+        return bundle_dir if is_bundle(bundle_dir) else None
+
+    def find_legacy(local_files_only):
+        checkpoint_path = hf_hub_download(
+            repo_id=repo_id, filename=BundleConfig.LEGACY_FILENAME,
+            revision=revision, cache_dir=cache_dir,
+            local_files_only=local_files_only
+        )
+        return ensure_local_bundle(checkpoint_path)
+
+    if refresh and not is_commit_sha(revision):
+        logger.info(f"Checking {repo_id} for updates to '{revision}'")
+        modes = (False,)
+    else:
+        modes = (True, False)
+
+    for local_files_only in modes:
+        for find in (find_bundle, find_legacy):
+            try:
+                bundle_dir = find(local_files_only)
+            except (LocalEntryNotFoundError, EntryNotFoundError):
+                continue
+            if bundle_dir:
+                return bundle_dir
+
+    raise FileNotFoundError(f"No model bundle or {BundleConfig.LEGACY_FILENAME} in {repo_id}@{revision}")
@@ -0,0 +1,140 @@
+"""
+model_loader.py - Load the intent classifier for the app and the CLI
+The model source is a bundle directory (see model_bundle.py) or a legacy .pt checkpoint
+Precision is picked with EMAIL_AI_PRECISION=fp32|int8
+Runtime is picked with EMAIL_AI_BACKEND=eager|torchscript|onnx
+"""
+
+import logging
+import os
+
+import torch
+
+from early_exit import load_early_exit
+from inference_backends import BACKENDS, EagerBackend, export_all, load_exported
+from model_bundle import load_model_source, load_tokenizer, no_phase, source_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# ============================================
+# CONFIGURATION
+# ============================================
+class InferenceConfig:
+    PRECISION = os.environ.get("EMAIL_AI_PRECISION", "fp32")
+    BACKEND = os.environ.get("EMAIL_AI_BACKEND", "eager")
+    ARTIFACT_DIR = os.environ.get("EMAIL_AI_ARTIFACT_DIR", "./model_artifacts")
+    NUM_WORKERS = int(os.environ.get("EMAIL_AI_WORKERS", "1"))
+    THREADS_PER_WORKER = int(os.environ.get("EMAIL_AI_THREADS_PER_WORKER", "1"))
+    # Distilled student in front of DistilBERT ("" turns the cascade off)
+    STUDENT_PATH = os.environ.get("EMAIL_AI_STUDENT", os.path.join(ARTIFACT_DIR, "student.pt"))
+    # Overrides the threshold calibrated by distill_student.py
+    STUDENT_THRESHOLD = (float(os.environ["EMAIL_AI_STUDENT_THRESHOLD"])
+                         if os.environ.get("EMAIL_AI_STUDENT_THRESHOLD") else None)
+    # Early-exit heads for the eager backend ("" turns early exit off)
+    EARLY_EXIT_PATH = os.environ.get("EMAIL_AI_EARLY_EXIT", os.path.join(ARTIFACT_DIR, "early_exit.pt"))
+    EARLY_EXIT_THRESHOLD = float(os.environ.get("EMAIL_AI_EARLY_EXIT_THRESHOLD", "0.95"))
+    # mean|max|confident: classify long emails by sliding windows ("" truncates at max_length)
+    LONG_INPUT = os.environ.get("EMAIL_AI_LONG_INPUT", "")
+    # Forward passes allowed at once in the app, and torch threads for each (0: cores / passes)
+    MAX_CONCURRENT_PASSES = int(os.environ.get("EMAIL_AI_MAX_CONCURRENT_PASSES", "1"))
+    THREADS_PER_PASS = int(os.environ.get("EMAIL_AI_THREADS_PER_PASS", "0"))
+    # Seconds a request may wait for the model before it is turned away
+    QUEUE_TIMEOUT = float(os.environ.get("EMAIL_AI_QUEUE_TIMEOUT", "30"))
+
+PRECISIONS = ("fp32", "int8")
+
+# ============================================
+# FP32
+# ============================================
+def load_fp32_model(source, phase=no_phase):
+    """Build the fp32 classifier from a model bundle or a legacy training checkpoint"""
+    return load_model_source(source, phase)
+
+# ============================================
+# INT8 (DYNAMIC QUANTIZATION)
+# ============================================
+def quantize_model(model):
+    """Dynamic INT8 quantization of every Linear layer"""
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def quantized_artifact_path(source):
+    """Where the INT8 model built from this checkpoint is cached"""
+    fingerprint = source_fingerprint(source)
+    return os.path.join(InferenceConfig.ARTIFACT_DIR, f"int8-{fingerprint[:16]}.pt")
+
+def load_int8_model(source, phase=no_phase):
+    """Load the cached INT8 model, quantizing and caching it on first use"""
+    artifact_path = quantized_artifact_path(source)
+
+    if os.path.exists(artifact_path):
+        with phase("torch.load"):
+            artifact = torch.load(artifact_path, weights_only=False, map_location='cpu')
+        model = artifact['model']
+        model.eval()
+        return model, artifact['label_encoder']
+
+    logger.info("Quantizing model to INT8 (first run for this checkpoint)...")
+    model, encoder = load_fp32_model(source, phase)
+    with phase("quantize"):
+        model = quantize_model(model)
+
+    os.makedirs(InferenceConfig.ARTIFACT_DIR, exist_ok=True)
+    tmp_path = artifact_path + ".tmp"
+    torch.save({'model': model, 'label_encoder': encoder}, tmp_path)
+    os.replace(tmp_path, artifact_path)
+    logger.info(f"✓ INT8 model cached at {artifact_path}")
+    return model, encoder
+
+# ============================================
+# ENTRY POINT
+# ============================================
+def load_exported_backend(source, backend, phase=no_phase):
+    """Load a TorchScript/ONNX export of the checkpoint, exporting it on first use"""
+    fingerprint = source_fingerprint(source)
+    with phase(f"load {backend}"):
+        loaded = load_exported(backend, InferenceConfig.ARTIFACT_DIR, fingerprint)
+    if loaded is None:
+        logger.info(f"No {backend} export for this checkpoint yet, exporting...")
+        model, encoder = load_fp32_model(source, phase)
+        with phase(f"export {backend}"):
+            export_all(model, encoder, InferenceConfig.ARTIFACT_DIR, fingerprint, formats=[backend])
+        del model
+        loaded = load_exported(backend, InferenceConfig.ARTIFACT_DIR, fingerprint)
+    return loaded
+
+def load_classifier(source, precision=None, backend=None, phase=no_phase, early_exit=True):
+    """Return (backend, tokenizer, label_encoder) for the configured precision and runtime
+
+    phase(name) is entered around each slow loading step, for timing.
+    With early_exit, an eager model whose early-exit heads exist is wrapped in EarlyExitBackend.
+    """
+    precision = precision or InferenceConfig.PRECISION
+    backend = backend or InferenceConfig.BACKEND
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision '{precision}', expected one of {PRECISIONS}")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+    if precision == "int8" and backend != "eager":
+        raise ValueError("INT8 dynamic quantization is only available with the eager backend")
+
+    if backend != "eager":
+        runner, encoder = load_exported_backend(source, backend, phase)
+    elif precision == "int8":
+        model, encoder = load_int8_model(source, phase)
+        runner = EagerBackend(model)
+    else:
+        model, encoder = load_fp32_model(source, phase)
+        runner = EagerBackend(model)
+
+    if early_exit and backend == "eager":
+        runner = load_early_exit(InferenceConfig.EARLY_EXIT_PATH, runner.model, encoder.classes_,
+                                 source_fingerprint(source), InferenceConfig.EARLY_EXIT_THRESHOLD) or runner
+
+    tokenizer = load_tokenizer(source, phase)
+    return runner, tokenizer, encoder
+
+def serving_hash(source, runner):
+    """Identifies the answers this configuration gives: checkpoint, precision, runtime, early exit, long input"""
+    return (f"{source_fingerprint(source)}-{InferenceConfig.PRECISION}-{InferenceConfig.BACKEND}"
+            f"{'-' + runner.tag if getattr(runner, 'tag', '') else ''}"
+            f"{'-long-' + InferenceConfig.LONG_INPUT if InferenceConfig.LONG_INPUT else ''}")
@@ -0,0 +1,111 @@
+"""
+model_warmup.py - Load and warm the classifier on a background thread
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import LOAD_SECONDS
+
+logger = logging.getLogger(__name__)
+
+WARMUP_LENGTHS = (8, 32, 64)   # words per dummy email, covers typical message sizes
+WARMUP_BATCH_SIZES = (1, 4)
+
+def warm_up(model, tokenizer, max_length=64):
+    """Run a few dummy forward passes so the first real request is not the slow one"""
+    from batch_inference import classify_texts
+
+    for words in WARMUP_LENGTHS:
+        for batch_size in WARMUP_BATCH_SIZES:
+            classify_texts(model, tokenizer, ["hello world " * (words // 2)] * batch_size,
+                           max_length=max_length)
+
+class ModelWarmer:
+    """Run target(warmer) on a daemon thread and keep its result for later callers
+
+    target reports progress through warmer.phase(name), which records how
+    long each phase took and which one is running.
+    """
+
+    def __init__(self, target, name="model-warmup"):
+        self.phases = {}
+        self._phases_lock = threading.Lock()
+        self.current_phase = "starting"
+        self.error = None
+        self._result = None
+        self._started = time.perf_counter()
+        self._finished = None
+        self._ready = threading.Event()
+        self._target = target
+
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    @contextmanager
+    def phase(self, name):
+        """Time one warm-up phase"""
+        self.current_phase = name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self._phases_lock:
+                self.phases[name] = seconds
+            LOAD_SECONDS.labels(phase=name).observe(seconds)
+            logger.info(f"Warm-up phase '{name}' took {seconds:.2f}s")
+
+    def phase_timings(self):
+        """Copy of phases, safe to iterate while the warm-up thread is still adding to it"""
+        with self._phases_lock:
+            return dict(self.phases)
+
+    def _run(self):
+        try:
+            self._result = self._target(self)
+            self.current_phase = "ready"
+        except Exception as e:
+            logger.exception("Model warm-up failed")
+            self.error = e
+            self.current_phase = "failed"
+        finally:
+            self._finished = time.perf_counter()
+            self._ready.set()
+
+    @property
+    def ready(self):
+        return self._ready.is_set() and self.error is None
+
+    @property
+    def elapsed(self):
+        end = self._finished if self._finished is not None else time.perf_counter()
+        return end - self._started
+
+    def failed_for(self):
+        """Seconds since the warm-up failed, or None when it has not (yet) failed"""
+        if self.error is None or self._finished is None:
+            return None
+        return time.perf_counter() - self._finished
+
+    def join(self, timeout=None):
+        """Wait up to timeout for warm-up to end, successfully or not; True once it has"""
+        return self._ready.wait(timeout)
+
+    def wait(self, timeout=None):
+        """Block until warm-up finishes and return its result (re-raising any failure)"""
+        if not self._ready.wait(timeout):
+            raise TimeoutError(f"Model still warming up ({self.current_phase})")
+        if self.error is not None:
+            raise self.error
+        return self._result
+
+    def status_text(self):
+        """One-line readiness message for the UI"""
+        if self.error is not None:
+            return "🔴 Model failed to load"
+        if self._ready.is_set():
+            return f"🟢 Model ready ({self.elapsed:.1f}s warm-up)"
+        return f"🟡 Warming up model: {self.current_phase} ({self.elapsed:.0f}s)"
@@ -0,0 +1,105 @@
+"""
+parallel_tokenize.py - Tokenize chunks of texts on a process pool, results in submission order
+
+Each worker gets the tokenizer once (pool initializer) and tokenizes pieces
+of a chunk. Pieces are reassembled in order, so the output is identical to
+one tokenizer(...) call over the whole chunk.
+"""
+
+import logging
+import multiprocessing
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import Future, ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# ============================================
+# WORKER
+# ============================================
+_tokenizer = None
+_options = None
+
+def _init_worker(tokenizer, options):
+    global _tokenizer, _options
+    # One process per core already; the fast tokenizer's own threads would oversubscribe
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    _tokenizer = tokenizer
+    _options = options
+
+def _tokenize_piece(texts):
+    start = time.perf_counter()
+    encodings = _tokenizer(texts, **_options)
+    return encodings["input_ids"], encodings["attention_mask"], os.getpid(), time.perf_counter() - start
+
+# ============================================
+# POOL
+# ============================================
+class ChunkResult:
+    """Pending tokenization of one chunk; result() joins its pieces in order"""
+
+    def __init__(self, futures, stats):
+        self.futures = futures
+        self.stats = stats
+
+    def result(self):
+        input_ids, attention_mask = [], []
+        for future in self.futures:
+            piece_ids, piece_mask, pid, seconds = future.result()
+            input_ids.extend(piece_ids)
+            attention_mask.extend(piece_mask)
+            self.stats[pid][0] += len(piece_ids)
+            self.stats[pid][1] += seconds
+        return input_ids, attention_mask
+
+class ParallelTokenizer:
+    """Spread tokenizer(texts, **options) over `workers` forked processes
+
+    With workers=1 everything runs in this process through the same code
+    path, which is the reference the parallel output must match.
+    """
+
+    def __init__(self, tokenizer, workers=1, piece_size=1000, **options):
+        self.workers = max(1, workers)
+        self.piece_size = piece_size
+        self.stats = defaultdict(lambda: [0, 0.0])   # pid -> [rows, busy seconds]
+        if self.workers == 1:
+            _init_worker(tokenizer, options)
+            self._executor = None
+        else:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_init_worker,
+                initargs=(tokenizer, options)
+            )
+
+    def submit(self, texts):
+        """Start tokenizing one chunk and return a ChunkResult"""
+        # Small enough pieces that every worker gets a share of each chunk
+        piece_size = max(1, min(self.piece_size, -(-len(texts) // self.workers)))
+        pieces = [texts[i:i + piece_size] for i in range(0, len(texts), piece_size)]
+        if self._executor is None:
+            futures = []
+            for piece in pieces:
+                future = Future()
+                future.set_result(_tokenize_piece(piece))
+                futures.append(future)
+        else:
+            futures = [self._executor.submit(_tokenize_piece, piece) for piece in pieces]
+        return ChunkResult(futures, self.stats)
+
+    def log_worker_rates(self):
+        for worker, (pid, (rows, seconds)) in enumerate(sorted(self.stats.items())):
+            logger.info(f"  worker {worker} (pid {pid}): {rows} rows, {rows / max(seconds, 1e-9):.0f} rows/s")
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
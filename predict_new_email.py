@@ -1,78 +1,319 @@
-"""
-predict_new_email.py - Classify new emails with your trained model
-"""
-
-import torch
-import pandas as pd
-from transformers import DistilBertForSequenceClassification, DistilBertTokenizer
-import pickle
-
-# Load model and label encoder
-checkpoint = torch.load("ultra_fast_model.pt", weights_only=False)
-label_encoder = checkpoint['label_encoder']
-
-# Load model architecture
-model = DistilBertForSequenceClassification.from_pretrained(
-    "distilbert-base-uncased",
-    num_labels=len(label_encoder.classes_)
-)
-model.load_state_dict(checkpoint['model_state_dict'])
-model.eval()
-
-# Load tokenizer
-tokenizer = DistilBertTokenizer.from_pretrained("distilbert-base-uncased")
-
-def predict_email(email_text):
-    """Predict intent of a single email"""
-    
-    # Tokenize
-    inputs = tokenizer(
-        email_text,
-        truncation=True,
-        padding=True,
-        max_length=64,
-        return_tensors='pt'
-    )
-    
-    # Predict
-    with torch.no_grad():
-        outputs = model(**inputs)
-        probabilities = torch.softmax(outputs.logits, dim=1)[0]
-        prediction = torch.argmax(outputs.logits, dim=1).item()
-    
-    # Get results
-    intent = label_encoder.classes_[prediction]
-    confidence = probabilities[prediction].item()
-    
-    # Get all probabilities
-    all_probs = {
-        label: probabilities[i].item() 
-        for i, label in enumerate(label_encoder.classes_)
-    }
-    
-    return intent, confidence, all_probs
-
-# Example usage
-if __name__ == "__main__":
-    print("="*60)
-    print("EMAIL INTENT CLASSIFIER")
-    print("="*60)
-    
-    while True:
-        print("\n" + "-"*40)
-        email = input("Enter email text (or 'quit' to exit):\n> ")
-        
-        if email.lower() == 'quit':
-            break
-        
-        if not email.strip():
-            continue
-        
-        intent, confidence, all_probs = predict_email(email)
-        
-        print(f"\n📧 PREDICTION: {intent.upper()}")
-        print(f"🎯 Confidence: {confidence:.2%}")
-        print("\n📊 All probabilities:")
-        for label, prob in sorted(all_probs.items(), key=lambda x: x[1], reverse=True):
-            bar = "█" * int(prob * 50)
-            print(f"  {label:12}: {prob:5.2%} {bar}")
\ No newline at end of file
+"""
+predict_new_email.py - Classify new emails with your trained model
+"""
+
+import argparse
+import collections
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+import torch
+import pandas as pd
+import pickle
+
+from batch_inference import (iter_classify, classify_encoded, classify_windows, tokenize_texts,
+                             tokenize_windows, DEFAULT_BATCH_SIZE, DEFAULT_MAX_TOKENS, SORT_WINDOW_BATCHES)
+from bulk_io import (INPUT_FORMATS, csv_header, detect_format, input_size, iter_records, open_input,
+                     read_progress, write_progress)
+from inference_client import connect_service
+from model_bundle import encoder_from_labels, ensure_local_bundle, source_fingerprint
+from model_loader import InferenceConfig, load_classifier
+from student_model import load_cascade
+from worker_pool import InferencePool
+
+# Load model, tokenizer and label encoder from a model bundle
+# (ultra_fast_model.pt is converted into one under model_bundle/ on first run)
+# (EMAIL_AI_PRECISION=int8 for the quantized model,
+#  EMAIL_AI_BACKEND=torchscript|onnx for an exported runtime,
+#  EMAIL_AI_LONG_INPUT=mean|max|confident to read past the first 64 tokens)
+# With EMAIL_AI_SERVICE_URL set and the service up, the model stays in inference_service.py
+service = connect_service()
+if service is not None:
+    model = tokenizer = None
+    label_encoder = encoder_from_labels(service.labels)
+else:
+    model_path = ensure_local_bundle("ultra_fast_model.pt")
+    model, tokenizer, label_encoder = load_classifier(model_path)
+
+_worker_pool = None
+_cascade = None
+_cascade_checked = False
+
+def get_worker_pool():
+    """Forked workers sharing the loaded model (EMAIL_AI_WORKERS > 1), else None"""
+    global _worker_pool
+    if _worker_pool is None and service is None and InferenceConfig.NUM_WORKERS > 1:
+        _worker_pool = InferencePool(
+            lambda: (model, tokenizer, label_encoder),
+            num_workers=InferenceConfig.NUM_WORKERS,
+            threads_per_worker=InferenceConfig.THREADS_PER_WORKER,
+            long_input=InferenceConfig.LONG_INPUT
+        )
+    return _worker_pool
+
+def _teacher_rows(email_texts, batch_size=DEFAULT_BATCH_SIZE,
+                  max_tokens=DEFAULT_MAX_TOKENS, max_length=64):
+    """DistilBERT probability rows, from the service or the worker pool when there is one"""
+    if service is not None:
+        return service.iter_classify(email_texts)
+    pool = get_worker_pool()
+    if pool is not None:
+        return pool.iter_classify(email_texts, chunk_size=batch_size, max_length=max_length, max_tokens=max_tokens)
+    return iter_classify(model, tokenizer, email_texts, batch_size, max_tokens, max_length,
+                         long_input=InferenceConfig.LONG_INPUT)
+
+def get_cascade():
+    """Distilled student in front of DistilBERT (EMAIL_AI_STUDENT), or None"""
+    global _cascade, _cascade_checked
+    if not _cascade_checked:
+        _cascade = load_cascade(
+            InferenceConfig.STUDENT_PATH, label_encoder.classes_,
+            service.fingerprint if service is not None else source_fingerprint(model_path),
+            lambda texts: list(_teacher_rows(texts)), InferenceConfig.STUDENT_THRESHOLD
+        )
+        _cascade_checked = True
+    return _cascade
+
+def _format_prediction(probabilities):
+    """Turn one probability row into (intent, confidence, all_probs)"""
+    probabilities = torch.as_tensor(probabilities)
+    prediction = torch.argmax(probabilities).item()
+    intent = label_encoder.classes_[prediction]
+    confidence = probabilities[prediction].item()
+    
+    # Get all probabilities
+    all_probs = {
+        label: probabilities[i].item() 
+        for i, label in enumerate(label_encoder.classes_)
+    }
+    
+    return intent, confidence, all_probs
+
+def predict_emails(email_texts, batch_size=DEFAULT_BATCH_SIZE,
+                   max_tokens=DEFAULT_MAX_TOKENS, max_length=64):
+    """Predict intents of many emails (list or iterator) in length-sorted batches
+
+    Returns a list of (intent, confidence, all_probs) tuples in input order.
+    """
+    cascade = get_cascade()
+    if cascade is None:
+        rows = _teacher_rows(email_texts, batch_size, max_tokens, max_length)
+        return [_format_prediction(probabilities) for probabilities in rows]
+
+    # The student answers what it is sure of; the rest of each window goes to DistilBERT together
+    teacher_fn = lambda texts: list(_teacher_rows(texts, batch_size, max_tokens, max_length))
+    email_texts = iter(email_texts)
+    predictions = []
+    while True:
+        window = list(itertools.islice(email_texts, batch_size * SORT_WINDOW_BATCHES))
+        if not window:
+            return predictions
+        predictions.extend(_format_prediction(probabilities)
+                           for probabilities in cascade.classify_texts(window, teacher_fn))
+
+def predict_email(email_text):
+    """Predict intent of a single email"""
+    return predict_emails([email_text])[0]
+
+# ============================================
+# BULK CLASSIFICATION
+# ============================================
+BULK_CHUNK_SIZE = 512          # records tokenized, classified and checkpointed together
+BULK_QUEUE_CHUNKS = 2          # prepared chunks waiting for the model; bounds memory
+PROGRESS_EVERY_SECONDS = 10
+
+def _prepare_chunk(texts, max_length):
+    """Producer side of a chunk: student answers, then tokenization of what is left for DistilBERT"""
+    cascade = get_cascade()
+    if cascade is not None:
+        results, pending = cascade.answer(texts)
+    else:
+        results, pending = [None] * len(texts), list(range(len(texts)))
+    pending_texts = [texts[i] for i in pending]
+
+    # The service and the worker pool tokenize on their own
+    if not pending_texts or service is not None or get_worker_pool() is not None:
+        encoded = None
+    elif InferenceConfig.LONG_INPUT:
+        encoded = tokenize_windows(tokenizer, pending_texts, max_length)
+    else:
+        encoded = tokenize_texts(tokenizer, pending_texts, max_length)
+    return results, pending, pending_texts, encoded
+
+def _finish_chunk(prepared, batch_size, max_tokens, max_length):
+    """Consumer side of a chunk: forward passes for the rows the producer left open"""
+    results, pending, pending_texts, encoded = prepared
+    if not pending:
+        return results
+    pool = get_worker_pool()
+    if service is not None:
+        rows = service.iter_classify(pending_texts)
+    elif pool is not None:
+        rows = pool.classify_texts(pending_texts, chunk_size=batch_size, max_length=max_length, max_tokens=max_tokens)
+    elif InferenceConfig.LONG_INPUT:
+        windows, owners = encoded
+        rows = classify_windows(model, windows, owners, tokenizer.pad_token_id, batch_size, max_tokens,
+                                InferenceConfig.LONG_INPUT)
+    else:
+        rows = classify_encoded(model, encoded, tokenizer.pad_token_id, batch_size, max_tokens)
+    for i, row in zip(pending, rows):
+        results[i] = row
+    return results
+
+def _format_duration(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+def classify_file(input_path, output_path, fmt=None, text_column="email_text", id_column=None,
+                  resume=False, chunk_size=BULK_CHUNK_SIZE, batch_size=DEFAULT_BATCH_SIZE,
+                  max_tokens=DEFAULT_MAX_TOKENS, max_length=64):
+    """Stream CSV/JSONL records (input_path '-' is stdin) into JSONL predictions
+
+    A producer thread reads and tokenizes the next chunk while the model runs
+    on the current one. After every chunk the output is synced and its
+    length recorded in <output>.progress, with the input offset reached, so
+    resume=True seeks past the last completed chunk (stdin, which cannot
+    seek, skips its rows instead). Returns the number of records classified.
+    """
+    fmt = fmt or detect_format(input_path)
+    progress = read_progress(output_path) if resume else None
+    if progress and progress["input"] != input_path:
+        raise ValueError(f"{output_path} holds predictions for {progress['input']}, not {input_path}")
+    if progress and not os.path.exists(output_path):
+        print(f"⚠️ {output_path} is missing, starting over")
+        progress = None
+    start_row = progress["rows"] if progress else 0
+    # Progress files written before input offsets were recorded have no input_bytes
+    start_offset = progress.get("input_bytes") if progress and input_path != "-" else None
+
+    # Fork the worker pool and load the student before any thread starts
+    get_worker_pool()
+    get_cascade()
+
+    if start_offset:
+        lines = open_input(input_path, start_offset)
+        fieldnames = csv_header(input_path) if fmt == "csv" else None
+        records = iter_records(lines, fmt, text_column, id_column, fieldnames)
+    else:
+        lines = open_input(input_path)
+        records = iter_records(lines, fmt, text_column, id_column)
+        if start_row:
+            collections.deque(itertools.islice(records, start_row), maxlen=0)
+    if start_row:
+        print(f"⏩ Resuming after row {start_row}")
+    start_bytes = lines.bytes_read
+    total_bytes = input_size(input_path)
+
+    out = open(output_path, "r+b" if progress else "wb")
+    if progress:
+        out.truncate(progress["output_bytes"])
+        out.seek(0, os.SEEK_END)
+
+    chunks = queue.Queue(maxsize=BULK_QUEUE_CHUNKS)
+
+    def produce():
+        try:
+            while True:
+                chunk = list(itertools.islice(records, chunk_size))
+                if not chunk:
+                    break
+                texts = [text for _, text in chunk]
+                chunks.put(([record_id for record_id, _ in chunk], _prepare_chunk(texts, max_length),
+                            lines.bytes_read))
+            chunks.put(None)
+        except Exception as e:
+            chunks.put(e)
+
+    threading.Thread(target=produce, name="bulk-producer", daemon=True).start()
+
+    row = start_row
+    started = last_report = time.perf_counter()
+    try:
+        while True:
+            item = chunks.get()
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise item
+            record_ids, prepared, bytes_read = item
+
+            lines_out = []
+            for record_id, probabilities in zip(record_ids, _finish_chunk(prepared, batch_size, max_tokens, max_length)):
+                intent, confidence, all_probs = _format_prediction(probabilities)
+                record = {"row": row, "intent": intent, "confidence": confidence, "probabilities": all_probs}
+                if id_column:
+                    record["id"] = record_id
+                lines_out.append(json.dumps(record) + "\n")
+                row += 1
+            out.write("".join(lines_out).encode("utf-8"))
+            out.flush()
+            os.fsync(out.fileno())
+            write_progress(output_path, row, out.tell(), input_path, bytes_read)
+
+            now = time.perf_counter()
+            if now - last_report >= PROGRESS_EVERY_SECONDS:
+                last_report = now
+                elapsed = now - started
+                message = f"📈 {row} rows | {(row - start_row) / elapsed:.1f} rows/s"
+                if total_bytes and bytes_read > start_bytes:
+                    eta = (total_bytes - bytes_read) * elapsed / (bytes_read - start_bytes)
+                    message += f" | {bytes_read / total_bytes:.1%} | ETA {_format_duration(eta)}"
+                print(message, flush=True)
+    finally:
+        out.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ {row - start_row} rows in {_format_duration(elapsed)} "
+          f"({(row - start_row) / max(elapsed, 1e-9):.1f} rows/s) -> {output_path}")
+    return row - start_row
+
+# ============================================
+# CLI
+# ============================================
+def interactive():
+    print("="*60)
+    print("EMAIL INTENT CLASSIFIER")
+    print("="*60)
+    
+    while True:
+        print("\n" + "-"*40)
+        email = input("Enter email text (or 'quit' to exit):\n> ")
+        
+        if email.lower() == 'quit':
+            break
+        
+        if not email.strip():
+            continue
+        
+        intent, confidence, all_probs = predict_email(email)
+        
+        print(f"\n📧 PREDICTION: {intent.upper()}")
+        print(f"🎯 Confidence: {confidence:.2%}")
+        print("\n📊 All probabilities:")
+        for label, prob in sorted(all_probs.items(), key=lambda x: x[1], reverse=True):
+            bar = "█" * int(prob * 50)
+            print(f"  {label:12}: {prob:5.2%} {bar}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify emails interactively, or in bulk with --input")
+    parser.add_argument("--input", default=None, help="CSV or JSONL file, or '-' for JSONL on stdin")
+    parser.add_argument("--output", default="predictions.jsonl")
+    parser.add_argument("--format", choices=INPUT_FORMATS, default=None, help="Default: from the file extension")
+    parser.add_argument("--text-column", default="email_text")
+    parser.add_argument("--id-column", default=None, help="Copied into each prediction as 'id'")
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted run into --output")
+    parser.add_argument("--chunk-size", type=int, default=BULK_CHUNK_SIZE)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    if args.input is None:
+        interactive()
+        return
+    classify_file(args.input, args.output, args.format, args.text_column, args.id_column,
+                  args.resume, args.chunk_size, args.batch_size)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+prediction_cache.py - Two-tier (memory LRU + SQLite) cache of intent predictions
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# ============================================
+# DEFAULTS
+# ============================================
+DEFAULT_DB_PATH = "./hf_cache/predictions.sqlite"
+DEFAULT_MAX_MEMORY_ITEMS = 2048
+DEFAULT_MAX_DISK_ITEMS = 200_000
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+PRUNE_EVERY_PUTS = 500
+
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+# ============================================
+# KEY HELPERS
+# ============================================
+def normalize_text(text, lowercase=False):
+    """Normalize a message the way the tokenizer would see it"""
+    text = unicodedata.normalize("NFKC", text)
+    text = " ".join(text.split())
+    return text.lower() if lowercase else text
+
+def model_fingerprint(path):
+    """Content hash of a checkpoint file
+
+    Files from the Hugging Face cache are symlinks to blobs named after their
+    sha256, so the hash is read from the blob name instead of re-reading
+    the whole checkpoint.
+    """
+    blob_name = os.path.basename(os.path.realpath(path))
+    if _SHA256_RE.match(blob_name):
+        return blob_name
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# ============================================
+# CACHE
+# ============================================
+class PredictionCache:
+    """Probability vectors keyed by normalized text, model hash, tokenizer and max_length
+
+    A bounded in-memory LRU sits in front of a SQLite table that is shared by
+    every session and survives restarts. The model hash is part of every
+    key, so processes serving different models or settings can share the
+    database; rows of a retired model are left to TTL and LRU pruning.
+    """
+
+    def __init__(self, model_hash, tokenizer_name, max_length, lowercase=False,
+                 db_path=DEFAULT_DB_PATH, max_memory_items=DEFAULT_MAX_MEMORY_ITEMS,
+                 max_disk_items=DEFAULT_MAX_DISK_ITEMS, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.model_hash = model_hash
+        self.key_prefix = f"{model_hash}|{tokenizer_name}|{max_length}|"
+        self.lowercase = lowercase
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._puts = 0
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "expired": 0}
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS predictions (
+                key TEXT PRIMARY KEY,
+                model_hash TEXT NOT NULL,
+                probs TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON predictions(last_access)")
+        self._prune(time.time())
+        self._db.commit()
+
+    def _key(self, text):
+        normalized = normalize_text(text, self.lowercase)
+        return hashlib.sha256((self.key_prefix + normalized).encode("utf-8")).hexdigest()
+
+    def get(self, text):
+        """Return the cached probability list for text, or None"""
+        key = self._key(text)
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                probs, created = entry
+                if now - created <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    return probs
+                del self._memory[key]
+
+            row = self._db.execute(
+                "SELECT probs, created FROM predictions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+
+            probs, created = json.loads(row[0]), row[1]
+            if now - created > self.ttl_seconds:
+                self._db.execute("DELETE FROM predictions WHERE key = ?", (key,))
+                self._db.commit()
+                self.counters["expired"] += 1
+                self.counters["misses"] += 1
+                return None
+
+            self._db.execute("UPDATE predictions SET last_access = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self._remember(key, probs, created)
+            self.counters["disk_hits"] += 1
+            return probs
+
+    def put(self, text, probs):
+        """Store a probability list for text in both tiers"""
+        key = self._key(text)
+        probs = [float(p) for p in probs]
+        now = time.time()
+
+        with self._lock:
+            self._remember(key, probs, now)
+            self._db.execute(
+                "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?)",
+                (key, self.model_hash, json.dumps(probs), now, now)
+            )
+            self._puts += 1
+            if self._puts % PRUNE_EVERY_PUTS == 0:
+                self._prune(now)
+            self._db.commit()
+
+    def _remember(self, key, probs, created):
+        self._memory[key] = (probs, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _prune(self, now):
+        """Drop expired rows, then the least recently used rows over max_disk_items"""
+        self._db.execute("DELETE FROM predictions WHERE created < ?", (now - self.ttl_seconds,))
+        self._db.execute("""
+            DELETE FROM predictions WHERE key IN (
+                SELECT key FROM predictions ORDER BY last_access DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_disk_items,))
+
+    def stats(self):
+        """Hit/miss counters plus current tier sizes"""
+        with self._lock:
+            disk_items = self._db.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+            lookups = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["misses"]
+            hits = lookups - self.counters["misses"]
+            return {
+                **self.counters,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_items": len(self._memory),
+                "disk_items": disk_items,
+            }
@@ -1,189 +1,311 @@
-"""
-prepare_dataloader_final.py - Prepare and SAVE datasets for training
-"""
-
-# Safe torch import
-import torch
-print(f"PyTorch version: {torch.__version__}")
-print(f"CUDA available: {torch.cuda.is_available()}")
-
-import pandas as pd
-from transformers import RobertaTokenizer
-from sklearn.preprocessing import LabelEncoder
-from torch.utils.data import Dataset, DataLoader
-import pickle
-import logging
-import os
-
-# Set up logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-logger = logging.getLogger(__name__)
-
-# ============================================
-# CONFIGURATION
-# ============================================
-class Config:
-    MODEL_NAME = "roberta-base"
-    MAX_LENGTH = 256
-    BATCH_SIZE = 16
-    RANDOM_SEED = 42
-
-# ============================================
-# DATASET CLASS
-# ============================================
-class EmailDataset(Dataset):
-    def __init__(self, encodings, labels):
-        self.encodings = encodings
-        self.labels = labels
-
-    def __getitem__(self, idx):
-        item = {key: torch.tensor(val[idx]) for key, val in self.encodings.items()}
-        item["labels"] = torch.tensor(self.labels[idx])
-        return item
-
-    def __len__(self):
-        return len(self.labels)
-
-# ============================================
-# MAIN PREPARATION FUNCTION
-# ============================================
-def prepare_and_save_data():
-    """Prepare datasets and save them for training"""
-    
-    logger.info("=" * 60)
-    logger.info("PREPARING DATA FOR TRAINING")
-    logger.info("=" * 60)
-    
-    # Create output directory
-    os.makedirs("dataset_splits", exist_ok=True)
-    
-    # Load splits
-    logger.info("Loading dataset splits...")
-    train_df = pd.read_excel("dataset_splits/train.xlsx")
-    val_df = pd.read_excel("dataset_splits/validation.xlsx")
-    
-    logger.info(f"Training samples: {len(train_df)}")
-    logger.info(f"Validation samples: {len(val_df)}")
-    
-    # Extract texts and labels
-    train_texts = train_df["email_text"].tolist()
-    val_texts = val_df["email_text"].tolist()
-    
-    # Encode labels
-    label_encoder = LabelEncoder()
-    train_labels = label_encoder.fit_transform(train_df["label"])
-    val_labels = label_encoder.transform(val_df["label"])
-    
-    # Save label mapping
-    label_mapping = dict(zip(label_encoder.classes_, range(len(label_encoder.classes_))))
-    logger.info(f"Label Mapping: {label_mapping}")
-    logger.info(f"Number of classes: {len(label_mapping)}")
-    
-    # Save label encoder
-    with open("dataset_splits/label_encoder.pkl", 'wb') as f:
-        pickle.dump(label_encoder, f)
-    logger.info("✓ Label encoder saved")
-    
-    # Load tokenizer
-    logger.info(f"Loading tokenizer: {Config.MODEL_NAME}")
-    tokenizer = RobertaTokenizer.from_pretrained(Config.MODEL_NAME)
-    
-    # Save tokenizer
-    tokenizer.save_pretrained("dataset_splits/tokenizer")
-    logger.info("✓ Tokenizer saved")
-    
-    # Tokenize
-    logger.info("Tokenizing training data...")
-    train_encodings = tokenizer(
-        train_texts,
-        truncation=True,
-        padding=True,
-        max_length=Config.MAX_LENGTH,
-        return_tensors=None
-    )
-    
-    logger.info("Tokenizing validation data...")
-    val_encodings = tokenizer(
-        val_texts,
-        truncation=True,
-        padding=True,
-        max_length=Config.MAX_LENGTH,
-        return_tensors=None
-    )
-    
-    # Create datasets
-    train_dataset = EmailDataset(train_encodings, train_labels)
-    val_dataset = EmailDataset(val_encodings, val_labels)
-    
-    # Save datasets
-    logger.info("Saving datasets...")
-    torch.save(train_dataset, "dataset_splits/train_dataset.pt")
-    torch.save(val_dataset, "dataset_splits/val_dataset.pt")
-    logger.info("✓ Datasets saved as .pt files")
-    
-    # Create data loaders (optional, for verification)
-    train_loader = DataLoader(
-        train_dataset,
-        batch_size=Config.BATCH_SIZE,
-        shuffle=True,
-        num_workers=0
-    )
-    
-    val_loader = DataLoader(
-        val_dataset,
-        batch_size=Config.BATCH_SIZE,
-        shuffle=False,
-        num_workers=0
-    )
-    
-    logger.info(f"Training batches: {len(train_loader)}")
-    logger.info(f"Validation batches: {len(val_loader)}")
-    
-    # Verify saved files
-    logger.info("\n" + "=" * 60)
-    logger.info("VERIFYING SAVED FILES")
-    logger.info("=" * 60)
-    
-    saved_files = os.listdir("dataset_splits")
-    for file in saved_files:
-        file_size = os.path.getsize(f"dataset_splits/{file}") / 1024  # KB
-        logger.info(f"  {file:30} : {file_size:.2f} KB")
-    
-    logger.info("\n" + "=" * 60)
-    logger.info("✅ DATA PREPARATION COMPLETE")
-    logger.info("=" * 60)
-    logger.info("\nFiles saved in 'dataset_splits' folder:")
-    logger.info("  - train.xlsx (original data)")
-    logger.info("  - validation.xlsx (original data)")
-    logger.info("  - train_dataset.pt (ready for training)")
-    logger.info("  - val_dataset.pt (ready for validation)")
-    logger.info("  - label_encoder.pkl")
-    logger.info("  - tokenizer/ (folder with tokenizer files)")
-    
-    return train_dataset, val_dataset, label_encoder
-
-# ============================================
-# RUN PREPARATION
-# ============================================
-if __name__ == "__main__":
-    try:
-        train_dataset, val_dataset, label_encoder = prepare_and_save_data()
-        
-        # Test loading a sample batch
-        logger.info("\n" + "=" * 60)
-        logger.info("TESTING DATA LOADER")
-        logger.info("=" * 60)
-        
-        test_loader = DataLoader(train_dataset, batch_size=2, shuffle=True)
-        sample_batch = next(iter(test_loader))
-        
-        logger.info(f"Sample batch shapes:")
-        logger.info(f"  input_ids: {sample_batch['input_ids'].shape}")
-        logger.info(f"  attention_mask: {sample_batch['attention_mask'].shape}")
-        logger.info(f"  labels: {sample_batch['labels'].shape}")
-        
-        logger.info("\n✅ All good! You can now run train_model.py")
-        
-    except Exception as e:
-        logger.error(f"Preparation failed: {e}")
-        raise
\ No newline at end of file
+"""
+prepare_dataloader_final.py - Prepare and SAVE datasets for training
+Splits are streamed in fixed-size chunks (.csv, .jsonl, .parquet or .xlsx),
+tokenized chunk by chunk on Config.TOKENIZE_WORKERS processes and written out
+shard by shard, so peak memory does not grow with the corpus.
+Run: python prepare_dataloader_final.py [--train dataset_splits/train.csv] [--val ...] [--workers 8]
+"""
+
+# Safe torch import
+import torch
+print(f"PyTorch version: {torch.__version__}")
+print(f"CUDA available: {torch.cuda.is_available()}")
+
+import argparse
+import time
+from collections import deque
+
+import pandas as pd
+from transformers import DistilBertTokenizer
+from sklearn.preprocessing import LabelEncoder
+from torch.utils.data import Dataset, DataLoader
+import pickle
+import logging
+import os
+
+from parallel_tokenize import ParallelTokenizer
+from token_cache import TokenCache, tokenizer_identity
+from token_shards import (LengthBucketBatchSampler, PadCollator, ShardWriter,
+                          TokenShardDataset, padding_report)
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# ============================================
+# CONFIGURATION
+# ============================================
+class Config:
+    MODEL_NAME = "distilbert-base-uncased"     # must match the model train_model.py fine-tunes
+    MAX_LENGTH = 256
+    BATCH_SIZE = 16
+    RANDOM_SEED = 42
+    DATA_DIR = "dataset_splits"
+    TRAIN_FILE = "dataset_splits/train.xlsx"
+    VAL_FILE = "dataset_splits/validation.xlsx"
+    TEXT_COLUMN = "email_text"
+    LABEL_COLUMN = "label"
+    CHUNK_SIZE = 10000     # rows read, tokenized and written at a time
+    TOKENIZE_WORKERS = os.cpu_count() or 1
+    INCREMENTAL = True     # reuse token ids of unchanged emails from the token cache
+
+# ============================================
+# DATASET CLASS
+# ============================================
+class EmailDataset(Dataset):
+    """Legacy pickled dataset (train_dataset.pt); kept so old files still load"""
+
+    def __init__(self, encodings, labels):
+        self.encodings = encodings
+        self.labels = labels
+
+    def __getitem__(self, idx):
+        item = {key: torch.tensor(val[idx]) for key, val in self.encodings.items()}
+        item["labels"] = torch.tensor(self.labels[idx])
+        return item
+
+    def __len__(self):
+        return len(self.labels)
+
+# ============================================
+# STREAMING READERS
+# ============================================
+def iter_table_chunks(path, columns, chunk_size=Config.CHUNK_SIZE):
+    """Yield DataFrames of at most chunk_size rows holding only `columns`"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_size)
+    elif ext in (".jsonl", ".json"):
+        with pd.read_json(path, lines=True, chunksize=chunk_size) as reader:
+            for chunk in reader:
+                yield chunk[columns]
+    elif ext == ".parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+    elif ext in (".xlsx", ".xlsm"):
+        yield from _iter_excel_chunks(path, columns, chunk_size)
+    else:
+        raise ValueError(f"Unsupported input format '{ext}' for {path} (use .csv, .jsonl, .parquet or .xlsx)")
+
+def _iter_excel_chunks(path, columns, chunk_size):
+    """Read the first sheet row by row (openpyxl read-only mode never loads the whole sheet)"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = list(next(rows, ()))
+        missing = [column for column in columns if column not in header]
+        if missing:
+            raise ValueError(f"{path} has no column(s) {missing}")
+        indices = [header.index(column) for column in columns]
+
+        buffer = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            buffer.append([row[i] for i in indices])
+            if len(buffer) == chunk_size:
+                yield pd.DataFrame(buffer, columns=columns)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=columns)
+    finally:
+        workbook.close()
+
+def fit_label_encoder(path, chunk_size=Config.CHUNK_SIZE):
+    """Fit the label encoder from the label column alone, one chunk at a time"""
+    labels = set()
+    for chunk in iter_table_chunks(path, [Config.LABEL_COLUMN], chunk_size):
+        labels.update(chunk[Config.LABEL_COLUMN].dropna().tolist())
+    label_encoder = LabelEncoder()
+    label_encoder.fit(sorted(labels))
+    return label_encoder
+
+# ============================================
+# TOKENIZE
+# ============================================
+def tokenize_split(path, split_dir, tokenizer_pool, pad_token_id, label_encoder, chunk_size=Config.CHUNK_SIZE,
+                   token_cache=None):
+    """Stream one split from `path`, tokenize it chunk by chunk and write it to split_dir
+
+    With a token_cache only rows whose text is not cached yet are tokenized.
+    """
+    writer = ShardWriter(split_dir, Config.MAX_LENGTH, pad_token_id)
+    columns = [Config.TEXT_COLUMN, Config.LABEL_COLUMN]
+    pending = deque()
+    start = time.perf_counter()
+
+    def write_oldest():
+        labels, result = pending.popleft()
+        input_ids, attention_mask = result.result()
+        writer.write(input_ids, attention_mask, labels)
+        rate = writer.num_rows / (time.perf_counter() - start)
+        logger.info(f"  {writer.num_rows} rows written ({rate:.0f} rows/s)")
+
+    for chunk in iter_table_chunks(path, columns, chunk_size):
+        chunk = chunk.dropna(subset=[Config.LABEL_COLUMN])
+        texts = chunk[Config.TEXT_COLUMN].fillna("").astype(str).tolist()
+        labels = label_encoder.transform(chunk[Config.LABEL_COLUMN])
+
+        # The workers tokenize this chunk while the next one is read; shards
+        # are still written in input order
+        if token_cache is None:
+            pending.append((labels, tokenizer_pool.submit(texts)))
+        else:
+            pending.append((labels, token_cache.submit(texts, tokenizer_pool)))
+        if len(pending) > 1:
+            write_oldest()
+    while pending:
+        write_oldest()
+    writer.close()
+    return writer.num_rows
+
+# ============================================
+# MAIN PREPARATION FUNCTION
+# ============================================
+def prepare_and_save_data(train_path=None, val_path=None, chunk_size=Config.CHUNK_SIZE,
+                          workers=Config.TOKENIZE_WORKERS, incremental=Config.INCREMENTAL):
+    """Prepare datasets and save them for training
+
+    Returns (train_dir, val_dir, label_encoder); load a split with TokenShardDataset.
+    """
+    train_path = train_path or Config.TRAIN_FILE
+    val_path = val_path or Config.VAL_FILE
+
+    logger.info("=" * 60)
+    logger.info("PREPARING DATA FOR TRAINING")
+    logger.info("=" * 60)
+
+    # Create output directory
+    os.makedirs(Config.DATA_DIR, exist_ok=True)
+
+    # Encode labels from the training split only, so train and validation share one mapping
+    logger.info(f"Collecting labels from {train_path}...")
+    label_encoder = fit_label_encoder(train_path, chunk_size)
+
+    # Save label mapping
+    label_mapping = dict(zip(label_encoder.classes_, range(len(label_encoder.classes_))))
+    logger.info(f"Label Mapping: {label_mapping}")
+    logger.info(f"Number of classes: {len(label_mapping)}")
+
+    # Save label encoder
+    with open(os.path.join(Config.DATA_DIR, "label_encoder.pkl"), 'wb') as f:
+        pickle.dump(label_encoder, f)
+    logger.info("✓ Label encoder saved")
+
+    # Load tokenizer
+    logger.info(f"Loading tokenizer: {Config.MODEL_NAME}")
+    tokenizer = DistilBertTokenizer.from_pretrained(Config.MODEL_NAME)
+
+    # Save tokenizer
+    tokenizer_dir = os.path.join(Config.DATA_DIR, "tokenizer")
+    tokenizer.save_pretrained(tokenizer_dir)
+    logger.info("✓ Tokenizer saved")
+
+    # Token ids are keyed by text + tokenizer files + options, so any change there retokenizes
+    tokenize_options = {"truncation": True, "padding": False, "max_length": Config.MAX_LENGTH}
+    token_cache = None
+    if incremental:
+        identity = tokenizer_identity(tokenizer_dir, type(tokenizer).__name__, tokenize_options)
+        token_cache = TokenCache(identity, os.path.join(Config.DATA_DIR, "token_cache.sqlite"))
+
+    # Tokenize and write each split in chunks of chunk_size rows
+    train_dir = os.path.join(Config.DATA_DIR, "train_tokens")
+    val_dir = os.path.join(Config.DATA_DIR, "val_tokens")
+
+    # Stored unpadded; PadCollator pads each batch to its own longest row
+    with ParallelTokenizer(tokenizer, workers, **tokenize_options) as tokenizer_pool:
+        logger.info(f"Tokenizing training data from {train_path} ({workers} worker(s))...")
+        train_rows = tokenize_split(train_path, train_dir, tokenizer_pool, tokenizer.pad_token_id,
+                                    label_encoder, chunk_size, token_cache)
+
+        logger.info(f"Tokenizing validation data from {val_path}...")
+        val_rows = tokenize_split(val_path, val_dir, tokenizer_pool, tokenizer.pad_token_id,
+                                  label_encoder, chunk_size, token_cache)
+        tokenizer_pool.log_worker_rates()
+
+    if token_cache is not None:
+        pruned = token_cache.prune()
+        token_cache.close()
+        logger.info(f"Token cache: {token_cache.counters['reused']} rows reused, "
+                    f"{token_cache.counters['recomputed']} tokenized, {pruned} stale entries dropped")
+
+    logger.info(f"Training samples: {train_rows}")
+    logger.info(f"Validation samples: {val_rows}")
+    logger.info(f"Training batches: {-(-train_rows // Config.BATCH_SIZE)}")
+    logger.info(f"Validation batches: {-(-val_rows // Config.BATCH_SIZE)}")
+
+    # Padding tokens the model would process, before (whole split padded) and after
+    train_lengths = TokenShardDataset(train_dir).lengths()
+    logger.info(f"Mean training length: {train_lengths.mean():.1f} tokens (max {train_lengths.max()})")
+    for name, waste in padding_report(train_lengths, Config.BATCH_SIZE).items():
+        logger.info(f"  padding waste, {name:28}: {waste:.1%}")
+
+    # Verify saved files
+    logger.info("\n" + "=" * 60)
+    logger.info("VERIFYING SAVED FILES")
+    logger.info("=" * 60)
+
+    for name in sorted(os.listdir(Config.DATA_DIR)):
+        path = os.path.join(Config.DATA_DIR, name)
+        if os.path.isdir(path):
+            size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) / 1024
+        else:
+            size = os.path.getsize(path) / 1024  # KB
+        logger.info(f"  {name:30} : {size:.2f} KB")
+
+    logger.info("\n" + "=" * 60)
+    logger.info("✅ DATA PREPARATION COMPLETE")
+    logger.info("=" * 60)
+    logger.info(f"\nFiles saved in '{Config.DATA_DIR}' folder:")
+    logger.info("  - train_tokens/ (memory-mapped shards, load with TokenShardDataset)")
+    logger.info("  - val_tokens/ (ready for validation)")
+    logger.info("  - label_encoder.pkl")
+    logger.info("  - tokenizer/ (folder with tokenizer files)")
+    if incremental:
+        logger.info("  - token_cache.sqlite (token ids reused by the next run)")
+
+    return train_dir, val_dir, label_encoder
+
+# ============================================
+# RUN PREPARATION
+# ============================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tokenize the train/validation splits for training")
+    parser.add_argument("--train", default=Config.TRAIN_FILE, help=".csv, .jsonl, .parquet or .xlsx")
+    parser.add_argument("--val", default=Config.VAL_FILE)
+    parser.add_argument("--chunk-size", type=int, default=Config.CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=Config.TOKENIZE_WORKERS, help="Tokenizer processes")
+    parser.add_argument("--full", action="store_true", help="Ignore the token cache and tokenize every row")
+    args = parser.parse_args()
+
+    try:
+        train_dir, val_dir, label_encoder = prepare_and_save_data(args.train, args.val, args.chunk_size,
+                                                                  args.workers, not args.full)
+
+        # Test loading a sample batch
+        logger.info("\n" + "=" * 60)
+        logger.info("TESTING DATA LOADER")
+        logger.info("=" * 60)
+
+        train_dataset = TokenShardDataset(train_dir)
+        test_loader = DataLoader(
+            train_dataset,
+            batch_sampler=LengthBucketBatchSampler(train_dataset.lengths(), batch_size=2),
+            collate_fn=PadCollator(train_dataset.pad_token_id)
+        )
+        sample_batch = next(iter(test_loader))
+
+        logger.info(f"Sample batch shapes:")
+        logger.info(f"  input_ids: {sample_batch['input_ids'].shape}")
+        logger.info(f"  attention_mask: {sample_batch['attention_mask'].shape}")
+        logger.info(f"  labels: {sample_batch['labels'].shape}")
+
+        logger.info("\n✅ All good! You can now run train_model.py")
+
+    except Exception as e:
+        logger.error(f"Preparation failed: {e}")
+        raise
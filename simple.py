@@ -1,901 +1,1221 @@
-"""
-email_simple.py - Stunning Modern UI Version (Same Logic)
-Run: streamlit run email_simple.py
-"""
-
-import streamlit as st
-import torch
-from transformers import DistilBertForSequenceClassification, DistilBertTokenizer
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from datetime import datetime
-import base64
-
-# ============================================
-# PAGE CONFIG - MUST BE FIRST
-# ============================================
-st.set_page_config(
-    page_title="Email AI Studio", 
-    page_icon="✨", 
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
-
-# ============================================
-# ADVANCED UI STYLING
-# ============================================
-st.markdown("""
-<style>
-    /* Global Styles */
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700;800&display=swap');
-    
-    * {
-        font-family: 'Inter', sans-serif;
-    }
-    
-    /* Main container */
-    .main {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-    }
-    
-    /* Glass morphism cards */
-    .glass-card {
-        background: rgba(255, 255, 255, 0.95);
-        backdrop-filter: blur(10px);
-        border-radius: 20px;
-        padding: 2rem;
-        box-shadow: 0 20px 60px rgba(0,0,0,0.3);
-        border: 1px solid rgba(255,255,255,0.2);
-        margin: 1rem 0;
-        transition: transform 0.3s ease;
-    }
-    
-    .glass-card:hover {
-        transform: translateY(-5px);
-    }
-    
-    /* Gradient text */
-    .gradient-text {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        font-weight: 800;
-    }
-    
-    /* Sidebar styling */
-    .css-1d391kg {
-        background: linear-gradient(180deg, #1a1a2e 0%, #16213e 100%);
-    }
-    
-    /* User avatar */
-    .user-avatar {
-        width: 80px;
-        height: 80px;
-        border-radius: 50%;
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        margin: 0 auto 1rem;
-        border: 3px solid white;
-        box-shadow: 0 10px 30px rgba(0,0,0,0.2);
-    }
-    
-    .user-avatar span {
-        color: white;
-        font-size: 2rem;
-        font-weight: 600;
-    }
-    
-    /* Progress steps */
-    .step-container {
-        display: flex;
-        justify-content: space-between;
-        margin: 2rem 0;
-        position: relative;
-    }
-    
-    .step-container::before {
-        content: '';
-        position: absolute;
-        top: 50%;
-        left: 0;
-        right: 0;
-        height: 2px;
-        background: rgba(255,255,255,0.1);
-        transform: translateY(-50%);
-        z-index: 1;
-    }
-    
-    .step-item {
-        background: rgba(255,255,255,0.95);
-        padding: 0.8rem 1.5rem;
-        border-radius: 50px;
-        font-weight: 600;
-        position: relative;
-        z-index: 2;
-        box-shadow: 0 5px 15px rgba(0,0,0,0.1);
-        border: 2px solid transparent;
-        transition: all 0.3s ease;
-    }
-    
-    .step-item.active {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        color: white;
-        border-color: white;
-        transform: scale(1.05);
-    }
-    
-    .step-item.completed {
-        background: #10b981;
-        color: white;
-    }
-    
-    /* Intent cards */
-    .intent-card {
-        background: white;
-        border-radius: 15px;
-        padding: 2rem;
-        text-align: center;
-        box-shadow: 0 10px 40px rgba(0,0,0,0.1);
-        border-left: 5px solid;
-        transition: all 0.3s ease;
-    }
-    
-    .intent-card:hover {
-        transform: translateY(-5px);
-        box-shadow: 0 15px 50px rgba(0,0,0,0.2);
-    }
-    
-    /* Progress bars */
-    .prob-bar-container {
-        background: #f0f0f0;
-        border-radius: 10px;
-        height: 30px;
-        margin: 10px 0;
-        overflow: hidden;
-        box-shadow: inset 0 2px 5px rgba(0,0,0,0.1);
-    }
-    
-    .prob-bar {
-        height: 100%;
-        display: flex;
-        align-items: center;
-        justify-content: flex-end;
-        padding-right: 15px;
-        color: white;
-        font-weight: 600;
-        font-size: 0.9rem;
-        transition: width 1s ease;
-        background: linear-gradient(90deg, #667eea, #764ba2);
-    }
-    
-    /* Email preview */
-    .email-preview {
-        background: #1e1e2e;
-        color: #fff;
-        padding: 2rem;
-        border-radius: 15px;
-        font-family: 'Courier New', monospace;
-        border: 1px solid rgba(255,255,255,0.1);
-        box-shadow: 0 20px 60px rgba(0,0,0,0.3);
-        white-space: pre-wrap;
-        line-height: 1.6;
-    }
-    
-    /* Buttons */
-    .stButton > button {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        color: white;
-        border: none;
-        padding: 0.8rem 2rem;
-        border-radius: 50px;
-        font-weight: 600;
-        font-size: 1rem;
-        transition: all 0.3s ease;
-        text-transform: uppercase;
-        letter-spacing: 1px;
-        box-shadow: 0 10px 20px rgba(102, 126, 234, 0.3);
-        width: 100%;
-    }
-    
-    .stButton > button:hover {
-        transform: translateY(-3px);
-        box-shadow: 0 15px 30px rgba(102, 126, 234, 0.4);
-    }
-    
-    /* Input fields */
-    .stTextInput > div > div > input {
-        border-radius: 50px;
-        border: 2px solid #e0e0e0;
-        padding: 0.8rem 1.5rem;
-        font-size: 1rem;
-        transition: all 0.3s ease;
-    }
-    
-    .stTextInput > div > div > input:focus {
-        border-color: #667eea;
-        box-shadow: 0 0 0 3px rgba(102, 126, 234, 0.1);
-    }
-    
-    /* Text area */
-    .stTextArea > div > div > textarea {
-        border-radius: 20px;
-        border: 2px solid #e0e0e0;
-        padding: 1rem;
-        font-size: 1rem;
-        transition: all 0.3s ease;
-    }
-    
-    .stTextArea > div > div > textarea:focus {
-        border-color: #667eea;
-        box-shadow: 0 0 0 3px rgba(102, 126, 234, 0.1);
-    }
-    
-    /* Success/Error messages */
-    .stAlert {
-        border-radius: 10px;
-        border-left: 5px solid;
-        animation: slideIn 0.5s ease;
-    }
-    
-    @keyframes slideIn {
-        from {
-            transform: translateX(-100%);
-            opacity: 0;
-        }
-        to {
-            transform: translateX(0);
-            opacity: 1;
-        }
-    }
-    
-    /* Stats cards */
-    .stat-card {
-        background: white;
-        border-radius: 15px;
-        padding: 1.5rem;
-        text-align: center;
-        box-shadow: 0 10px 30px rgba(0,0,0,0.1);
-        transition: all 0.3s ease;
-    }
-    
-    .stat-card:hover {
-        transform: translateY(-5px);
-        box-shadow: 0 15px 40px rgba(0,0,0,0.15);
-    }
-    
-    .stat-number {
-        font-size: 2.5rem;
-        font-weight: 800;
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-    }
-    
-    /* Divider */
-    .custom-divider {
-        height: 3px;
-        background: linear-gradient(90deg, transparent, #667eea, #764ba2, transparent);
-        margin: 2rem 0;
-    }
-    
-    /* Footer */
-    .footer {
-        text-align: center;
-        padding: 2rem;
-        color: rgba(255,255,255,0.6);
-        font-size: 0.9rem;
-    }
-</style>
-""", unsafe_allow_html=True)
-
-# ============================================
-# SESSION STATE - SAME LOGIC
-# ============================================
-if 'logged_in' not in st.session_state:
-    st.session_state.logged_in = False
-if 'step' not in st.session_state:
-    st.session_state.step = 1
-if 'intent' not in st.session_state:
-    st.session_state.intent = None
-if 'message' not in st.session_state:
-    st.session_state.message = ""
-if 'company' not in st.session_state:
-    st.session_state.company = ""
-if 'rec_name' not in st.session_state:
-    st.session_state.rec_name = ""
-if 'rec_email' not in st.session_state:
-    st.session_state.rec_email = ""
-if 'rec_company' not in st.session_state:
-    st.session_state.rec_company = ""
-if 'rec_subject' not in st.session_state:
-    st.session_state.rec_subject = ""
-if 'email_body' not in st.session_state:
-    st.session_state.email_body = ""
-
-# ============================================
-# LOAD MODEL - SAME LOGIC
-# ============================================
-from huggingface_hub import hf_hub_download
-import os
-
-@st.cache_resource
-def load_model():
-    """Load model from Hugging Face"""
-    try:
-        # Download model from Hugging Face (cached locally)
-        model_path = hf_hub_download(
-            repo_id="vatsal124/email-classifier",
-            filename="ultra_fast_model.pt",
-            cache_dir="./hf_cache"  # Optional: local cache folder
-        )
-        
-        # Load the model checkpoint
-        checkpoint = torch.load(model_path, weights_only=False, map_location='cpu')
-        
-        # Get label encoder
-        encoder = checkpoint['label_encoder']
-        
-        # Initialize model
-        model = DistilBertForSequenceClassification.from_pretrained(
-            "distilbert-base-uncased", 
-            num_labels=len(encoder.classes_)
-        )
-        model.load_state_dict(checkpoint['model_state_dict'])
-        model.eval()
-        
-        # Load tokenizer
-        tokenizer = DistilBertTokenizer.from_pretrained("distilbert-base-uncased")
-        
-        return model, tokenizer, encoder
-        
-    except Exception as e:
-        st.error(f"⚠️ Failed to load model: {str(e)}")
-        st.info("""
-        The model is downloaded from Hugging Face automatically.
-        Make sure you have internet connection.
-        """)
-        return None, None, None
-
-# ============================================
-# LOGIN PAGE - STUNNING UI
-# ============================================
-def login():
-    col1, col2, col3 = st.columns([1, 2, 1])
-    
-    with col2:
-        st.markdown("""
-        <div style="text-align: center; margin-bottom: 2rem;">
-            <h1 style="font-size: 3rem; margin-bottom: 0;">✨</h1>
-            <h1 class="gradient-text" style="font-size: 3rem; margin-bottom: 0;">Email AI Studio</h1>
-            <p style="color: #666; font-size: 1.2rem;">Intelligent Email Automation</p>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        with st.container():
-            st.markdown('<div class="glass-card">', unsafe_allow_html=True)
-            
-            with st.form("login_form"):
-                st.markdown("### 🔐 Welcome Back")
-                email = st.text_input("Email Address", placeholder="your@email.com")
-                password = st.text_input("Password", type="password", placeholder="••••••••")
-                
-                col_a, col_b = st.columns(2)
-                with col_a:
-                    login_btn = st.form_submit_button("Login", type="primary", use_container_width=True)
-                with col_b:
-                    demo_btn = st.form_submit_button("Demo", use_container_width=True)
-            
-            if login_btn and email:
-                st.session_state.logged_in = True
-                st.session_state.user_email = email
-                st.rerun()
-            
-            if demo_btn:
-                st.session_state.logged_in = True
-                st.session_state.user_email = "demo@email.ai"
-                st.rerun()
-            
-            st.markdown('</div>', unsafe_allow_html=True)
-
-# ============================================
-# SIDEBAR - STUNNING UI
-# ============================================
-def sidebar():
-    with st.sidebar:
-        # User avatar
-        initial = st.session_state.user_email[0].upper() if st.session_state.user_email else "U"
-        st.markdown(f"""
-        <div class="user-avatar">
-            <span>{initial}</span>
-        </div>
-        <h3 style="text-align: center; color: white; margin-bottom: 0;">{st.session_state.user_email.split('@')[0]}</h3>
-        <p style="text-align: center; color: rgba(255,255,255,0.6); font-size: 0.9rem;">{st.session_state.user_email}</p>
-        """, unsafe_allow_html=True)
-        
-        st.markdown("<hr style='border-color: rgba(255,255,255,0.1);'>", unsafe_allow_html=True)
-        
-        # Navigation
-        if st.button("✨ Dashboard", use_container_width=True):
-            st.session_state.page = "dashboard"
-            st.rerun()
-        if st.button("📝 Compose", use_container_width=True):
-            st.session_state.step = 1
-            st.session_state.page = "compose"
-            st.rerun()
-        if st.button("📊 History", use_container_width=True):
-            st.session_state.page = "history"
-            st.rerun()
-        
-        st.markdown("<hr style='border-color: rgba(255,255,255,0.1);'>", unsafe_allow_html=True)
-        
-        if st.button("🚪 Logout", use_container_width=True):
-            st.session_state.logged_in = False
-            st.rerun()
-
-# ============================================
-# STEP 1: WRITE - STUNNING UI
-# ============================================
-def step_write():
-    st.markdown("""
-    <div style="text-align: center; margin-bottom: 2rem;">
-        <h1 class="gradient-text" style="font-size: 2.5rem;">✍️ Compose Your Message</h1>
-        <p style="color: #666;">Write naturally - our AI will understand your intent</p>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    with st.container():
-        st.markdown('<div class="glass-card">', unsafe_allow_html=True)
-        
-        with st.form("write_form"):
-            col1, col2 = st.columns(2)
-            with col1:
-                name = st.text_input("Your Name", value=st.session_state.get('user_name', ''), 
-                                    placeholder="John Doe")
-            with col2:
-                company = st.text_input("Your Company", placeholder="ABC Corp",
-                                       value=st.session_state.get('company', ''))
-            
-            message = st.text_area(
-                "Your Message",
-                height=150,
-                placeholder="e.g., We see strong potential for collaboration between our companies. Let's explore partnership opportunities in the Mumbai region.",
-                value=st.session_state.get('message', '')
-            )
-            
-            st.markdown('<div class="custom-divider"></div>', unsafe_allow_html=True)
-            
-            if st.form_submit_button("🔍 Analyze Intent", type="primary", use_container_width=True):
-                if message:
-                    st.session_state.user_name = name
-                    st.session_state.company = company
-                    st.session_state.message = message
-                    st.session_state.step = 2
-                    st.rerun()
-        
-        st.markdown('</div>', unsafe_allow_html=True)
-
-# ============================================
-# STEP 2: ANALYZE - STUNNING UI
-# ============================================
-def step_analyze():
-    model, tokenizer, encoder = load_model()
-    
-    if model and st.session_state.message:
-        inputs = tokenizer(st.session_state.message, truncation=True, padding=True, 
-                          max_length=64, return_tensors='pt')
-        
-        with torch.no_grad():
-            outputs = model(**inputs)
-            probs = torch.softmax(outputs.logits, dim=1)[0]
-            pred = torch.argmax(outputs.logits, dim=1).item()
-        
-        intent = encoder.classes_[pred]
-        confidence = probs[pred].item()
-        st.session_state.intent = intent
-        
-        # Color mapping
-        colors = {
-            'inquiry': '#2196F3',
-            'complaint': '#F44336', 
-            'sales': '#4CAF50',
-            'negotiation': '#FF9800',
-            'partnership': '#9C27B0'
-        }
-        color = colors.get(intent, '#667eea')
-        
-        # Show intent card
-        st.markdown(f"""
-        <div style="text-align: center; margin-bottom: 2rem;">
-            <h1 class="gradient-text" style="font-size: 2rem;">🎯 Intent Analysis</h1>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        col1, col2, col3 = st.columns([1, 2, 1])
-        with col2:
-            st.markdown(f"""
-            <div class="intent-card" style="border-left-color: {color};">
-                <h2 style="color: {color}; font-size: 2rem; margin-bottom: 0.5rem;">{intent.upper()}</h2>
-                <div style="font-size: 1.5rem; font-weight: 600; margin: 1rem 0;">
-                    <span style="color: {color};">{confidence:.1%}</span>
-                </div>
-                <div style="background: {color}20; padding: 1rem; border-radius: 10px;">
-                    <p style="color: #666; font-style: italic;">"{st.session_state.message[:100]}..."</p>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        st.markdown('<div class="custom-divider"></div>', unsafe_allow_html=True)
-        
-        # Probability distribution
-        st.markdown("### 📊 Probability Distribution")
-        probs_dict = {encoder.classes_[i]: probs[i].item() for i in range(len(encoder.classes_))}
-        
-        for label, prob in sorted(probs_dict.items(), key=lambda x: x[1], reverse=True):
-            col1, col2 = st.columns([1, 3])
-            with col1:
-                st.markdown(f"**{label.title()}**")
-            with col2:
-                bar_color = colors.get(label, '#667eea')
-                st.markdown(f"""
-                <div class="prob-bar-container">
-                    <div class="prob-bar" style="width: {prob*100}%; background: {bar_color};">
-                        {prob:.1%}
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
-        
-        st.markdown('<div class="custom-divider"></div>', unsafe_allow_html=True)
-        
-        # Action buttons
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            if st.button("✅ Correct", type="primary", use_container_width=True):
-                st.session_state.step = 3
-                st.rerun()
-        with col2:
-            if st.button("🔄 Try Again", use_container_width=True):
-                st.session_state.step = 1
-                st.rerun()
-        with col3:
-            if st.button("✏️ Edit", use_container_width=True):
-                st.session_state.step = 1
-                st.rerun()
-
-# ============================================
-# STEP 3: RECIPIENT - STUNNING UI
-# ============================================
-def step_recipient():
-    st.markdown("""
-    <div style="text-align: center; margin-bottom: 2rem;">
-        <h1 class="gradient-text" style="font-size: 2rem;">👤 Recipient Details</h1>
-        <p style="color: #666;">Who should receive this email?</p>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    with st.container():
-        st.markdown('<div class="glass-card">', unsafe_allow_html=True)
-        
-        with st.form("recipient_form"):
-            col1, col2 = st.columns(2)
-            with col1:
-                name = st.text_input("Recipient Name", placeholder="John Smith")
-            with col2:
-                company = st.text_input("Company Name", placeholder="ABC Corp")
-            
-            email = st.text_input("Email Address", placeholder="john@abccorp.com")
-            subject = st.text_input(
-                "Subject",
-                value=f"Regarding: {st.session_state.intent.title() if st.session_state.intent else 'Inquiry'}"
-            )
-            
-            st.markdown('<div class="custom-divider"></div>', unsafe_allow_html=True)
-            
-            if st.form_submit_button("✍️ Generate Email", type="primary", use_container_width=True):
-                if name and email:
-                    st.session_state.rec_name = name
-                    st.session_state.rec_company = company
-                    st.session_state.rec_email = email
-                    st.session_state.rec_subject = subject
-                    st.session_state.step = 4
-                    st.rerun()
-        
-        st.markdown('</div>', unsafe_allow_html=True)
-
-# ============================================
-# STEP 4: REVIEW & SEND - STUNNING UI
-# ============================================
-def step_review():
-    # Email templates (SAME LOGIC)
-    templates = {
-        "inquiry": f"""Dear {st.session_state.rec_name},
-
-I hope this email finds you well.
-
-{st.session_state.message}
-
-Could you please share your catalog and pricing information at your earliest convenience?
-
-Thank you for your time and consideration.
-
-Best regards,
-{st.session_state.user_name}
-{st.session_state.company}
-{st.session_state.user_email}""",
-        
-        "complaint": f"""Dear {st.session_state.rec_name},
-
-I am writing to bring an important matter to your attention.
-
-{st.session_state.message}
-
-Please look into this matter urgently and let me know how you plan to resolve this issue.
-
-I look forward to your prompt response.
-
-Regards,
-{st.session_state.user_name}
-{st.session_state.company}
-{st.session_state.user_email}""",
-        
-        "sales": f"""Dear {st.session_state.rec_name},
-
-I hope you're doing well.
-
-{st.session_state.message}
-
-Would you be available for a quick 15-minute call next week to discuss how we might work together? Please let me know what time works best for you.
-
-Looking forward to connecting!
-
-Best regards,
-{st.session_state.user_name}
-{st.session_state.company}
-{st.session_state.user_email}""",
-        
-        "negotiation": f"""Dear {st.session_state.rec_name},
-
-Thank you for your proposal.
-
-{st.session_state.message}
-
-We're very interested in moving forward, but would appreciate if you could reconsider the pricing. Could we schedule a brief call to discuss this further?
-
-Thank you for your understanding.
-
-Regards,
-{st.session_state.user_name}
-{st.session_state.company}
-{st.session_state.user_email}""",
-        
-        "partnership": f"""Dear {st.session_state.rec_name},
-
-I've been following {st.session_state.rec_company}'s impressive work in the industry.
-
-{st.session_state.message}
-
-I see great potential for collaboration between our companies. Would you be open to an exploratory conversation to discuss possible synergies?
-
-I look forward to hearing from you.
-
-Best regards,
-{st.session_state.user_name}
-{st.session_state.company}
-{st.session_state.user_email}"""
-    }
-    
-    email_body = templates.get(st.session_state.intent, templates['inquiry'])
-    
-    st.markdown("""
-    <div style="text-align: center; margin-bottom: 2rem;">
-        <h1 class="gradient-text" style="font-size: 2rem;">📨 Review & Send</h1>
-        <p style="color: #666;">Your AI-generated email is ready</p>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    # Email preview
-    st.markdown("### 📧 Generated Email")
-    st.markdown(f'<div class="email-preview">{email_body.replace(chr(10), "<br>")}</div>', 
-                unsafe_allow_html=True)
-    
-    # Edit option
-    edited_email = st.text_area("✏️ Edit if needed:", value=email_body, height=200)
-    
-    st.markdown('<div class="custom-divider"></div>', unsafe_allow_html=True)
-    
-    # Send section
-    st.markdown("### 📤 Send Email")
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        password = st.text_input(
-            "🔑 App Password",
-            type="password",
-            help="Enter your 16-character Gmail App Password",
-            placeholder="••••••••••••••••"
-        )
-        
-        if st.button("📤 Send Now", type="primary", use_container_width=True):
-            if password:
-                try:
-                    msg = MIMEMultipart()
-                    msg['From'] = st.session_state.user_email
-                    msg['To'] = st.session_state.rec_email
-                    msg['Subject'] = st.session_state.rec_subject
-                    msg.attach(MIMEText(edited_email, 'plain'))
-                    
-                    server = smtplib.SMTP("smtp.gmail.com", 587)
-                    server.starttls()
-                    server.login(st.session_state.user_email, password)
-                    server.send_message(msg)
-                    server.quit()
-                    
-                    st.success("✅ Email sent successfully! 🎉")
-                    st.balloons()
-                    
-                    if st.button("📝 Compose New", key="new_after_send"):
-                        st.session_state.step = 1
-                        st.rerun()
-                except Exception as e:
-                    st.error(f"❌ Failed: {str(e)}")
-            else:
-                st.error("❌ Please enter your app password")
-    
-    with col2:
-        if st.button("💾 Save Draft", use_container_width=True):
-            st.success("✅ Draft saved!")
-        if st.button("🔄 Edit Recipient", use_container_width=True):
-            st.session_state.step = 3
-            st.rerun()
-    
-    if st.button("📝 Start Fresh", use_container_width=True):
-        st.session_state.step = 1
-        st.rerun()
-
-# ============================================
-# DASHBOARD - STUNNING UI
-# ============================================
-def dashboard():
-    st.markdown("""
-    <div style="text-align: center; margin-bottom: 3rem;">
-        <h1 class="gradient-text" style="font-size: 3rem;">✨ Dashboard</h1>
-        <p style="color: #666; font-size: 1.2rem;">Your email activity at a glance</p>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        st.markdown("""
-        <div class="stat-card">
-            <div class="stat-number">12</div>
-            <p style="color: #666;">Emails Sent</p>
-            <p style="color: #10b981; font-size: 0.9rem;">↑ +3 this week</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col2:
-        st.markdown("""
-        <div class="stat-card">
-            <div class="stat-number">8</div>
-            <p style="color: #666;">Responses</p>
-            <p style="color: #10b981; font-size: 0.9rem;">67% response rate</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col3:
-        st.markdown("""
-        <div class="stat-card">
-            <div class="stat-number">5</div>
-            <p style="color: #666;">Meetings</p>
-            <p style="color: #f59e0b; font-size: 0.9rem;">2 scheduled</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col4:
-        st.markdown("""
-        <div class="stat-card">
-            <div class="stat-number">3</div>
-            <p style="color: #666;">Partnerships</p>
-            <p style="color: #10b981; font-size: 0.9rem;">+1 this month</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    st.markdown('<div class="custom-divider"></div>', unsafe_allow_html=True)
-    
-    # Recent activity
-    st.markdown("### 📋 Recent Activity")
-    
-    activities = [
-        {"time": "2 hours ago", "action": "Partnership proposal to TechCorp", "status": "✅ Sent"},
-        {"time": "Yesterday", "action": "Sales demo request to Innovate Inc", "status": "✅ Sent"},
-        {"time": "2 days ago", "action": "Inquiry about products", "status": "✅ Replied"},
-    ]
-    
-    for act in activities:
-        st.markdown(f"""
-        <div style="background: white; padding: 1rem; border-radius: 10px; margin: 0.5rem 0; display: flex; justify-content: space-between; align-items: center; box-shadow: 0 2px 5px rgba(0,0,0,0.05);">
-            <div>
-                <strong>{act['action']}</strong><br>
-                <small style="color: #999;">{act['time']}</small>
-            </div>
-            <span>{act['status']}</span>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    st.markdown('<div class="custom-divider"></div>', unsafe_allow_html=True)
-    
-    if st.button("📝 Compose New Email", type="primary"):
-        st.session_state.step = 1
-        st.session_state.page = "compose"
-        st.rerun()
-
-# ============================================
-# HISTORY PAGE
-# ============================================
-def history():
-    st.markdown("""
-    <div style="text-align: center; margin-bottom: 2rem;">
-        <h1 class="gradient-text" style="font-size: 2.5rem;">📊 Email History</h1>
-        <p style="color: #666;">Track all your sent emails</p>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    import pandas as pd
-    data = {
-        'Date': ['2024-02-22', '2024-02-21', '2024-02-20', '2024-02-19'],
-        'To': ['john@techcorp.com', 'sarah@innovate.com', 'support@supplyco.com', 'info@global.com'],
-        'Intent': ['Sales', 'Partnership', 'Complaint', 'Inquiry'],
-        'Status': ['✅ Sent', '✅ Sent', '✅ Sent', '✅ Sent']
-    }
-    df = pd.DataFrame(data)
-    st.dataframe(df, use_container_width=True)
-
-# ============================================
-# MAIN APP - SAME LOGIC
-# ============================================
-def main():
-    if not st.session_state.logged_in:
-        login()
-        return
-    
-    sidebar()
-    
-    # Progress steps (only for compose page)
-    if st.session_state.get('page') == 'compose':
-        st.markdown("""
-        <div class="step-container">
-            <div class="step-item {}">✍️ Write</div>
-            <div class="step-item {}">🔍 Analyze</div>
-            <div class="step-item {}">👤 Recipient</div>
-            <div class="step-item {}">📨 Review</div>
-        </div>
-        """.format(
-            'active' if st.session_state.step == 1 else 'completed' if st.session_state.step > 1 else '',
-            'active' if st.session_state.step == 2 else 'completed' if st.session_state.step > 2 else '',
-            'active' if st.session_state.step == 3 else 'completed' if st.session_state.step > 3 else '',
-            'active' if st.session_state.step == 4 else 'completed' if st.session_state.step > 4 else ''
-        ), unsafe_allow_html=True)
-        
-        # Show current step
-        if st.session_state.step == 1:
-            step_write()
-        elif st.session_state.step == 2:
-            step_analyze()
-        elif st.session_state.step == 3:
-            step_recipient()
-        elif st.session_state.step == 4:
-            step_review()
-    else:
-        if st.session_state.get('page') == 'dashboard':
-            dashboard()
-        elif st.session_state.get('page') == 'history':
-            history()
-        else:
-            dashboard()  # default
-
-if __name__ == "__main__":
-    main()
+"""
+email_simple.py - Stunning Modern UI Version (Same Logic)
+Run: streamlit run email_simple.py
+"""
+
+import streamlit as st
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from datetime import datetime
+import base64
+import threading
+import time
+
+from bulk_send import REPORT_FIELDS, BulkConfig, BulkSender, build_message, merge, read_recipients
+from email_templates import DEFAULT_INTENT, TEMPLATES, default_subject, render_email
+from inference_client import ServiceConfig, ServiceUnavailable, connect_service
+from metrics import (
+    ERRORS, LOAD_SECONDS, MEMORY_MB, MODEL_MEMORY_MB, PREDICTION_CACHE, REQUESTS, STAGE_SECONDS,
+    render, stage_summary, start_exporter, track_process_memory, tracked
+)
+from micro_batcher import MicroBatcher
+from model_warmup import ModelWarmer, warm_up
+from prediction_cache import PredictionCache
+from smtp_pool import SmtpConfig, SmtpPool
+
+# ============================================
+# PAGE CONFIG - MUST BE FIRST
+# ============================================
+st.set_page_config(
+    page_title="Email AI Studio", 
+    page_icon="✨", 
+    layout="wide",
+    initial_sidebar_state="expanded"
+)
+
+# ============================================
+# ADVANCED UI STYLING
+# ============================================
+st.markdown("""
+<style>
+    /* Global Styles */
+    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700;800&display=swap');
+    
+    * {
+        font-family: 'Inter', sans-serif;
+    }
+    
+    /* Main container */
+    .main {
+        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+    }
+    
+    /* Glass morphism cards */
+    .glass-card {
+        background: rgba(255, 255, 255, 0.95);
+        backdrop-filter: blur(10px);
+        border-radius: 20px;
+        padding: 2rem;
+        box-shadow: 0 20px 60px rgba(0,0,0,0.3);
+        border: 1px solid rgba(255,255,255,0.2);
+        margin: 1rem 0;
+        transition: transform 0.3s ease;
+    }
+    
+    .glass-card:hover {
+        transform: translateY(-5px);
+    }
+    
+    /* Gradient text */
+    .gradient-text {
+        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+        -webkit-background-clip: text;
+        -webkit-text-fill-color: transparent;
+        font-weight: 800;
+    }
+    
+    /* Sidebar styling */
+    .css-1d391kg {
+        background: linear-gradient(180deg, #1a1a2e 0%, #16213e 100%);
+    }
+    
+    /* User avatar */
+    .user-avatar {
+        width: 80px;
+        height: 80px;
+        border-radius: 50%;
+        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+        display: flex;
+        align-items: center;
+        justify-content: center;
+        margin: 0 auto 1rem;
+        border: 3px solid white;
+        box-shadow: 0 10px 30px rgba(0,0,0,0.2);
+    }
+    
+    .user-avatar span {
+        color: white;
+        font-size: 2rem;
+        font-weight: 600;
+    }
+    
+    /* Progress steps */
+    .step-container {
+        display: flex;
+        justify-content: space-between;
+        margin: 2rem 0;
+        position: relative;
+    }
+    
+    .step-container::before {
+        content: '';
+        position: absolute;
+        top: 50%;
+        left: 0;
+        right: 0;
+        height: 2px;
+        background: rgba(255,255,255,0.1);
+        transform: translateY(-50%);
+        z-index: 1;
+    }
+    
+    .step-item {
+        background: rgba(255,255,255,0.95);
+        padding: 0.8rem 1.5rem;
+        border-radius: 50px;
+        font-weight: 600;
+        position: relative;
+        z-index: 2;
+        box-shadow: 0 5px 15px rgba(0,0,0,0.1);
+        border: 2px solid transparent;
+        transition: all 0.3s ease;
+    }
+    
+    .step-item.active {
+        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+        color: white;
+        border-color: white;
+        transform: scale(1.05);
+    }
+    
+    .step-item.completed {
+        background: #10b981;
+        color: white;
+    }
+    
+    /* Intent cards */
+    .intent-card {
+        background: white;
+        border-radius: 15px;
+        padding: 2rem;
+        text-align: center;
+        box-shadow: 0 10px 40px rgba(0,0,0,0.1);
+        border-left: 5px solid;
+        transition: all 0.3s ease;
+    }
+    
+    .intent-card:hover {
+        transform: translateY(-5px);
+        box-shadow: 0 15px 50px rgba(0,0,0,0.2);
+    }
+    
+    /* Progress bars */
+    .prob-bar-container {
+        background: #f0f0f0;
+        border-radius: 10px;
+        height: 30px;
+        margin: 10px 0;
+        overflow: hidden;
+        box-shadow: inset 0 2px 5px rgba(0,0,0,0.1);
+    }
+    
+    .prob-bar {
+        height: 100%;
+        display: flex;
+        align-items: center;
+        justify-content: flex-end;
+        padding-right: 15px;
+        color: white;
+        font-weight: 600;
+        font-size: 0.9rem;
+        transition: width 1s ease;
+        background: linear-gradient(90deg, #667eea, #764ba2);
+    }
+    
+    /* Email preview */
+    .email-preview {
+        background: #1e1e2e;
+        color: #fff;
+        padding: 2rem;
+        border-radius: 15px;
+        font-family: 'Courier New', monospace;
+        border: 1px solid rgba(255,255,255,0.1);
+        box-shadow: 0 20px 60px rgba(0,0,0,0.3);
+        white-space: pre-wrap;
+        line-height: 1.6;
+    }
+    
+    /* Buttons */
+    .stButton > button {
+        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+        color: white;
+        border: none;
+        padding: 0.8rem 2rem;
+        border-radius: 50px;
+        font-weight: 600;
+        font-size: 1rem;
+        transition: all 0.3s ease;
+        text-transform: uppercase;
+        letter-spacing: 1px;
+        box-shadow: 0 10px 20px rgba(102, 126, 234, 0.3);
+        width: 100%;
+    }
+    
+    .stButton > button:hover {
+        transform: translateY(-3px);
+        box-shadow: 0 15px 30px rgba(102, 126, 234, 0.4);
+    }
+    
+    /* Input fields */
+    .stTextInput > div > div > input {
+        border-radius: 50px;
+        border: 2px solid #e0e0e0;
+        padding: 0.8rem 1.5rem;
+        font-size: 1rem;
+        transition: all 0.3s ease;
+    }
+    
+    .stTextInput > div > div > input:focus {
+        border-color: #667eea;
+        box-shadow: 0 0 0 3px rgba(102, 126, 234, 0.1);
+    }
+    
+    /* Text area */
+    .stTextArea > div > div > textarea {
+        border-radius: 20px;
+        border: 2px solid #e0e0e0;
+        padding: 1rem;
+        font-size: 1rem;
+        transition: all 0.3s ease;
+    }
+    
+    .stTextArea > div > div > textarea:focus {
+        border-color: #667eea;
+        box-shadow: 0 0 0 3px rgba(102, 126, 234, 0.1);
+    }
+    
+    /* Success/Error messages */
+    .stAlert {
+        border-radius: 10px;
+        border-left: 5px solid;
+        animation: slideIn 0.5s ease;
+    }
+    
+    @keyframes slideIn {
+        from {
+            transform: translateX(-100%);
+            opacity: 0;
+        }
+        to {
+            transform: translateX(0);
+            opacity: 1;
+        }
+    }
+    
+    /* Stats cards */
+    .stat-card {
+        background: white;
+        border-radius: 15px;
+        padding: 1.5rem;
+        text-align: center;
+        box-shadow: 0 10px 30px rgba(0,0,0,0.1);
+        transition: all 0.3s ease;
+    }
+    
+    .stat-card:hover {
+        transform: translateY(-5px);
+        box-shadow: 0 15px 40px rgba(0,0,0,0.15);
+    }
+    
+    .stat-number {
+        font-size: 2.5rem;
+        font-weight: 800;
+        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+        -webkit-background-clip: text;
+        -webkit-text-fill-color: transparent;
+    }
+    
+    /* Divider */
+    .custom-divider {
+        height: 3px;
+        background: linear-gradient(90deg, transparent, #667eea, #764ba2, transparent);
+        margin: 2rem 0;
+    }
+    
+    /* Footer */
+    .footer {
+        text-align: center;
+        padding: 2rem;
+        color: rgba(255,255,255,0.6);
+        font-size: 0.9rem;
+    }
+</style>
+""", unsafe_allow_html=True)
+
+# ============================================
+# SESSION STATE - SAME LOGIC
+# ============================================
+if 'logged_in' not in st.session_state:
+    st.session_state.logged_in = False
+if 'step' not in st.session_state:
+    st.session_state.step = 1
+if 'intent' not in st.session_state:
+    st.session_state.intent = None
+if 'message' not in st.session_state:
+    st.session_state.message = ""
+if 'company' not in st.session_state:
+    st.session_state.company = ""
+if 'rec_name' not in st.session_state:
+    st.session_state.rec_name = ""
+if 'rec_email' not in st.session_state:
+    st.session_state.rec_email = ""
+if 'rec_company' not in st.session_state:
+    st.session_state.rec_company = ""
+if 'rec_subject' not in st.session_state:
+    st.session_state.rec_subject = ""
+if 'email_body' not in st.session_state:
+    st.session_state.email_body = ""
+
+# ============================================
+# LOAD MODEL - SAME LOGIC
+# ============================================
+import os
+
+HF_CACHE_DIR = "./hf_cache"  # Optional: local cache folder
+MAX_LENGTH = 64
+
+def _load_and_warm(warmer):
+    """Runs on the warm-up thread: download, load, then a few dummy passes"""
+    # Heavy imports live here so the login page renders without waiting on them
+    with warmer.phase("import torch/transformers"):
+        from bench_utils import current_rss_mb
+        from model_bundle import resolve_model_bundle
+        from model_loader import load_classifier
+    rss_before = current_rss_mb()
+    
+    # Model bundle from Hugging Face, no network call once it is cached locally
+    with warmer.phase("resolve bundle"):
+        model_path = resolve_model_bundle(cache_dir=HF_CACHE_DIR)
+    
+    # EMAIL_AI_PRECISION / EMAIL_AI_BACKEND pick precision and runtime
+    model, tokenizer, encoder = load_classifier(model_path, phase=warmer.phase)
+    
+    with warmer.phase("warm-up passes"):
+        warm_up(model, tokenizer, max_length=MAX_LENGTH)
+    MODEL_MEMORY_MB.labels().set(current_rss_mb() - rss_before)
+    
+    return model_path, (model, tokenizer, encoder)
+
+@st.cache_resource
+def get_model_warmer():
+    """Start loading the model in the background, once per server process"""
+    return ModelWarmer(_load_and_warm)
+
+# A failed warm-up (e.g. Hugging Face briefly unreachable) is started over after this long
+WARMUP_RETRY_SECONDS = 30
+
+@st.cache_resource
+def _warmer_reset_lock():
+    return threading.Lock()
+
+def model_warmer():
+    """The background warm-up; a failed one is replaced once it is WARMUP_RETRY_SECONDS old"""
+    warmer = get_model_warmer()
+    failed_for = warmer.failed_for()
+    if failed_for is None or failed_for < WARMUP_RETRY_SECONDS:
+        return warmer
+    with _warmer_reset_lock():
+        # Another session may already have started the new warm-up
+        if get_model_warmer() is warmer:
+            # Drop everything cached from the failed load (None models included) along with it
+            for cached in (get_model_warmer, load_model, get_batcher, get_cascade, get_prediction_cache):
+                cached.clear()
+    return get_model_warmer()
+
+# A service that did not answer (e.g. started after this replica) is asked again after this long
+SERVICE_RETRY_SECONDS = 30
+
+@st.cache_resource
+def _service_probe():
+    """Latest connect_service() answer and when it was asked, shared by all sessions"""
+    return {"client": connect_service(), "at": time.monotonic()}
+
+@st.cache_resource
+def _service_probe_lock():
+    return threading.Lock()
+
+def get_service_client():
+    """Client of the local inference service (EMAIL_AI_SERVICE_URL), or None to run the model in-process
+
+    None is not kept for good: the service is probed again every SERVICE_RETRY_SECONDS.
+    """
+    probe = _service_probe()
+    if probe["client"] is not None or not ServiceConfig.URL:
+        return probe["client"]
+    if time.monotonic() - probe["at"] < SERVICE_RETRY_SECONDS:
+        return None
+    with _service_probe_lock():
+        # Another session may have probed while this one waited for the lock
+        if probe["client"] is None and time.monotonic() - probe["at"] >= SERVICE_RETRY_SECONDS:
+            probe["client"], probe["at"] = connect_service(), time.monotonic()
+            if probe["client"] is not None:
+                # Built for the in-process model: rebuild them for the service's
+                for cached in (get_cascade, get_prediction_cache):
+                    cached.clear()
+    return probe["client"]
+
+def model_status_text():
+    """One-line readiness message for the UI"""
+    client = get_service_client()
+    if client is not None:
+        return f"🟢 Model served by {client.url}"
+    return model_warmer().status_text()
+
+@st.cache_resource
+def get_metrics_exporter():
+    """Serve/write Prometheus metrics (EMAIL_AI_METRICS_PORT / EMAIL_AI_METRICS_FILE), once per server process"""
+    track_process_memory()
+    return start_exporter()
+
+get_metrics_exporter()
+
+def get_model_path():
+    """Local path of the model bundle"""
+    return model_warmer().wait()[0]
+
+@st.cache_resource
+def load_model():
+    """Load model from Hugging Face (waits for the background warm-up)"""
+    try:
+        return model_warmer().wait()[1]
+        
+    except Exception as e:
+        st.error(f"⚠️ Failed to load model: {str(e)}")
+        st.info("""
+        The model is downloaded from Hugging Face automatically.
+        Make sure you have internet connection, loading is retried automatically.
+        """)
+        return None, None, None
+
+# Concurrent Analyze clicks are grouped into one forward pass
+MICRO_BATCH_MAX_SIZE = 16
+MICRO_BATCH_WAIT_MS = 5
+
+@st.cache_resource
+def get_executor():
+    """Caps concurrent forward passes and their torch threads, one per server process"""
+    from inference_executor import InferenceExecutor
+    from model_loader import InferenceConfig
+    return InferenceExecutor(
+        max_concurrent=InferenceConfig.MAX_CONCURRENT_PASSES,
+        threads_per_pass=InferenceConfig.THREADS_PER_PASS,
+        queue_timeout=InferenceConfig.QUEUE_TIMEOUT
+    )
+
+@st.cache_resource
+def get_batcher():
+    """Shared micro-batcher over the cached model, one per server process"""
+    model, tokenizer, encoder = load_model()
+    if model is None:
+        return None
+    from batch_inference import classify_texts
+    from model_loader import InferenceConfig
+    executor = get_executor()
+    # EMAIL_AI_LONG_INPUT: windows of every queued message share the same batches
+    # One batching thread per executor slot, so each slot always has a batch to run
+    return MicroBatcher(
+        lambda texts: executor.run(classify_texts, model, tokenizer, texts, max_length=MAX_LENGTH,
+                                   long_input=InferenceConfig.LONG_INPUT).tolist(),
+        max_batch_size=MICRO_BATCH_MAX_SIZE,
+        max_wait_ms=MICRO_BATCH_WAIT_MS,
+        num_threads=executor.max_concurrent
+    )
+
+def classify_queued(text):
+    """One probability row from the micro-batcher, or None when the model failed to load
+
+    Raises TimeoutError if the model stays busy too long.
+    """
+    from model_loader import InferenceConfig
+    batcher = get_batcher()
+    if batcher is None:
+        return None
+    return batcher.classify(text, timeout=InferenceConfig.QUEUE_TIMEOUT)
+
+def get_labels():
+    """Intent labels in probability order, or None when the model failed to load"""
+    client = get_service_client()
+    if client is not None:
+        return client.labels
+    model, tokenizer, encoder = load_model()
+    return None if encoder is None else list(encoder.classes_)
+
+@st.cache_resource
+def get_cascade():
+    """Distilled student answering confident messages before DistilBERT, or None"""
+    from model_loader import InferenceConfig
+    from student_model import load_cascade
+    client = get_service_client()
+    if client is not None:
+        labels, fingerprint, teacher_fn = client.labels, client.fingerprint, client.classify_batch
+    else:
+        model, tokenizer, encoder = load_model()
+        if model is None:
+            return None
+        from model_bundle import source_fingerprint
+        labels, fingerprint = encoder.classes_, source_fingerprint(get_model_path())
+        teacher_fn = lambda texts: [classify_queued(text) for text in texts]
+    return load_cascade(InferenceConfig.STUDENT_PATH, labels, fingerprint, teacher_fn,
+                        InferenceConfig.STUDENT_THRESHOLD)
+
+@st.cache_resource
+def get_prediction_cache():
+    """Prediction cache shared by all sessions, tied to the current checkpoint"""
+    client = get_service_client()
+    if client is not None:
+        info = client.info
+        model_hash, tokenizer_name, lowercase = info["model_hash"], info["tokenizer"], info["lowercase"]
+        max_length = info["max_length"]
+    else:
+        model, tokenizer, encoder = load_model()
+        if model is None:
+            return None
+        from model_loader import serving_hash
+        model_hash = serving_hash(get_model_path(), model)
+        tokenizer_name, lowercase = tokenizer.name_or_path, getattr(tokenizer, "do_lower_case", False)
+        max_length = MAX_LENGTH
+    # Cascade and early-exit answers differ from full DistilBERT's, so they get their own cache entries
+    cascade = get_cascade()
+    return PredictionCache(
+        model_hash=f"{model_hash}{'-' + cascade.tag if cascade else ''}",
+        tokenizer_name=tokenizer_name,
+        max_length=max_length,
+        lowercase=lowercase,
+        db_path=os.path.join(HF_CACHE_DIR, "predictions.sqlite")
+    )
+
+# Start warm-up on the first script run, while login() renders
+# (replicas served by the inference service never load the model themselves)
+if get_service_client() is None:
+    model_warmer()
+
+def classify_message(message):
+    """(labels, probability list) for one message, served from the cache when possible
+
+    labels are None when no model could answer. They come back with the
+    probabilities because a fallback to this replica's own model may use a
+    different bundle, or label order, than the inference service.
+    """
+    with tracked("classify"):
+        cache = get_prediction_cache()
+        cached = cache.get(message)
+        PREDICTION_CACHE.labels(result="miss" if cached is None else "hit").inc()
+        if cached is not None:
+            return get_labels(), cached
+        
+        cascade = get_cascade()
+        client = get_service_client()
+        try:
+            if cascade is not None:
+                probs = cascade.classify(message)
+            elif client is not None:
+                probs = client.classify(message)
+            else:
+                probs = classify_queued(message)
+        except ServiceUnavailable:
+            # Service went away: answer from this replica's own model, uncached. The first fallback
+            # starts its warm-up; a wait past the queue timeout ends in step_analyze's busy/Retry prompt
+            from model_loader import InferenceConfig
+            warmer = model_warmer()
+            if not warmer.join(timeout=InferenceConfig.QUEUE_TIMEOUT):
+                raise TimeoutError(f"Model still warming up ({warmer.current_phase})")
+            probs = None if warmer.error is not None else classify_queued(message)
+            if probs is None:
+                st.error("⚠️ The inference service is unreachable and the local model failed to load")
+                return None, None
+            model, tokenizer, encoder = load_model()
+            return list(encoder.classes_), probs
+        cache.put(message, probs)
+        return get_labels(), probs
+
+@st.cache_resource
+def get_smtp_pool():
+    """Logged-in SMTP connections shared by all sessions, keyed by server and sender"""
+    return SmtpPool()
+
+# ============================================
+# LOGIN PAGE - STUNNING UI
+# ============================================
+def login():
+    col1, col2, col3 = st.columns([1, 2, 1])
+    
+    with col2:
+        st.markdown("""
+        <div style="text-align: center; margin-bottom: 2rem;">
+            <h1 style="font-size: 3rem; margin-bottom: 0;">✨</h1>
+            <h1 class="gradient-text" style="font-size: 3rem; margin-bottom: 0;">Email AI Studio</h1>
+            <p style="color: #666; font-size: 1.2rem;">Intelligent Email Automation</p>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        with st.container():
+            st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+            
+            with st.form("login_form"):
+                st.markdown("### 🔐 Welcome Back")
+                email = st.text_input("Email Address", placeholder="your@email.com")
+                password = st.text_input("Password", type="password", placeholder="••••••••")
+                
+                col_a, col_b = st.columns(2)
+                with col_a:
+                    login_btn = st.form_submit_button("Login", type="primary", use_container_width=True)
+                with col_b:
+                    demo_btn = st.form_submit_button("Demo", use_container_width=True)
+            
+            if login_btn and email:
+                st.session_state.logged_in = True
+                st.session_state.user_email = email
+                st.rerun()
+            
+            if demo_btn:
+                st.session_state.logged_in = True
+                st.session_state.user_email = "demo@email.ai"
+                st.rerun()
+            
+            # Model loads in the background while the user logs in
+            st.caption(model_status_text())
+            
+            st.markdown('</div>', unsafe_allow_html=True)
+
+# ============================================
+# SIDEBAR - STUNNING UI
+# ============================================
+def sidebar():
+    with st.sidebar:
+        # User avatar
+        initial = st.session_state.user_email[0].upper() if st.session_state.user_email else "U"
+        st.markdown(f"""
+        <div class="user-avatar">
+            <span>{initial}</span>
+        </div>
+        <h3 style="text-align: center; color: white; margin-bottom: 0;">{st.session_state.user_email.split('@')[0]}</h3>
+        <p style="text-align: center; color: rgba(255,255,255,0.6); font-size: 0.9rem;">{st.session_state.user_email}</p>
+        """, unsafe_allow_html=True)
+        
+        st.markdown("<hr style='border-color: rgba(255,255,255,0.1);'>", unsafe_allow_html=True)
+        
+        # Navigation
+        if st.button("✨ Dashboard", use_container_width=True):
+            st.session_state.page = "dashboard"
+            st.rerun()
+        if st.button("📝 Compose", use_container_width=True):
+            st.session_state.step = 1
+            st.session_state.page = "compose"
+            st.rerun()
+        if st.button("📬 Bulk Send", use_container_width=True):
+            st.session_state.page = "bulk"
+            st.rerun()
+        if st.button("📊 History", use_container_width=True):
+            st.session_state.page = "history"
+            st.rerun()
+        
+        st.markdown("<hr style='border-color: rgba(255,255,255,0.1);'>", unsafe_allow_html=True)
+        
+        if st.button("🚪 Logout", use_container_width=True):
+            st.session_state.logged_in = False
+            st.rerun()
+        
+        # Model readiness
+        st.caption(model_status_text())
+        phases = model_warmer().phase_timings() if get_service_client() is None else {}
+        if phases:
+            with st.expander("⏱️ Warm-up phases"):
+                for phase, seconds in phases.items():
+                    st.caption(f"{phase}: {seconds:.2f}s")
+
+# ============================================
+# STEP 1: WRITE - STUNNING UI
+# ============================================
+def step_write():
+    st.markdown("""
+    <div style="text-align: center; margin-bottom: 2rem;">
+        <h1 class="gradient-text" style="font-size: 2.5rem;">✍️ Compose Your Message</h1>
+        <p style="color: #666;">Write naturally - our AI will understand your intent</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    with st.container():
+        st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+        
+        with st.form("write_form"):
+            col1, col2 = st.columns(2)
+            with col1:
+                name = st.text_input("Your Name", value=st.session_state.get('user_name', ''), 
+                                    placeholder="John Doe")
+            with col2:
+                company = st.text_input("Your Company", placeholder="ABC Corp",
+                                       value=st.session_state.get('company', ''))
+            
+            message = st.text_area(
+                "Your Message",
+                height=150,
+                placeholder="e.g., We see strong potential for collaboration between our companies. Let's explore partnership opportunities in the Mumbai region.",
+                value=st.session_state.get('message', '')
+            )
+            
+            st.markdown('<div class="custom-divider"></div>', unsafe_allow_html=True)
+            
+            if st.form_submit_button("🔍 Analyze Intent", type="primary", use_container_width=True):
+                if message:
+                    st.session_state.user_name = name
+                    st.session_state.company = company
+                    st.session_state.message = message
+                    st.session_state.step = 2
+                    st.rerun()
+        
+        st.markdown('</div>', unsafe_allow_html=True)
+
+# ============================================
+# STEP 2: ANALYZE - STUNNING UI
+# ============================================
+def step_analyze():
+    labels = get_labels()
+    
+    if labels and st.session_state.message:
+        try:
+            labels, probs = classify_message(st.session_state.message)
+        except TimeoutError:
+            st.warning("⏳ The model is busy right now, please try again in a moment")
+            if st.button("🔄 Retry", use_container_width=True):
+                st.rerun()
+            return
+        if probs is None:
+            return
+        pred = max(range(len(probs)), key=lambda i: probs[i])
+        
+        intent = labels[pred]
+        confidence = probs[pred]
+        st.session_state.intent = intent
+        
+        # Color mapping
+        colors = {
+            'inquiry': '#2196F3',
+            'complaint': '#F44336', 
+            'sales': '#4CAF50',
+            'negotiation': '#FF9800',
+            'partnership': '#9C27B0'
+        }
+        color = colors.get(intent, '#667eea')
+        
+        # Show intent card
+        st.markdown(f"""
+        <div style="text-align: center; margin-bottom: 2rem;">
+            <h1 class="gradient-text" style="font-size: 2rem;">🎯 Intent Analysis</h1>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col2:
+            st.markdown(f"""
+            <div class="intent-card" style="border-left-color: {color};">
+                <h2 style="color: {color}; font-size: 2rem; margin-bottom: 0.5rem;">{intent.upper()}</h2>
+                <div style="font-size: 1.5rem; font-weight: 600; margin: 1rem 0;">
+                    <span style="color: {color};">{confidence:.1%}</span>
+                </div>
+                <div style="background: {color}20; padding: 1rem; border-radius: 10px;">
+                    <p style="color: #666; font-style: italic;">"{st.session_state.message[:100]}..."</p>
+                </div>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        st.markdown('<div class="custom-divider"></div>', unsafe_allow_html=True)
+        
+        # Probability distribution
+        st.markdown("### 📊 Probability Distribution")
+        probs_dict = {labels[i]: probs[i] for i in range(len(labels))}
+        
+        for label, prob in sorted(probs_dict.items(), key=lambda x: x[1], reverse=True):
+            col1, col2 = st.columns([1, 3])
+            with col1:
+                st.markdown(f"**{label.title()}**")
+            with col2:
+                bar_color = colors.get(label, '#667eea')
+                st.markdown(f"""
+                <div class="prob-bar-container">
+                    <div class="prob-bar" style="width: {prob*100}%; background: {bar_color};">
+                        {prob:.1%}
+                    </div>
+                </div>
+                """, unsafe_allow_html=True)
+        
+        st.markdown('<div class="custom-divider"></div>', unsafe_allow_html=True)
+        
+        # Action buttons
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            if st.button("✅ Correct", type="primary", use_container_width=True):
+                st.session_state.step = 3
+                st.rerun()
+        with col2:
+            if st.button("🔄 Try Again", use_container_width=True):
+                st.session_state.step = 1
+                st.rerun()
+        with col3:
+            if st.button("✏️ Edit", use_container_width=True):
+                st.session_state.step = 1
+                st.rerun()
+
+# ============================================
+# STEP 3: RECIPIENT - STUNNING UI
+# ============================================
+def step_recipient():
+    st.markdown("""
+    <div style="text-align: center; margin-bottom: 2rem;">
+        <h1 class="gradient-text" style="font-size: 2rem;">👤 Recipient Details</h1>
+        <p style="color: #666;">Who should receive this email?</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    with st.container():
+        st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+        
+        with st.form("recipient_form"):
+            col1, col2 = st.columns(2)
+            with col1:
+                name = st.text_input("Recipient Name", placeholder="John Smith")
+            with col2:
+                company = st.text_input("Company Name", placeholder="ABC Corp")
+            
+            email = st.text_input("Email Address", placeholder="john@abccorp.com")
+            subject = st.text_input(
+                "Subject",
+                value=default_subject(st.session_state.intent)
+            )
+            
+            st.markdown('<div class="custom-divider"></div>', unsafe_allow_html=True)
+            
+            if st.form_submit_button("✍️ Generate Email", type="primary", use_container_width=True):
+                if name and email:
+                    st.session_state.rec_name = name
+                    st.session_state.rec_company = company
+                    st.session_state.rec_email = email
+                    st.session_state.rec_subject = subject
+                    st.session_state.step = 4
+                    st.rerun()
+        
+        st.markdown('</div>', unsafe_allow_html=True)
+
+# ============================================
+# STEP 4: REVIEW & SEND - STUNNING UI
+# ============================================
+def step_review():
+    render_started = time.perf_counter()
+    email_body = render_email(
+        st.session_state.intent,
+        rec_name=st.session_state.rec_name,
+        rec_company=st.session_state.rec_company,
+        message=st.session_state.message,
+        user_name=st.session_state.user_name,
+        company=st.session_state.company,
+        user_email=st.session_state.user_email
+    )
+    STAGE_SECONDS.labels(stage="render_template").observe(time.perf_counter() - render_started)
+    
+    st.markdown("""
+    <div style="text-align: center; margin-bottom: 2rem;">
+        <h1 class="gradient-text" style="font-size: 2rem;">📨 Review & Send</h1>
+        <p style="color: #666;">Your AI-generated email is ready</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # Email preview
+    st.markdown("### 📧 Generated Email")
+    st.markdown(f'<div class="email-preview">{email_body.replace(chr(10), "<br>")}</div>', 
+                unsafe_allow_html=True)
+    
+    # Edit option
+    edited_email = st.text_area("✏️ Edit if needed:", value=email_body, height=200)
+    
+    st.markdown('<div class="custom-divider"></div>', unsafe_allow_html=True)
+    
+    # Send section
+    st.markdown("### 📤 Send Email")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        password = st.text_input(
+            "🔑 App Password",
+            type="password",
+            help="Enter your 16-character Gmail App Password",
+            placeholder="••••••••••••••••"
+        )
+        
+        if st.button("📤 Send Now", type="primary", use_container_width=True):
+            if password:
+                try:
+                    msg = MIMEMultipart()
+                    msg['From'] = st.session_state.user_email
+                    msg['To'] = st.session_state.rec_email
+                    msg['Subject'] = st.session_state.rec_subject
+                    msg.attach(MIMEText(edited_email, 'plain'))
+                    
+                    # Reuses a logged-in connection for this sender when one is pooled
+                    with tracked("send"):
+                        get_smtp_pool().send_message(msg, st.session_state.user_email, password,
+                                                     SmtpConfig.HOST, SmtpConfig.PORT)
+                    
+                    st.success("✅ Email sent successfully! 🎉")
+                    st.balloons()
+                    
+                    if st.button("📝 Compose New", key="new_after_send"):
+                        st.session_state.step = 1
+                        st.rerun()
+                except Exception as e:
+                    st.error(f"❌ Failed: {str(e)}")
+            else:
+                st.error("❌ Please enter your app password")
+    
+    with col2:
+        if st.button("💾 Save Draft", use_container_width=True):
+            st.success("✅ Draft saved!")
+        if st.button("🔄 Edit Recipient", use_container_width=True):
+            st.session_state.step = 3
+            st.rerun()
+    
+    if st.button("📝 Start Fresh", use_container_width=True):
+        st.session_state.step = 1
+        st.rerun()
+
+# ============================================
+# DASHBOARD - STUNNING UI
+# ============================================
+def dashboard():
+    st.markdown("""
+    <div style="text-align: center; margin-bottom: 3rem;">
+        <h1 class="gradient-text" style="font-size: 3rem;">✨ Dashboard</h1>
+        <p style="color: #666; font-size: 1.2rem;">Your email activity at a glance</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.markdown("""
+        <div class="stat-card">
+            <div class="stat-number">12</div>
+            <p style="color: #666;">Emails Sent</p>
+            <p style="color: #10b981; font-size: 0.9rem;">↑ +3 this week</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown("""
+        <div class="stat-card">
+            <div class="stat-number">8</div>
+            <p style="color: #666;">Responses</p>
+            <p style="color: #10b981; font-size: 0.9rem;">67% response rate</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col3:
+        st.markdown("""
+        <div class="stat-card">
+            <div class="stat-number">5</div>
+            <p style="color: #666;">Meetings</p>
+            <p style="color: #f59e0b; font-size: 0.9rem;">2 scheduled</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col4:
+        st.markdown("""
+        <div class="stat-card">
+            <div class="stat-number">3</div>
+            <p style="color: #666;">Partnerships</p>
+            <p style="color: #10b981; font-size: 0.9rem;">+1 this month</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    st.markdown('<div class="custom-divider"></div>', unsafe_allow_html=True)
+    
+    # Recent activity
+    st.markdown("### 📋 Recent Activity")
+    
+    activities = [
+        {"time": "2 hours ago", "action": "Partnership proposal to TechCorp", "status": "✅ Sent"},
+        {"time": "Yesterday", "action": "Sales demo request to Innovate Inc", "status": "✅ Sent"},
+        {"time": "2 days ago", "action": "Inquiry about products", "status": "✅ Replied"},
+    ]
+    
+    for act in activities:
+        st.markdown(f"""
+        <div style="background: white; padding: 1rem; border-radius: 10px; margin: 0.5rem 0; display: flex; justify-content: space-between; align-items: center; box-shadow: 0 2px 5px rgba(0,0,0,0.05);">
+            <div>
+                <strong>{act['action']}</strong><br>
+                <small style="color: #999;">{act['time']}</small>
+            </div>
+            <span>{act['status']}</span>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    st.markdown('<div class="custom-divider"></div>', unsafe_allow_html=True)
+    
+    if st.button("📝 Compose New Email", type="primary"):
+        st.session_state.step = 1
+        st.session_state.page = "compose"
+        st.rerun()
+
+# ============================================
+# HISTORY PAGE
+# ============================================
+def history():
+    st.markdown("""
+    <div style="text-align: center; margin-bottom: 2rem;">
+        <h1 class="gradient-text" style="font-size: 2.5rem;">📊 Email History</h1>
+        <p style="color: #666;">Track all your sent emails</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    import pandas as pd
+    data = {
+        'Date': ['2024-02-22', '2024-02-21', '2024-02-20', '2024-02-19'],
+        'To': ['john@techcorp.com', 'sarah@innovate.com', 'support@supplyco.com', 'info@global.com'],
+        'Intent': ['Sales', 'Partnership', 'Complaint', 'Inquiry'],
+        'Status': ['✅ Sent', '✅ Sent', '✅ Sent', '✅ Sent']
+    }
+    df = pd.DataFrame(data)
+    st.dataframe(df, use_container_width=True)
+
+# ============================================
+# BULK SEND - ONE TEMPLATE, A CSV OF RECIPIENTS
+# ============================================
+def bulk_send():
+    import io
+    import pandas as pd
+    
+    st.markdown("""
+    <div style="text-align: center; margin-bottom: 2rem;">
+        <h1 class="gradient-text" style="font-size: 2.5rem;">📬 Bulk Send</h1>
+        <p style="color: #666;">One template, personalized for every row of your CSV</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    uploaded = st.file_uploader(
+        "Recipients CSV", type="csv",
+        help="Columns: email (required), name, company; optional per-row subject, intent and message"
+    )
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        name = st.text_input("Your Name", value=st.session_state.get('user_name', ''), key="bulk_name")
+    with col2:
+        company = st.text_input("Your Company", value=st.session_state.get('company', ''), key="bulk_company")
+    message = st.text_area("Your Message", value=st.session_state.get('message', ''), height=120, key="bulk_message")
+    
+    intents = list(TEMPLATES)
+    current = st.session_state.intent if st.session_state.intent in TEMPLATES else DEFAULT_INTENT
+    col1, col2 = st.columns(2)
+    with col1:
+        intent = st.selectbox("Intent", intents, index=intents.index(current), format_func=str.title)
+    with col2:
+        subject = st.text_input("Subject", value=default_subject(intent), key=f"bulk_subject_{intent}")
+    
+    if uploaded is None:
+        st.info("📄 Upload a CSV with an 'email' column to get started")
+        return
+    try:
+        rows = list(read_recipients(io.StringIO(uploaded.getvalue().decode("utf-8-sig"))))
+    except ValueError as e:
+        st.error(f"❌ {e}")
+        return
+    
+    st.caption(f"👥 {len(rows)} recipients")
+    if rows:
+        address, preview = build_message(rows[0], intent, message, st.session_state.user_email, name, company, subject)
+        st.markdown(f"### 📧 Preview for {address}")
+        part = preview.get_payload()[0]
+        # Decoded: MIMEText base64-encodes any non-ASCII body
+        body = part.get_payload(decode=True).decode(part.get_content_charset() or "utf-8")
+        st.markdown(f'<div class="email-preview">{body.replace(chr(10), "<br>")}</div>', unsafe_allow_html=True)
+    
+    st.markdown('<div class="custom-divider"></div>', unsafe_allow_html=True)
+    
+    with st.expander("⚙️ Sending limits"):
+        col1, col2 = st.columns(2)
+        max_in_flight = col1.number_input("Connections", min_value=1, max_value=32, value=BulkConfig.MAX_IN_FLIGHT)
+        rate = col2.number_input("Emails per second (0: no limit)", min_value=0.0, value=BulkConfig.RATE)
+    
+    password = st.text_input(
+        "🔑 App Password",
+        type="password",
+        help="Enter your 16-character Gmail App Password",
+        placeholder="••••••••••••••••",
+        key="bulk_password"
+    )
+    
+    if st.button(f"📬 Send to {len(rows)} recipients", type="primary", use_container_width=True, disabled=not rows):
+        if not password or not message:
+            st.error("❌ Please enter your message and app password")
+        else:
+            progress = st.progress(0.0)
+            results = []
+            
+            def on_result(result):
+                results.append(result)
+                progress.progress(len(results) / len(rows), text=f"{len(results)} / {len(rows)}")
+            
+            sender = BulkSender(st.session_state.user_email, password, SmtpConfig.HOST, SmtpConfig.PORT,
+                                max_in_flight=int(max_in_flight), rate=rate)
+            jobs = merge(rows, intent, message, st.session_state.user_email, name, company, subject)
+            try:
+                counters = sender.send(jobs, on_result)
+                st.success(f"✅ {counters['sent']} sent, {counters['failed']} failed, "
+                           f"{counters['invalid']} invalid ({counters['retries']} retries)")
+            except Exception as e:
+                st.error(f"❌ Failed: {str(e)}")
+            st.session_state.bulk_report = results
+    
+    # Kept in the session so the report survives the rerun of the download click
+    if st.session_state.get('bulk_report'):
+        report = pd.DataFrame(st.session_state.bulk_report, columns=REPORT_FIELDS).sort_values("row")
+        st.markdown("### 📋 Delivery Report")
+        st.dataframe(report, use_container_width=True)
+        st.download_button("⬇️ Download report", report.to_csv(index=False), file_name="bulk_report.csv",
+                           mime="text/csv")
+
+# ============================================
+# DIAGNOSTICS (hidden, open with ?diagnostics=1)
+# ============================================
+def diagnostics():
+    import pandas as pd
+    
+    with st.expander("🩺 Diagnostics", expanded=True):
+        st.caption(model_status_text())
+        
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Requests", f"{sum(c.value for _, c in REQUESTS.children()):.0f}")
+        col2.metric("Errors", f"{sum(c.value for _, c in ERRORS.children()):.0f}")
+        col3.metric("RSS", f"{MEMORY_MB.labels(kind='rss').get():.0f} MB")
+        col4.metric("Model", f"{MODEL_MEMORY_MB.labels().get():.0f} MB")
+        
+        st.markdown("**Hot-path stages**")
+        st.dataframe(pd.DataFrame(stage_summary()), use_container_width=True)
+        st.markdown("**Model loading**")
+        st.dataframe(pd.DataFrame(stage_summary(LOAD_SECONDS)), use_container_width=True)
+        
+        client = get_service_client()
+        if client is not None:
+            st.markdown("**Inference service**")
+            st.json({"url": client.url, **client.info})
+        elif model_warmer().ready and get_batcher() is not None:
+            st.markdown("**Micro-batcher**")
+            st.json(get_batcher().stats())
+            st.markdown("**Inference executor**")
+            st.json(get_executor().stats())
+        
+        st.markdown("**SMTP pool**")
+        st.json(get_smtp_pool().stats())
+        
+        st.markdown("**Prometheus text**")
+        st.code(render(), language="text")
+
+# ============================================
+# MAIN APP - SAME LOGIC
+# ============================================
+def main():
+    if st.query_params.get("diagnostics") == "1":
+        diagnostics()
+    
+    if not st.session_state.logged_in:
+        login()
+        return
+    
+    sidebar()
+    
+    # Progress steps (only for compose page)
+    if st.session_state.get('page') == 'compose':
+        st.markdown("""
+        <div class="step-container">
+            <div class="step-item {}">✍️ Write</div>
+            <div class="step-item {}">🔍 Analyze</div>
+            <div class="step-item {}">👤 Recipient</div>
+            <div class="step-item {}">📨 Review</div>
+        </div>
+        """.format(
+            'active' if st.session_state.step == 1 else 'completed' if st.session_state.step > 1 else '',
+            'active' if st.session_state.step == 2 else 'completed' if st.session_state.step > 2 else '',
+            'active' if st.session_state.step == 3 else 'completed' if st.session_state.step > 3 else '',
+            'active' if st.session_state.step == 4 else 'completed' if st.session_state.step > 4 else ''
+        ), unsafe_allow_html=True)
+        
+        # Show current step
+        if st.session_state.step == 1:
+            step_write()
+        elif st.session_state.step == 2:
+            step_analyze()
+        elif st.session_state.step == 3:
+            step_recipient()
+        elif st.session_state.step == 4:
+            step_review()
+    else:
+        if st.session_state.get('page') == 'dashboard':
+            dashboard()
+        elif st.session_state.get('page') == 'history':
+            history()
+        elif st.session_state.get('page') == 'bulk':
+            bulk_send()
+        else:
+            dashboard()  # default
+
+if __name__ == "__main__":
+    main()
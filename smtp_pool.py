@@ -0,0 +1,188 @@
+"""
+smtp_pool.py - Authenticated SMTP connections kept alive and reused across sends
+
+A send used to pay a TCP handshake, a TLS handshake and AUTH every time.
+The pool keeps logged-in connections per (server, user) and hands them out
+again. A connection idle for a while is checked with NOOP before reuse,
+a dropped one is replaced transparently, and idle ones are closed by a
+background reaper.
+"""
+
+import hashlib
+import logging
+import os
+import smtplib
+import ssl
+import threading
+import time
+from collections import defaultdict
+
+from metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# ============================================
+# CONFIGURATION
+# ============================================
+class SmtpConfig:
+    HOST = os.environ.get("EMAIL_AI_SMTP_HOST", "smtp.gmail.com")
+    PORT = int(os.environ.get("EMAIL_AI_SMTP_PORT", "587"))
+    STARTTLS = os.environ.get("EMAIL_AI_SMTP_STARTTLS", "1") == "1"
+    TIMEOUT = float(os.environ.get("EMAIL_AI_SMTP_TIMEOUT", "30"))
+    # Idle connections are closed after this long (servers drop them after a few minutes anyway)
+    IDLE_SECONDS = float(os.environ.get("EMAIL_AI_SMTP_IDLE_SECONDS", "120"))
+    # A connection idle longer than this gets a NOOP before it is reused
+    CHECK_AFTER_SECONDS = float(os.environ.get("EMAIL_AI_SMTP_CHECK_AFTER_SECONDS", "5"))
+    MAX_IDLE_PER_KEY = int(os.environ.get("EMAIL_AI_SMTP_MAX_IDLE", "4"))
+
+# A reused connection that fails with one of these was dropped by the server
+DROPPED = (smtplib.SMTPServerDisconnected, ConnectionError)
+
+def pool_key(host, port, user, password):
+    """Connections are only shared by callers that presented the same credentials"""
+    return host, port, user, hashlib.sha256(password.encode("utf-8")).hexdigest()
+
+# ============================================
+# POOL
+# ============================================
+class SmtpPool:
+    """Logged-in smtplib.SMTP connections keyed by server and user, reused across sends
+
+    ssl_context is used for STARTTLS (default: certificate-verifying context).
+    """
+
+    def __init__(self, idle_seconds=SmtpConfig.IDLE_SECONDS, check_after=SmtpConfig.CHECK_AFTER_SECONDS,
+                 max_idle_per_key=SmtpConfig.MAX_IDLE_PER_KEY, starttls=SmtpConfig.STARTTLS,
+                 timeout=SmtpConfig.TIMEOUT, ssl_context=None):
+        self.idle_seconds = idle_seconds
+        self.check_after = check_after
+        self.max_idle_per_key = max_idle_per_key
+        self.starttls = starttls
+        self.timeout = timeout
+        self.ssl_context = ssl_context or ssl.create_default_context()
+
+        self._idle = defaultdict(list)   # key -> [(connection, returned at)], most recent last
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self.counters = {"connects": 0, "reuses": 0, "health_checks": 0, "reconnects": 0, "evicted": 0}
+
+        self._reaper = threading.Thread(target=self._reap, name="smtp-pool-reaper", daemon=True)
+        self._reaper.start()
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def _connect(self, host, port, user, password):
+        with timed("smtp_connect"):
+            connection = smtplib.SMTP(host, port, timeout=self.timeout)
+            try:
+                if self.starttls:
+                    connection.starttls(context=self.ssl_context)
+                connection.login(user, password)
+            except Exception:
+                _close(connection)
+                raise
+        self._count("connects")
+        return connection
+
+    def _checkout(self, key):
+        """Most recently returned idle connection for key that still answers, or None"""
+        while True:
+            with self._lock:
+                if not self._idle[key]:
+                    return None
+                connection, returned = self._idle[key].pop()
+            if time.monotonic() - returned < self.check_after:
+                return connection
+            self._count("health_checks")
+            try:
+                if connection.noop()[0] == 250:
+                    return connection
+            except (smtplib.SMTPException, OSError):
+                pass
+            _close(connection)
+
+    def _checkin(self, key, connection):
+        with self._lock:
+            if not self._closed.is_set() and len(self._idle[key]) < self.max_idle_per_key:
+                self._idle[key].append((connection, time.monotonic()))
+                return
+        _close(connection)
+
+    def send_message(self, message, user, password, host=SmtpConfig.HOST, port=SmtpConfig.PORT):
+        """Send an email.message.Message, replacing a pooled connection the server has dropped"""
+        key = pool_key(host, port, user, password)
+        connection = self._checkout(key)
+        reused = connection is not None
+        if reused:
+            self._count("reuses")
+        else:
+            connection = self._connect(host, port, user, password)
+
+        try:
+            with timed("smtp_send"):
+                result = connection.send_message(message)
+        except DROPPED:
+            _close(connection)
+            if not reused:
+                raise
+            # The server dropped the idle connection between the health check and the send
+            logger.info(f"Pooled SMTP connection to {host}:{port} was dropped, reconnecting")
+            self._count("reconnects")
+            connection = self._connect(host, port, user, password)
+            try:
+                with timed("smtp_send"):
+                    result = connection.send_message(message)
+            except Exception:
+                _close(connection)
+                raise
+        except Exception:
+            _close(connection)
+            raise
+        self._checkin(key, connection)
+        return result
+
+    def evict_idle(self, max_idle=None):
+        """Close connections idle for longer than max_idle seconds (default idle_seconds)"""
+        max_idle = self.idle_seconds if max_idle is None else max_idle
+        cutoff = time.monotonic() - max_idle
+        expired = []
+        with self._lock:
+            for key in list(self._idle):
+                kept = [(c, returned) for c, returned in self._idle[key] if returned >= cutoff]
+                expired.extend(c for c, returned in self._idle[key] if returned < cutoff)
+                if kept:
+                    self._idle[key] = kept
+                else:
+                    del self._idle[key]
+            self.counters["evicted"] += len(expired)
+        for connection in expired:
+            _quit(connection)
+        return len(expired)
+
+    def _reap(self):
+        interval = max(1.0, self.idle_seconds / 4)
+        while not self._closed.wait(interval):
+            self.evict_idle()
+
+    def close(self):
+        """QUIT every idle connection and stop the reaper"""
+        self._closed.set()
+        self.evict_idle(max_idle=-1)
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, "idle": sum(len(idle) for idle in self._idle.values())}
+
+def _quit(connection):
+    try:
+        connection.quit()
+    except (smtplib.SMTPException, OSError):
+        _close(connection)
+
+def _close(connection):
+    try:
+        connection.close()
+    except OSError:
+        pass
@@ -0,0 +1,158 @@
+"""
+student_model.py - Hashed n-gram student distilled from DistilBERT, served as a cascade
+
+The student is a linear model over hashed word uni/bigrams and character
+n-grams (an EmbeddingBag with one output per label), so a prediction costs
+microseconds. CascadeClassifier lets it answer when its confidence clears a
+threshold calibrated against the teacher, and sends everything else to
+DistilBERT in one batch.
+"""
+
+import logging
+import math
+import os
+import re
+import zlib
+
+import torch
+from torch import nn
+
+from prediction_cache import model_fingerprint
+
+logger = logging.getLogger(__name__)
+
+NUM_BUCKETS = 2 ** 18
+CHAR_NGRAMS = (3, 4, 5)
+_WORD_RE = re.compile(r"\w+")
+
+# ============================================
+# FEATURES
+# ============================================
+def featurize(text, num_buckets=NUM_BUCKETS):
+    """Hashed feature ids of one text (crc32, so ids are stable across processes)"""
+    words = _WORD_RE.findall(text.lower())
+    features = [f"w:{word}" for word in words]
+    features += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"<{word}>"
+        for n in CHAR_NGRAMS:
+            features += [f"c:{padded[i:i + n]}" for i in range(len(padded) - n + 1)]
+    return [zlib.crc32(feature.encode("utf-8")) % num_buckets for feature in features]
+
+def encode_bags(feature_lists):
+    """Flat ids + offsets for EmbeddingBag from per-text feature id lists"""
+    offsets, ids = [], []
+    for features in feature_lists:
+        offsets.append(len(ids))
+        ids.extend(features)
+    return torch.tensor(ids, dtype=torch.long), torch.tensor(offsets, dtype=torch.long)
+
+# ============================================
+# MODEL
+# ============================================
+class HashedNgramStudent(nn.Module):
+    """Mean of per-feature label weights plus a bias: a linear model over hashed n-grams"""
+
+    def __init__(self, num_labels, num_buckets=NUM_BUCKETS):
+        super().__init__()
+        self.num_buckets = num_buckets
+        self.embedding = nn.EmbeddingBag(num_buckets, num_labels, mode="mean")
+        nn.init.zeros_(self.embedding.weight)
+        self.bias = nn.Parameter(torch.zeros(num_labels))
+
+    def forward(self, ids, offsets):
+        return self.embedding(ids, offsets) + self.bias
+
+    def predict_proba(self, texts):
+        """(N, C) probabilities for a list of texts"""
+        ids, offsets = encode_bags([featurize(text, self.num_buckets) for text in texts])
+        with torch.inference_mode():
+            return torch.softmax(self(ids, offsets), dim=-1)
+
+def save_student(path, student, labels, threshold, teacher_fingerprint, report=None):
+    """Write the student, its labels and calibrated threshold atomically"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    torch.save({
+        'state_dict': student.state_dict(),
+        'num_buckets': student.num_buckets,
+        'labels': list(labels),
+        'threshold': threshold,
+        'teacher_fingerprint': teacher_fingerprint,
+        'report': report or {},
+    }, tmp_path)
+    os.replace(tmp_path, path)
+
+def load_student(path):
+    """(student, artifact dict) from a file written by save_student()"""
+    artifact = torch.load(path, weights_only=False, map_location="cpu")
+    student = HashedNgramStudent(len(artifact['labels']), artifact['num_buckets'])
+    student.load_state_dict(artifact['state_dict'])
+    student.eval()
+    return student, artifact
+
+# ============================================
+# CASCADE
+# ============================================
+class CascadeClassifier:
+    """Student first; texts whose student confidence is below threshold go to the teacher
+
+    teacher_fn takes a list of texts and returns one probability list per text.
+    """
+
+    def __init__(self, student, threshold, teacher_fn, tag=""):
+        self.student = student
+        self.threshold = threshold
+        self.teacher_fn = teacher_fn
+        self.tag = tag
+        self.counters = {"student": 0, "escalated": 0}
+
+    def answer(self, texts):
+        """(student probability lists with None for escalated texts, indices of the escalated texts)"""
+        if not texts:
+            return [], []
+        probs = self.student.predict_proba(texts)
+        confident = (probs.max(dim=-1).values >= self.threshold).tolist()
+        results = [row if ok else None for row, ok in zip(probs.tolist(), confident)]
+        escalate = [i for i, ok in enumerate(confident) if not ok]
+        self.counters["escalated"] += len(escalate)
+        self.counters["student"] += len(texts) - len(escalate)
+        return results, escalate
+
+    def classify_texts(self, texts, teacher_fn=None):
+        """Probability lists in input order (teacher_fn overrides the default teacher for this call)"""
+        texts = list(texts)
+        results, escalate = self.answer(texts)
+        if escalate:
+            teacher_fn = teacher_fn or self.teacher_fn
+            for i, row in zip(escalate, teacher_fn([texts[i] for i in escalate])):
+                results[i] = list(row)
+        return results
+
+    def classify(self, text):
+        return self.classify_texts([text])[0]
+
+    def stats(self):
+        total = self.counters["student"] + self.counters["escalated"]
+        return {**self.counters, "escalation_rate": self.counters["escalated"] / total if total else 0.0}
+
+def load_cascade(path, labels, teacher_fingerprint, teacher_fn, threshold=None):
+    """CascadeClassifier over the student at path, or None when it is missing or was not
+    distilled from this teacher"""
+    if not path or not os.path.exists(path):
+        return None
+    student, artifact = load_student(path)
+    if list(artifact['labels']) != list(labels):
+        logger.warning(f"Student {path} has labels {artifact['labels']}, teacher has {list(labels)}; cascade off")
+        return None
+    if artifact['teacher_fingerprint'] != teacher_fingerprint:
+        logger.warning(f"Student {path} was distilled from another checkpoint; cascade off "
+                       f"(re-run distill_student.py)")
+        return None
+    threshold = artifact['threshold'] if threshold is None else threshold
+    if math.isinf(threshold):
+        logger.warning(f"Student {path} never reached its target agreement; cascade off")
+        return None
+    tag = f"student-{model_fingerprint(path)[:12]}-{threshold:.3f}"
+    logger.info(f"Cascade on: student answers at confidence >= {threshold:.3f}")
+    return CascadeClassifier(student, threshold, teacher_fn, tag)
@@ -0,0 +1,133 @@
+"""
+token_cache.py - Content-addressed SQLite cache of token ids across data-prep runs
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = "./dataset_splits/token_cache.sqlite"
+LOOKUP_BATCH = 500     # keys per SELECT, well under SQLite's bound-variable limit
+
+# ============================================
+# KEY HELPERS
+# ============================================
+def tokenizer_identity(tokenizer_dir, tokenizer_class, options):
+    """Hash of the saved tokenizer files, its class and the tokenizer call options (incl. max_length)"""
+    digest = hashlib.sha256()
+    digest.update(tokenizer_class.encode("utf-8"))
+    digest.update(json.dumps(options, sort_keys=True).encode("utf-8"))
+    for name in sorted(os.listdir(tokenizer_dir)):
+        digest.update(name.encode("utf-8"))
+        with open(os.path.join(tokenizer_dir, name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+# ============================================
+# CACHE
+# ============================================
+class CachedChunk:
+    """One chunk whose cache misses are being tokenized; result() merges both in input order"""
+
+    def __init__(self, cache, keys, found, missing_keys, pending):
+        self.cache = cache
+        self.keys = keys
+        self.found = found
+        self.missing_keys = missing_keys
+        self.pending = pending
+
+    def result(self):
+        rows = dict(self.found)
+        if self.pending is not None:
+            input_ids, attention_mask = self.pending.result()
+            new_rows = list(zip(self.missing_keys, input_ids, attention_mask))
+            self.cache.put_many(new_rows)
+            rows.update((key, (ids, mask)) for key, ids, mask in new_rows)
+
+        recomputed = len(self.missing_keys)
+        self.cache.counters["recomputed"] += recomputed
+        self.cache.counters["reused"] += len(self.keys) - recomputed
+        return [rows[key][0] for key in self.keys], [rows[key][1] for key in self.keys]
+
+class TokenCache:
+    """Token ids keyed by sha256(tokenizer identity | text)
+
+    Any change to the tokenizer files or options (e.g. MAX_LENGTH) changes
+    every key, so stale ids are never reused. Each run stamps the rows it
+    uses; prune() then drops rows the current input no longer contains.
+    """
+
+    def __init__(self, identity, db_path=DEFAULT_DB_PATH):
+        self.identity = identity
+        self.counters = {"reused": 0, "recomputed": 0}
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._db = sqlite3.connect(db_path, timeout=30)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS tokens (
+                key TEXT PRIMARY KEY,
+                input_ids BLOB NOT NULL,
+                attention_mask BLOB NOT NULL,
+                last_run INTEGER NOT NULL
+            )
+        """)
+        self.run_id = (self._db.execute("SELECT MAX(last_run) FROM tokens").fetchone()[0] or 0) + 1
+
+    def key(self, text):
+        return hashlib.sha256(f"{self.identity}|{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys):
+        """{key: (input_ids, attention_mask)} for the keys already cached, stamped as used by this run"""
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        for i in range(0, len(unique), LOOKUP_BATCH):
+            batch = unique[i:i + LOOKUP_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            for key, ids, mask in self._db.execute(
+                f"SELECT key, input_ids, attention_mask FROM tokens WHERE key IN ({placeholders})", batch
+            ):
+                found[key] = (np.frombuffer(ids, dtype=np.int32), np.frombuffer(mask, dtype=np.int8))
+            self._db.execute(f"UPDATE tokens SET last_run = ? WHERE key IN ({placeholders})",
+                             [self.run_id] + batch)
+        self._db.commit()
+        return found
+
+    def put_many(self, rows):
+        """Store (key, input_ids, attention_mask) rows"""
+        self._db.executemany(
+            "INSERT OR REPLACE INTO tokens VALUES (?, ?, ?, ?)",
+            [(key, np.asarray(ids, dtype=np.int32).tobytes(), np.asarray(mask, dtype=np.int8).tobytes(),
+              self.run_id) for key, ids, mask in rows]
+        )
+        self._db.commit()
+
+    def submit(self, texts, tokenizer_pool):
+        """Look texts up and send only the misses (once each) to tokenizer_pool"""
+        keys = [self.key(text) for text in texts]
+        found = self.get_many(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        pending = tokenizer_pool.submit(list(missing.values())) if missing else None
+        return CachedChunk(self, keys, found, list(missing), pending)
+
+    def prune(self):
+        """Drop rows this run did not use (emails removed from the input, or an older tokenizer)"""
+        removed = self._db.execute("DELETE FROM tokens WHERE last_run < ?", (self.run_id,)).rowcount
+        self._db.commit()
+        if removed:
+            self._db.execute("VACUUM")
+        return removed
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,260 @@
+"""
+token_shards.py - Tokenized splits stored as memory-mapped .npy shards
+
+A split directory holds meta.json plus, per shard, four flat arrays:
+  <shard>.input_ids.npy       int32, every row's tokens back to back
+  <shard>.attention_mask.npy  int8, same layout as input_ids
+  <shard>.offsets.npy         int64, rows + 1 entries; row i is [offsets[i], offsets[i + 1])
+  <shard>.labels.npy          int64, one per row
+Rows are stored unpadded. Opening a split only maps the files, so it takes
+the same time however large the split is, and every item is a zero-copy
+slice of the mapping. LengthBucketBatchSampler and PadCollator turn items
+into batches padded only to their own longest row.
+"""
+
+import itertools
+import json
+import os
+import shutil
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset, Sampler
+
+SHARD_FORMAT = "token-shards"
+SHARD_VERSION = 2
+META_FILE = "meta.json"
+ARRAYS = ("input_ids", "attention_mask", "offsets", "labels")
+
+def read_split_meta(split_dir):
+    with open(os.path.join(split_dir, META_FILE)) as f:
+        meta = json.load(f)
+    if meta.get("format") != SHARD_FORMAT or meta.get("version") != SHARD_VERSION:
+        raise ValueError(f"{split_dir} is not a v{SHARD_VERSION} token-shard split, "
+                         f"re-run prepare_dataloader_final.py")
+    return meta
+
+def _flatten(rows, dtype):
+    total = sum(len(row) for row in rows)
+    return np.fromiter(itertools.chain.from_iterable(rows), dtype=dtype, count=total)
+
+# ============================================
+# WRITER
+# ============================================
+class ShardWriter:
+    """Write one tokenized split, one shard per write() call
+
+    Shards go to a temporary directory that replaces split_dir only once the
+    whole split is written, so a failed run never leaves a half-written split.
+    """
+
+    def __init__(self, split_dir, max_length, pad_token_id):
+        self.split_dir = split_dir
+        self.tmp_dir = split_dir + ".tmp"
+        self.max_length = max_length
+        self.pad_token_id = pad_token_id
+        self.shards = []
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        os.makedirs(self.tmp_dir)
+
+    @property
+    def num_rows(self):
+        return sum(shard["rows"] for shard in self.shards)
+
+    def write(self, input_ids, attention_mask, labels):
+        """Append a shard from per-row token lists (rows may have different lengths)"""
+        name = f"shard-{len(self.shards):05d}"
+        offsets = np.zeros(len(input_ids) + 1, dtype=np.int64)
+        np.cumsum([len(row) for row in input_ids], out=offsets[1:])
+        arrays = {
+            "input_ids": _flatten(input_ids, np.int32),
+            "attention_mask": _flatten(attention_mask, np.int8),
+            "offsets": offsets,
+            "labels": np.asarray(labels, dtype=np.int64),
+        }
+        for key, array in arrays.items():
+            np.save(os.path.join(self.tmp_dir, f"{name}.{key}.npy"), array)
+        self.shards.append({"name": name, "rows": len(labels), "tokens": int(offsets[-1])})
+
+    def close(self):
+        meta = {
+            "format": SHARD_FORMAT,
+            "version": SHARD_VERSION,
+            "max_length": self.max_length,
+            "pad_token_id": self.pad_token_id,
+            "num_rows": self.num_rows,
+            "shards": self.shards,
+        }
+        with open(os.path.join(self.tmp_dir, META_FILE), "w") as f:
+            json.dump(meta, f, indent=2)
+        shutil.rmtree(self.split_dir, ignore_errors=True)
+        os.replace(self.tmp_dir, self.split_dir)
+
+# ============================================
+# DATASET
+# ============================================
+class TokenShardDataset(Dataset):
+    """Map-style dataset over a token-shard split; items are views into the mapped files
+
+    Items have their own length; input_ids stay int32 and attention_mask
+    int8 as stored, and PadCollator pads and casts whole batches at once.
+    """
+
+    def __init__(self, split_dir):
+        self.split_dir = split_dir
+        self.meta = read_split_meta(split_dir)
+        self.starts = np.cumsum([0] + [shard["rows"] for shard in self.meta["shards"]])
+        self._shards = None
+
+    def _open(self):
+        # Mapped lazily so DataLoader workers map the files themselves instead
+        # of receiving pickled copies of the arrays; 'c' keeps slices writable
+        self._shards = [
+            {key: np.load(os.path.join(self.split_dir, f"{shard['name']}.{key}.npy"), mmap_mode="c")
+             for key in ARRAYS}
+            for shard in self.meta["shards"]
+        ]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_shards"] = None
+        return state
+
+    def __len__(self):
+        return int(self.starts[-1])
+
+    @property
+    def pad_token_id(self):
+        return self.meta["pad_token_id"]
+
+    def lengths(self):
+        """Token count of every row, read from the offsets alone"""
+        if self._shards is None:
+            self._open()
+        return np.concatenate([np.diff(shard["offsets"]) for shard in self._shards])
+
+    def __getitem__(self, idx):
+        if self._shards is None:
+            self._open()
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        shard_idx = int(np.searchsorted(self.starts, idx, side="right")) - 1
+        shard = self._shards[shard_idx]
+        row = idx - self.starts[shard_idx]
+        start, end = shard["offsets"][row], shard["offsets"][row + 1]
+        return {
+            "input_ids": torch.from_numpy(shard["input_ids"][start:end]),
+            "attention_mask": torch.from_numpy(shard["attention_mask"][start:end]),
+            "labels": torch.from_numpy(shard["labels"][row:row + 1])[0],
+        }
+
+# ============================================
+# BATCHING
+# ============================================
+class LengthBucketBatchSampler(Sampler):
+    """Batches of similar-length rows, in a new random order every epoch
+
+    Each epoch shuffles all rows, cuts them into pools of
+    batch_size * pool_batches rows, sorts each pool by length and slices it
+    into batches, then shuffles the order of all batches. Batch contents and
+    order both change between epochs while rows in a batch stay close in
+    length. With shuffle=False (evaluation) rows are batched in length order.
+    """
+
+    def __init__(self, lengths, batch_size, shuffle=True, pool_batches=50, drop_last=False, seed=42):
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.pool_size = batch_size * pool_batches
+        self.drop_last = drop_last
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        """Reseed the shuffle, so a resumed run replays the same epoch order"""
+        self.epoch = epoch
+
+    def _pool_sizes(self):
+        total = len(self.lengths)
+        if not self.shuffle:
+            return [total]
+        sizes = [self.pool_size] * (total // self.pool_size)
+        if total % self.pool_size:
+            sizes.append(total % self.pool_size)
+        return sizes
+
+    def batches(self):
+        """This epoch's batches as arrays of row indices"""
+        rng = np.random.default_rng(self.seed + self.epoch)
+        if self.shuffle:
+            order = rng.permutation(len(self.lengths))
+            pools = [order[i:i + self.pool_size] for i in range(0, len(order), self.pool_size)]
+        else:
+            pools = [np.arange(len(self.lengths))]
+
+        batches = []
+        for pool in pools:
+            pool = pool[np.argsort(self.lengths[pool], kind="stable")]
+            batches.extend(pool[i:i + self.batch_size] for i in range(0, len(pool), self.batch_size))
+        if self.drop_last:
+            batches = [batch for batch in batches if len(batch) == self.batch_size]
+        if self.shuffle:
+            batches = [batches[i] for i in rng.permutation(len(batches))]
+        return batches
+
+    def __iter__(self):
+        for batch in self.batches():
+            yield batch.tolist()
+
+    def __len__(self):
+        if self.drop_last:
+            return sum(size // self.batch_size for size in self._pool_sizes())
+        return sum(-(-size // self.batch_size) for size in self._pool_sizes())
+
+class PadCollator:
+    """Pad a list of dataset items to the longest row in that batch and cast to int64"""
+
+    def __init__(self, pad_token_id, pad_to_multiple_of=None):
+        self.pad_token_id = pad_token_id
+        self.pad_to_multiple_of = pad_to_multiple_of
+
+    def __call__(self, items):
+        longest = max(len(item["input_ids"]) for item in items)
+        if self.pad_to_multiple_of:
+            longest = -(-longest // self.pad_to_multiple_of) * self.pad_to_multiple_of
+
+        input_ids = torch.full((len(items), longest), self.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(items), longest), dtype=torch.long)
+        for row, item in enumerate(items):
+            length = len(item["input_ids"])
+            input_ids[row, :length] = item["input_ids"]
+            attention_mask[row, :length] = item["attention_mask"]
+        return {
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+            "labels": torch.stack([item["labels"] for item in items]),
+        }
+
+def padding_waste(lengths, batches):
+    """Fraction of the tokens fed to the model that are padding, each batch padded to its longest row"""
+    lengths = np.asarray(lengths)
+    real = padded = 0
+    for batch in batches:
+        batch_lengths = lengths[batch]
+        real += int(batch_lengths.sum())
+        padded += int(batch_lengths.max()) * len(batch)
+    return 1 - real / padded if padded else 0.0
+
+def padding_report(lengths, batch_size, seed=42):
+    """Padding waste of the old whole-split padding vs per-batch padding, shuffled and bucketed"""
+    lengths = np.asarray(lengths)
+    order = np.random.default_rng(seed).permutation(len(lengths))
+    random_batches = [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+    return {
+        "padded to longest in split": padding_waste(lengths, [np.arange(len(lengths))]),
+        "shuffled, per-batch padding": padding_waste(lengths, random_batches),
+        "length-bucketed batches": padding_waste(
+            lengths, LengthBucketBatchSampler(lengths, batch_size, seed=seed).batches()),
+    }
@@ -0,0 +1,195 @@
+"""
+train_early_exit.py - Train early-exit heads against the final layer and report the speed/accuracy trade-off
+The base model stays frozen; each head learns to match the final layer's
+probabilities from the [CLS] vector after its layer. The report covers
+several thresholds on the validation split: mean layers executed, latency
+per email and accuracy next to full-depth inference.
+Run: python train_early_exit.py --train dataset_splits/train.xlsx --val dataset_splits/validation.xlsx
+"""
+
+import argparse
+import logging
+import statistics
+import time
+
+import torch
+import torch.nn.functional as F
+
+from batch_inference import pad_batch, tokenize_texts
+from bench_utils import load_heldout
+from distill_student import resolve_teacher
+from early_exit import EarlyExitBackend, ExitHeads, cls_states, load_heads, save_heads
+from inference_backends import EagerBackend
+from model_bundle import load_tokenizer, source_fingerprint
+from model_loader import InferenceConfig, load_fp32_model
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# ============================================
+# CONFIGURATION
+# ============================================
+class EarlyExitConfig:
+    TRAIN_FILE = "dataset_splits/train.xlsx"
+    VAL_FILE = "dataset_splits/validation.xlsx"
+    TEACHER_CHECKPOINT = "ultra_fast_model.pt"
+    MAX_LENGTH = 64
+    EPOCHS = 10
+    BATCH_SIZE = 32
+    LEARNING_RATE = 1e-3
+    THRESHOLDS = [0.8, 0.9, 0.95, 0.99]
+    LATENCY_SAMPLES = 200
+    SEED = 42
+
+# ============================================
+# TRAINING
+# ============================================
+def collect_states(model, input_ids, pad_token_id, batch_size):
+    """Per-layer [CLS] vectors (layers, N, dim) and final-layer probabilities (N, C) for every row"""
+    layer_states, final_probs = [], []
+    with torch.inference_mode():
+        for start in range(0, len(input_ids), batch_size):
+            ids, mask = pad_batch(input_ids[start:start + batch_size], pad_token_id)
+            states, logits = cls_states(model, ids, mask)
+            layer_states.append(torch.stack(states))
+            final_probs.append(torch.softmax(logits.float(), dim=-1))
+    return torch.cat(layer_states, dim=1), torch.cat(final_probs)
+
+def train_heads(layer_states, final_probs, args):
+    """Fit every head to the final layer's probabilities (KL), base model untouched"""
+    torch.manual_seed(args.seed)
+    num_layers, rows, dim = layer_states.shape
+    heads = ExitHeads(dim, final_probs.shape[1], num_layers)
+    optimizer = torch.optim.AdamW(heads.parameters(), lr=args.lr)
+
+    for epoch in range(args.epochs):
+        order = torch.randperm(rows)
+        total_loss = 0.0
+        for start in range(0, rows, args.batch_size):
+            batch = order[start:start + args.batch_size]
+            loss = sum(
+                F.kl_div(F.log_softmax(heads(layer, layer_states[layer, batch]), dim=-1),
+                         final_probs[batch], reduction="batchmean")
+                for layer in range(num_layers - 1)
+            )
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total_loss += loss.item() * len(batch)
+        logger.info(f"epoch {epoch + 1}/{args.epochs} | summed head loss {total_loss / rows:.4f}")
+
+    heads.eval()
+    return heads
+
+# ============================================
+# REPORT
+# ============================================
+def run_one_by_one(fn, input_ids, pad_token_id):
+    """(predictions, mean ms per email) calling fn on one email at a time, as the app does"""
+    predictions, latencies = [], []
+    with torch.inference_mode():
+        fn(*pad_batch(input_ids[:1], pad_token_id))   # warm-up
+        for ids in input_ids:
+            start = time.perf_counter()
+            logits = fn(*pad_batch([ids], pad_token_id))
+            latencies.append((time.perf_counter() - start) * 1000)
+            predictions.append(int(logits.argmax(-1)))
+    return torch.tensor(predictions), statistics.mean(latencies)
+
+def build_report(model, heads, input_ids, labels, pad_token_id, thresholds, latency_samples, batch_size):
+    """One row per threshold plus the full-depth reference"""
+    full_depth = EagerBackend(model)
+    with torch.inference_mode():
+        full_pred = torch.cat([
+            full_depth(*pad_batch(input_ids[start:start + batch_size], pad_token_id)).argmax(-1)
+            for start in range(0, len(input_ids), batch_size)
+        ])
+    _, full_ms = run_one_by_one(full_depth, input_ids[:latency_samples], pad_token_id)
+    known = labels >= 0
+
+    def accuracy(pred):
+        return (pred[known] == labels[known]).float().mean().item() if known.any() else float("nan")
+
+    report = {"full_depth": {"layers": model.config.n_layers, "accuracy": accuracy(full_pred), "ms": full_ms},
+              "thresholds": []}
+    for threshold in thresholds:
+        backend = EarlyExitBackend(model, heads, threshold)
+        with torch.inference_mode():
+            batches = [backend.forward_with_exits(*pad_batch(input_ids[start:start + batch_size], pad_token_id))
+                       for start in range(0, len(input_ids), batch_size)]
+        pred = torch.cat([logits.argmax(-1) for logits, _ in batches])
+        layers = torch.cat([layers for _, layers in batches]).float()
+        _, exit_ms = run_one_by_one(backend, input_ids[:latency_samples], pad_token_id)
+        report["thresholds"].append({
+            "threshold": threshold,
+            "mean_layers": layers.mean().item(),
+            "accuracy": accuracy(pred),
+            "agreement": (pred == full_pred).float().mean().item(),
+            "ms": exit_ms,
+            "latency_saved_ms": full_ms - exit_ms,
+        })
+    return report
+
+def print_report(report, rows):
+    full = report["full_depth"]
+    print(f"\n📊 Early exit on {rows} validation emails "
+          f"(full depth: {full['layers']} layers, {full['accuracy']:.1%} accuracy, {full['ms']:.2f} ms/email)")
+    print(f"{'threshold':>10}{'mean layers':>13}{'accuracy':>10}{'agreement':>11}{'ms/email':>10}{'saved':>9}")
+    for row in report["thresholds"]:
+        print(f"{row['threshold']:>10.2f}{row['mean_layers']:>13.2f}{row['accuracy']:>10.1%}"
+              f"{row['agreement']:>11.1%}{row['ms']:>10.2f}{row['latency_saved_ms'] / full['ms']:>9.0%}")
+
+# ============================================
+# MAIN
+# ============================================
+def main():
+    parser = argparse.ArgumentParser(description="Train early-exit heads and report layers/latency/accuracy")
+    parser.add_argument("--train", default=EarlyExitConfig.TRAIN_FILE)
+    parser.add_argument("--val", default=EarlyExitConfig.VAL_FILE)
+    parser.add_argument("--teacher", default=EarlyExitConfig.TEACHER_CHECKPOINT,
+                        help="Model bundle or legacy checkpoint to add heads to")
+    parser.add_argument("--from-hub", action="store_true",
+                        help="Use the bundle simple.py serves (Hugging Face cache) instead of --teacher")
+    parser.add_argument("--out", default=InferenceConfig.EARLY_EXIT_PATH)
+    parser.add_argument("--report-only", action="store_true", help="Skip training and report on --out")
+    parser.add_argument("--limit", type=int, default=None, help="Only use the first N training rows")
+    parser.add_argument("--epochs", type=int, default=EarlyExitConfig.EPOCHS)
+    parser.add_argument("--batch-size", type=int, default=EarlyExitConfig.BATCH_SIZE)
+    parser.add_argument("--lr", type=float, default=EarlyExitConfig.LEARNING_RATE)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=EarlyExitConfig.THRESHOLDS)
+    parser.add_argument("--latency-samples", type=int, default=EarlyExitConfig.LATENCY_SAMPLES)
+    parser.add_argument("--seed", type=int, default=EarlyExitConfig.SEED)
+    args = parser.parse_args()
+
+    source = resolve_teacher(args)
+    model, encoder = load_fp32_model(source)
+    tokenizer = load_tokenizer(source)
+    classes = list(encoder.classes_)
+
+    val_texts, val_labels = load_heldout(args.val)
+    val_ids = tokenize_texts(tokenizer, val_texts, EarlyExitConfig.MAX_LENGTH)
+    index = {label: i for i, label in enumerate(classes)}
+    val_targets = torch.tensor([index.get(label, -1) for label in val_labels])
+
+    if args.report_only:
+        heads, _ = load_heads(args.out)
+    else:
+        train_texts, _ = load_heldout(args.train, limit=args.limit)
+        logger.info(f"Collecting [CLS] states of {len(train_texts)} training emails...")
+        layer_states, final_probs = collect_states(
+            model, tokenize_texts(tokenizer, train_texts, EarlyExitConfig.MAX_LENGTH),
+            tokenizer.pad_token_id, args.batch_size
+        )
+        heads = train_heads(layer_states, final_probs, args)
+
+    report = build_report(model, heads, val_ids, val_targets, tokenizer.pad_token_id,
+                          args.thresholds, args.latency_samples, args.batch_size)
+    print_report(report, len(val_ids))
+
+    if not args.report_only:
+        save_heads(args.out, heads, classes, source_fingerprint(source), report)
+        print(f"\n✅ Heads saved to {args.out} (pick the threshold with EMAIL_AI_EARLY_EXIT_THRESHOLD, "
+              f"default {InferenceConfig.EARLY_EXIT_THRESHOLD})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+train_model.py - Fine-tune DistilBERT on the token shards written by prepare_dataloader_final.py
+Built for CPU throughput: length-bucketed batches, bf16 autocast, gradient
+accumulation, multi-worker loading and a fixed intra-op thread count.
+Writes ultra_fast_model.pt ({'model_state_dict', 'label_encoder'}), the
+layout load_legacy_checkpoint() / build_bundle.py read.
+Run: python train_model.py --epochs 3 --threads 8 --bf16 [--resume]
+"""
+
+import argparse
+import logging
+import math
+import os
+import pickle
+import time
+
+import torch
+from torch.utils.data import DataLoader
+from transformers import (DistilBertForSequenceClassification, DistilBertTokenizer,
+                          get_linear_schedule_with_warmup)
+
+from model_bundle import BundleConfig
+from token_shards import LengthBucketBatchSampler, PadCollator, TokenShardDataset
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# ============================================
+# CONFIGURATION
+# ============================================
+class TrainConfig:
+    DATA_DIR = "dataset_splits"
+    BASE_MODEL = BundleConfig.BASE_MODEL
+    OUTPUT_PATH = "ultra_fast_model.pt"
+    CHECKPOINT_PATH = "training_checkpoints/last.pt"
+    EPOCHS = 3
+    BATCH_SIZE = 16
+    ACCUMULATE_STEPS = 1       # optimizer step every N batches
+    LEARNING_RATE = 5e-5
+    WEIGHT_DECAY = 0.01
+    WARMUP_RATIO = 0.1
+    NUM_WORKERS = 2            # DataLoader worker processes
+    THREADS = os.cpu_count() or 1
+    CHECKPOINT_EVERY = 200     # optimizer steps
+    LOG_EVERY = 20             # optimizer steps
+    SEED = 42
+
+def _new_window():
+    """Counters for the samples/sec and time-per-step log lines"""
+    return {"start": time.perf_counter(), "steps": 0, "batches": 0, "samples": 0, "loss": 0.0}
+
+def _worker_init(worker_id):
+    # Loader workers only slice mmap'd shards; keep their torch pools out of the trainer's way
+    torch.set_num_threads(1)
+
+# ============================================
+# CHECKPOINTS
+# ============================================
+def save_training_state(path, model, optimizer, scheduler, label_encoder, epoch, batches_done, global_step):
+    """Everything needed to resume mid-epoch, written atomically"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    torch.save({
+        'model_state_dict': model.state_dict(),
+        'label_encoder': label_encoder,
+        'optimizer_state_dict': optimizer.state_dict(),
+        'scheduler_state_dict': scheduler.state_dict(),
+        'epoch': epoch,
+        'batches_done': batches_done,
+        'global_step': global_step,
+        'rng_state': torch.get_rng_state(),
+    }, tmp_path)
+    os.replace(tmp_path, path)
+
+def save_final_model(path, model, label_encoder):
+    """The inference checkpoint layout: model_state_dict + label_encoder"""
+    tmp_path = path + ".tmp"
+    torch.save({'model_state_dict': model.state_dict(), 'label_encoder': label_encoder}, tmp_path)
+    os.replace(tmp_path, path)
+
+# ============================================
+# EVALUATION
+# ============================================
+def evaluate(model, dataset, batch_size, bf16):
+    """(mean loss, accuracy) over a split, batched in length order"""
+    loader = DataLoader(
+        dataset,
+        batch_sampler=LengthBucketBatchSampler(dataset.lengths(), batch_size * 2, shuffle=False),
+        collate_fn=PadCollator(dataset.pad_token_id)
+    )
+    model.eval()
+    total_loss, correct, seen = 0.0, 0, 0
+    with torch.inference_mode(), torch.autocast("cpu", dtype=torch.bfloat16, enabled=bf16):
+        for batch in loader:
+            outputs = model(**batch)
+            total_loss += outputs.loss.float().item() * len(batch["labels"])
+            correct += (outputs.logits.argmax(-1) == batch["labels"]).sum().item()
+            seen += len(batch["labels"])
+    model.train()
+    return total_loss / max(seen, 1), correct / max(seen, 1)
+
+# ============================================
+# TRAINING
+# ============================================
+def train(args):
+    torch.manual_seed(args.seed)
+    torch.set_num_threads(args.threads)
+
+    train_dataset = TokenShardDataset(os.path.join(args.data_dir, "train_tokens"))
+    val_dataset = TokenShardDataset(os.path.join(args.data_dir, "val_tokens"))
+    with open(os.path.join(args.data_dir, "label_encoder.pkl"), "rb") as f:
+        label_encoder = pickle.load(f)
+
+    model = DistilBertForSequenceClassification.from_pretrained(
+        args.base_model,
+        num_labels=len(label_encoder.classes_)
+    )
+    tokenizer = DistilBertTokenizer.from_pretrained(os.path.join(args.data_dir, "tokenizer"))
+    if len(tokenizer) != model.config.vocab_size:
+        raise ValueError(f"Data was tokenized with a {len(tokenizer)}-token vocabulary but {args.base_model} "
+                         f"has {model.config.vocab_size}; re-run prepare_dataloader_final.py")
+    model.train()
+
+    sampler = LengthBucketBatchSampler(train_dataset.lengths(), args.batch_size, seed=args.seed)
+    steps_per_epoch = math.ceil(len(sampler) / args.accumulate)
+    total_steps = steps_per_epoch * args.epochs
+
+    no_decay = ("bias", "LayerNorm.weight")
+    optimizer = torch.optim.AdamW([
+        {"params": [p for n, p in model.named_parameters() if not n.endswith(no_decay)],
+         "weight_decay": args.weight_decay},
+        {"params": [p for n, p in model.named_parameters() if n.endswith(no_decay)],
+         "weight_decay": 0.0},
+    ], lr=args.lr)
+    scheduler = get_linear_schedule_with_warmup(optimizer, int(total_steps * TrainConfig.WARMUP_RATIO), total_steps)
+
+    start_epoch, batches_done, global_step = 0, 0, 0
+    if args.resume and os.path.exists(args.checkpoint):
+        state = torch.load(args.checkpoint, weights_only=False, map_location="cpu")
+        model.load_state_dict(state['model_state_dict'])
+        optimizer.load_state_dict(state['optimizer_state_dict'])
+        scheduler.load_state_dict(state['scheduler_state_dict'])
+        torch.set_rng_state(state['rng_state'])
+        start_epoch, batches_done, global_step = state['epoch'], state['batches_done'], state['global_step']
+        logger.info(f"Resumed from {args.checkpoint}: epoch {start_epoch + 1}, batch {batches_done}, "
+                    f"step {global_step}")
+
+    # Pinned host memory only pays off when batches are copied to an accelerator
+    pin_memory = torch.cuda.is_available()
+    logger.info(f"Training on {len(train_dataset)} rows, {steps_per_epoch} steps/epoch, "
+                f"batch {args.batch_size} x {args.accumulate} accumulation, {args.threads} threads, "
+                f"bf16={'on' if args.bf16 else 'off'}, {args.workers} loader workers")
+
+    for epoch in range(start_epoch, args.epochs):
+        sampler.set_epoch(epoch)
+        # Same order as an uninterrupted run; a resumed epoch skips the batches already trained
+        batches = [batch.tolist() for batch in sampler.batches()][batches_done:]
+        loader = DataLoader(
+            train_dataset,
+            batch_sampler=batches,
+            collate_fn=PadCollator(train_dataset.pad_token_id),
+            num_workers=args.workers,
+            pin_memory=pin_memory,
+            prefetch_factor=4 if args.workers else None,
+            worker_init_fn=_worker_init,
+            # Own generator: creating the loader must not advance the global (dropout) RNG,
+            # or a resumed run would diverge from an uninterrupted one
+            generator=torch.Generator().manual_seed(args.seed + epoch)
+        )
+
+        window = _new_window()
+        for i, batch in enumerate(loader):
+            with torch.autocast("cpu", dtype=torch.bfloat16, enabled=args.bf16):
+                loss = model(**batch).loss
+            (loss / args.accumulate).backward()
+            batches_done += 1
+            window["batches"] += 1
+            window["samples"] += len(batch["labels"])
+            window["loss"] += loss.float().item()
+
+            if batches_done % args.accumulate and i + 1 < len(batches):
+                continue
+            torch.nn.utils.clip_grad_norm_(model.parameters(), 1.0)
+            optimizer.step()
+            scheduler.step()
+            optimizer.zero_grad(set_to_none=True)
+            global_step += 1
+            window["steps"] += 1
+
+            if global_step % args.log_every == 0:
+                elapsed = time.perf_counter() - window["start"]
+                logger.info(f"epoch {epoch + 1} step {global_step}/{total_steps} | "
+                            f"loss {window['loss'] / window['batches']:.4f} | "
+                            f"{window['samples'] / elapsed:.1f} samples/s | {elapsed / window['steps']:.3f} s/step")
+                window = _new_window()
+
+            if global_step % args.checkpoint_every == 0:
+                save_training_state(args.checkpoint, model, optimizer, scheduler, label_encoder,
+                                    epoch, batches_done, global_step)
+                logger.info(f"💾 Checkpoint saved at step {global_step}")
+
+        batches_done = 0
+        val_loss, val_accuracy = evaluate(model, val_dataset, args.batch_size, args.bf16)
+        logger.info(f"✅ Epoch {epoch + 1}: val loss {val_loss:.4f}, val accuracy {val_accuracy:.2%}")
+        save_training_state(args.checkpoint, model, optimizer, scheduler, label_encoder,
+                            epoch + 1, 0, global_step)
+
+    save_final_model(args.output, model, label_encoder)
+    logger.info(f"✅ Model saved to {args.output}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Fine-tune the email intent classifier")
+    parser.add_argument("--data-dir", default=TrainConfig.DATA_DIR)
+    parser.add_argument("--base-model", default=TrainConfig.BASE_MODEL)
+    parser.add_argument("--output", default=TrainConfig.OUTPUT_PATH)
+    parser.add_argument("--checkpoint", default=TrainConfig.CHECKPOINT_PATH)
+    parser.add_argument("--resume", action="store_true", help="Continue from --checkpoint if it exists")
+    parser.add_argument("--epochs", type=int, default=TrainConfig.EPOCHS)
+    parser.add_argument("--batch-size", type=int, default=TrainConfig.BATCH_SIZE)
+    parser.add_argument("--accumulate", type=int, default=TrainConfig.ACCUMULATE_STEPS)
+    parser.add_argument("--lr", type=float, default=TrainConfig.LEARNING_RATE)
+    parser.add_argument("--weight-decay", type=float, default=TrainConfig.WEIGHT_DECAY)
+    parser.add_argument("--workers", type=int, default=TrainConfig.NUM_WORKERS)
+    parser.add_argument("--threads", type=int, default=TrainConfig.THREADS, help="torch intra-op threads")
+    parser.add_argument("--bf16", action="store_true", help="bf16 autocast (fp32 master weights)")
+    parser.add_argument("--checkpoint-every", type=int, default=TrainConfig.CHECKPOINT_EVERY)
+    parser.add_argument("--log-every", type=int, default=TrainConfig.LOG_EVERY)
+    parser.add_argument("--seed", type=int, default=TrainConfig.SEED)
+    train(parser.parse_args())
+
+if __name__ == "__main__":
+    main()
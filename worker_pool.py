@@ -0,0 +1,188 @@
+"""
+worker_pool.py - Forked inference workers that share one copy of the model weights
+
+The parent loads the model once and forks N workers. Forked children see the
+parent's memory copy-on-write (and mmap'd bundle weights are shared through
+the page cache anyway), so each extra worker costs only its own activations
+and interpreter state. Requests reach the workers through a shared queue.
+"""
+
+import gc
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing.connection import wait
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 64     # texts sent to one worker at a time
+DEFAULT_MAX_LENGTH = 64
+DEFAULT_MAX_TOKENS = 4096   # padded tokens per forward pass, as in batch_inference
+
+class WorkerDied(RuntimeError):
+    """A worker exited while the pool was running (OOM kill, segfault, ...); the pool is closed"""
+
+# ============================================
+# WORKER
+# ============================================
+def _worker_main(worker_id, model, tokenizer, requests, results, threads, long_input):
+    """Inference loop run in each forked child"""
+    import torch
+    from batch_inference import classify_texts
+
+    # Each worker gets its own small intra-op pool instead of all fighting for every core
+    torch.set_num_threads(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+    while True:
+        item = requests.get()
+        if item is None:
+            break
+        request_id, texts, max_length, max_tokens = item
+        try:
+            probs = classify_texts(model, tokenizer, texts, max_tokens=max_tokens, max_length=max_length,
+                                   long_input=long_input).tolist()
+            results.put((request_id, probs, None))
+        except Exception as e:
+            results.put((request_id, None, f"worker {worker_id}: {e!r}"))
+
+# ============================================
+# POOL
+# ============================================
+class InferencePool:
+    """Load the classifier once in this process and serve it from N forked workers
+
+    load_fn returns (model, tokenizer, label_encoder). Fork happens before
+    any forward pass runs in the parent, and before the result-collector
+    thread starts, so children inherit a quiet, single-threaded parent.
+    For the same reason a worker that dies is not re-forked: its exit fails
+    every pending request with WorkerDied and closes the pool.
+    max_length and max_tokens are the defaults for requests that do not
+    set their own.
+    """
+
+    def __init__(self, load_fn, num_workers=2, threads_per_worker=1, max_length=DEFAULT_MAX_LENGTH,
+                 long_input=None, max_tokens=DEFAULT_MAX_TOKENS):
+        self.model, self.tokenizer, self.encoder = load_fn()
+        self.num_workers = num_workers
+        self.max_length = max_length
+        self.max_tokens = max_tokens
+
+        context = multiprocessing.get_context("fork")
+        self._requests = context.Queue()
+        self._results = context.Queue()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._closing = threading.Event()
+        self.error = None
+
+        # Move everything alive now out of the GC's reach so collections in the
+        # children do not write to (and un-share) the inherited pages
+        gc.collect()
+        gc.freeze()
+
+        self.workers = []
+        for worker_id in range(num_workers):
+            process = context.Process(
+                target=_worker_main,
+                args=(worker_id, self.model, self.tokenizer, self._requests, self._results,
+                      threads_per_worker, long_input),
+                name=f"inference-worker-{worker_id}",
+                daemon=True
+            )
+            process.start()
+            self.workers.append(process)
+
+        self._collector = threading.Thread(target=self._collect, name="inference-results", daemon=True)
+        self._collector.start()
+        logger.info(f"Started {num_workers} inference workers ({threads_per_worker} thread(s) each)")
+
+    def _collect(self):
+        """Resolve futures from the results queue, and watch for workers exiting under us"""
+        # The queue's pipe and every worker's sentinel become ready together in one wait()
+        reader = self._results._reader
+        sentinels = {process.sentinel: process for process in self.workers}
+        while True:
+            ready = wait([reader, *sentinels])
+            if reader in ready:
+                # Results first, so work a worker finished before dying is still delivered
+                request_id, probs, error = self._results.get()
+                if request_id is None:
+                    break
+                with self._lock:
+                    future = self._pending.pop(request_id, None)
+                if future is None:
+                    continue
+                if error is None:
+                    future.set_result(probs)
+                else:
+                    future.set_exception(RuntimeError(error))
+                continue
+
+            for sentinel in ready:
+                process = sentinels.pop(sentinel)
+                if not self._closing.is_set():
+                    process.join(timeout=1)
+                    self._fail(WorkerDied(f"{process.name} exited with code {process.exitcode}"))
+
+    def _fail(self, error):
+        """Fail every pending request with error, refuse new ones and stop the other workers"""
+        logger.error(f"Inference pool closed: {error}")
+        with self._lock:
+            self.error = error
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(error)
+        self._closing.set()
+        for process in self.workers:
+            if process.is_alive():
+                process.terminate()
+
+    def submit(self, texts, max_length=None, max_tokens=None):
+        """Send one chunk of texts to the next free worker; the Future yields probability lists"""
+        future = Future()
+        request_id = next(self._ids)
+        with self._lock:
+            if self.error is not None:
+                raise self.error
+            self._pending[request_id] = future
+        self._requests.put((request_id, list(texts), max_length or self.max_length, max_tokens or self.max_tokens))
+        return future
+
+    def iter_classify(self, texts, chunk_size=DEFAULT_CHUNK_SIZE, max_length=None, max_tokens=None):
+        """Yield one probability list per text, in input order, with bounded work in flight
+
+        Raises WorkerDied if a worker exits before the last row is in.
+        """
+        texts = iter(texts)
+        in_flight = deque()
+        max_in_flight = 2 * self.num_workers
+
+        while True:
+            while len(in_flight) < max_in_flight:
+                chunk = list(itertools.islice(texts, chunk_size))
+                if not chunk:
+                    break
+                in_flight.append(self.submit(chunk, max_length, max_tokens))
+            if not in_flight:
+                return
+            yield from in_flight.popleft().result()
+
+    def classify_texts(self, texts, chunk_size=DEFAULT_CHUNK_SIZE, max_length=None, max_tokens=None):
+        """Probability lists for a list of texts, spread across all workers"""
+        return list(self.iter_classify(texts, chunk_size, max_length, max_tokens))
+
+    def close(self):
+        """Stop the workers and the collector thread"""
+        self._closing.set()
+        for _ in self.workers:
+            self._requests.put(None)
+        for process in self.workers:
+            process.join(timeout=5)
+        self._results.put((None, None, None))
+        gc.unfreeze()